@@ -0,0 +1,71 @@
+"""series coverage
+
+Revision ID: 7c3a91d4e2b5
+Revises: 2fe7d1c9e907
+Create Date: 2026-10-19
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "7c3a91d4e2b5"
+down_revision: Union[str, None] = "2fe7d1c9e907"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Create series_coverage table
+    op.create_table(
+        "series_coverage",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("exchange_symbol_id", sa.Integer(), nullable=False),
+        sa.Column("timeframe", sa.String(length=10), nullable=False),
+        sa.Column("first_ts", sa.DateTime(), nullable=False),
+        sa.Column("last_ts", sa.DateTime(), nullable=False),
+        sa.Column("candle_count", sa.BigInteger(), nullable=False),
+        sa.Column("gap_count", sa.BigInteger(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["exchange_symbol_id"], ["exchange_symbols.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "exchange_symbol_id", "timeframe", name="uq_series_coverage"
+        ),
+    )
+
+    # Build coverage for candles that already exist
+    op.execute(
+        """
+        INSERT INTO series_coverage (
+            exchange_symbol_id, timeframe, first_ts, last_ts,
+            candle_count, gap_count, created_at, updated_at
+        )
+        SELECT
+            exchange_symbol_id,
+            timeframe,
+            MIN(timestamp),
+            MAX(timestamp),
+            COUNT(*),
+            EXTRACT(EPOCH FROM MAX(timestamp) - MIN(timestamp))::bigint
+                / CASE timeframe
+                    WHEN '1h' THEN 3600
+                    WHEN '4h' THEN 14400
+                    WHEN '1d' THEN 86400
+                  END
+                + 1 - COUNT(*),
+            NOW(),
+            NOW()
+        FROM candles
+        GROUP BY exchange_symbol_id, timeframe
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("series_coverage")
@@ -0,0 +1,61 @@
+"""candle closed flag
+
+Revision ID: a9d3e5f70b18
+Revises: e7b2c4d9a615
+Create Date: 2026-10-19
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a9d3e5f70b18"
+down_revision: Union[str, None] = "e7b2c4d9a615"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "candles",
+        sa.Column(
+            "closed", sa.Boolean(), server_default=sa.text("true"), nullable=False
+        ),
+    )
+
+    # Candles inserted before their close were stored while still forming
+    # and never updated since
+    op.execute(
+        """
+        UPDATE candles
+        SET closed = false
+        WHERE created_at < (
+            timestamp
+            + CASE timeframe
+                WHEN '1h' THEN interval '1 hour'
+                WHEN '4h' THEN interval '4 hours'
+                WHEN '1d' THEN interval '1 day'
+            END
+        ) AT TIME ZONE 'UTC'
+        """
+    )
+    op.create_index(
+        "ix_candles_unclosed",
+        "candles",
+        ["exchange_symbol_id", "timeframe", "timestamp"],
+        unique=False,
+        postgresql_where=sa.text("NOT closed"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        "ix_candles_unclosed",
+        table_name="candles",
+        postgresql_where=sa.text("NOT closed"),
+    )
+    op.drop_column("candles", "closed")
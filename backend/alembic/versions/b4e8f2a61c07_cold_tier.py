@@ -0,0 +1,34 @@
+"""cold tier
+
+Revision ID: b4e8f2a61c07
+Revises: 7c3a91d4e2b5
+Create Date: 2026-10-19
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b4e8f2a61c07"
+down_revision: Union[str, None] = "7c3a91d4e2b5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "series_coverage", sa.Column("cold_until", sa.DateTime(), nullable=True)
+    )
+    op.add_column(
+        "series_coverage",
+        sa.Column("cold_count", sa.BigInteger(), server_default="0", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("series_coverage", "cold_count")
+    op.drop_column("series_coverage", "cold_until")
@@ -0,0 +1,66 @@
+"""data quality
+
+Revision ID: d5f1a7c3b920
+Revises: b4e8f2a61c07
+Create Date: 2026-10-19
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d5f1a7c3b920"
+down_revision: Union[str, None] = "b4e8f2a61c07"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "quality_checkpoints",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("exchange_symbol_id", sa.Integer(), nullable=False),
+        sa.Column("timeframe", sa.String(length=10), nullable=False),
+        sa.Column("checked_from", sa.DateTime(), nullable=False),
+        sa.Column("checked_until", sa.DateTime(), nullable=False),
+        sa.Column("checked_count", sa.BigInteger(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["exchange_symbol_id"], ["exchange_symbols.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "exchange_symbol_id", "timeframe", name="uq_quality_checkpoint"
+        ),
+    )
+    op.create_table(
+        "candle_anomalies",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("exchange_symbol_id", sa.Integer(), nullable=False),
+        sa.Column("timeframe", sa.String(length=10), nullable=False),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.Column("rule", sa.String(length=50), nullable=False),
+        sa.Column("value", sa.Float(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["exchange_symbol_id"], ["exchange_symbols.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint(
+            "exchange_symbol_id",
+            "timeframe",
+            "timestamp",
+            "rule",
+            name="uq_candle_anomaly",
+        ),
+    )
+    op.create_index(
+        op.f("ix_candle_anomalies_rule"), "candle_anomalies", ["rule"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_candle_anomalies_rule"), table_name="candle_anomalies")
+    op.drop_table("candle_anomalies")
+    op.drop_table("quality_checkpoints")
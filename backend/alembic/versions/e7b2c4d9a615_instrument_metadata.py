@@ -0,0 +1,69 @@
+"""instrument metadata
+
+Revision ID: e7b2c4d9a615
+Revises: d5f1a7c3b920
+Create Date: 2026-10-19
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e7b2c4d9a615"
+down_revision: Union[str, None] = "d5f1a7c3b920"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "exchange_symbols", sa.Column("base_asset", sa.String(length=50), nullable=True)
+    )
+    op.add_column(
+        "exchange_symbols",
+        sa.Column("quote_asset", sa.String(length=50), nullable=True),
+    )
+    op.add_column(
+        "exchange_symbols", sa.Column("status", sa.String(length=50), nullable=True)
+    )
+    op.add_column(
+        "exchange_symbols", sa.Column("listed_at", sa.DateTime(), nullable=True)
+    )
+    op.create_index(
+        op.f("ix_exchange_symbols_base_asset"),
+        "exchange_symbols",
+        ["base_asset"],
+        unique=False,
+    )
+    op.create_index(
+        op.f("ix_exchange_symbols_quote_asset"),
+        "exchange_symbols",
+        ["quote_asset"],
+        unique=False,
+    )
+
+    # Only USDT pairs were collected so far; split their names so quote
+    # filtering keeps working until the next symbols update fills the rest
+    op.execute(
+        """
+        UPDATE exchange_symbols es
+        SET base_asset = left(s.name, -4), quote_asset = 'USDT'
+        FROM symbols s
+        WHERE s.id = es.symbol_id AND s.name LIKE '%USDT'
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f("ix_exchange_symbols_quote_asset"), table_name="exchange_symbols"
+    )
+    op.drop_index(op.f("ix_exchange_symbols_base_asset"), table_name="exchange_symbols")
+    op.drop_column("exchange_symbols", "listed_at")
+    op.drop_column("exchange_symbols", "status")
+    op.drop_column("exchange_symbols", "quote_asset")
+    op.drop_column("exchange_symbols", "base_asset")
@@ -1,16 +1,128 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_async_session
-from app.schemas.klines import CollectKlinesRequest, CollectKlinesResponse
+from app.schemas.klines import (
+    AnomaliesRequest,
+    AnomaliesResponse,
+    CollectKlinesRequest,
+    CollectKlinesResponse,
+    CoverageRequest,
+    CoverageResponse,
+    FreshnessRequest,
+    FreshnessResponse,
+    IndicatorRequest,
+    IndicatorResponse,
+    KlinesRequest,
+    KlinesResponse,
+    PanelRequest,
+    RecentKlinesRequest,
+    SpreadRequest,
+    SpreadResponse,
+    TieringStatsResponse,
+)
+from app.services.indicators import IndicatorsService
 from app.services.klines import KlinesService
+from app.services.panel import PanelService
+from app.services.quality import QualityService
+from app.services.spread import SpreadService
 
 
 router = APIRouter(prefix="/api/klines", tags=["klines"])
 
 
+@router.get("", response_model=KlinesResponse)
+async def get_klines(
+    klines_request: Annotated[KlinesRequest, Query()],
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+    accept: Annotated[str | None, Header()] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """
+    Read stored candles: keyset-paginated JSON, or the whole range streamed as
+    NDJSON, CSV, Arrow IPC, Parquet or msgpack.
+    """
+    return await KlinesService.get_klines(
+        session=session,
+        klines_request=klines_request,
+        accept=accept,
+        if_none_match=if_none_match,
+    )
+
+
+@router.get("/recent", response_model=KlinesResponse)
+async def get_recent_klines(
+    recent_request: Annotated[RecentKlinesRequest, Query()],
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+    accept: Annotated[str | None, Header()] = None,
+) -> Response:
+    """
+    Read the newest candles of a series from the in-memory ring buffers, as
+    JSON, NDJSON, CSV, Arrow IPC, Parquet or msgpack.
+    """
+    return await KlinesService.get_recent(
+        session=session,
+        recent_request=recent_request,
+        accept=accept,
+    )
+
+
+@router.get("/panel", response_class=StreamingResponse)
+async def get_panel(
+    panel_request: Annotated[PanelRequest, Query()],
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+    accept: Annotated[str | None, Header()] = None,
+) -> StreamingResponse:
+    """
+    Stream close (or OHLCV) of many symbols aligned on one timestamp grid, as
+    Arrow IPC (default), Parquet or msgpack, with nulls for missing candles.
+    """
+    return await PanelService.get_panel(
+        session=session,
+        panel_request=panel_request,
+        accept=accept,
+    )
+
+
+@router.get("/spread", response_model=SpreadResponse)
+async def get_spread(
+    spread_request: Annotated[SpreadRequest, Query()],
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+    accept: Annotated[str | None, Header()] = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """
+    Align symbols across exchanges and market types on timestamp and return
+    spread, basis and ratio against the first leg, with range statistics.
+    """
+    return await SpreadService.get_spread(
+        session=session,
+        spread_request=spread_request,
+        accept=accept,
+        if_none_match=if_none_match,
+    )
+
+
+@router.get("/indicators", response_model=IndicatorResponse)
+async def get_indicator(
+    indicator_request: Annotated[IndicatorRequest, Query()],
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+    accept: Annotated[str | None, Header()] = None,
+) -> Response:
+    """
+    Compute SMA, EMA, RSI, ATR or Bollinger Bands over the closed candles of a
+    series; results are cached and extended incrementally as candles arrive.
+    """
+    return await IndicatorsService.get_indicator(
+        session=session,
+        indicator_request=indicator_request,
+        accept=accept,
+    )
+
+
 @router.post("/collect", response_model=CollectKlinesResponse)
 async def collect_klines(
     collect_klines_request: CollectKlinesRequest,
@@ -21,3 +133,65 @@ async def collect_klines(
         session=session,
         collect_klines_request=collect_klines_request,
     )
+
+
+@router.post("/collect/stream", response_class=StreamingResponse)
+async def collect_klines_stream(
+    collect_klines_request: CollectKlinesRequest,
+    request: Request,
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+) -> StreamingResponse:
+    """
+    Fetch candles like /collect, streaming Server-Sent Events: `progress`
+    after each page (pages, cursor, candles/s, retries, ETA), then `done` with
+    the totals or `error`. Disconnecting stops the fetch.
+    """
+    return await KlinesService.collect_stream(
+        session=session,
+        collect_klines_request=collect_klines_request,
+        receive=request.receive,
+    )
+
+
+@router.get("/coverage", response_model=CoverageResponse)
+async def get_coverage(
+    coverage_request: Annotated[CoverageRequest, Query()],
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+) -> CoverageResponse:
+    """Get stored date range, candle count and gap count per series."""
+    return await KlinesService.get_coverage(
+        session=session,
+        coverage_request=coverage_request,
+    )
+
+
+@router.get("/freshness", response_model=FreshnessResponse)
+async def get_freshness(
+    freshness_request: Annotated[FreshnessRequest, Query()],
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+) -> FreshnessResponse:
+    """Get per-series lag behind the latest candle close against a target."""
+    return await KlinesService.get_freshness(
+        session=session,
+        freshness_request=freshness_request,
+    )
+
+
+@router.get("/anomalies", response_model=AnomaliesResponse)
+async def get_anomalies(
+    anomalies_request: Annotated[AnomaliesRequest, Query()],
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+) -> AnomaliesResponse:
+    """Get candles flagged by the data-quality checks."""
+    return await QualityService.get_anomalies(
+        session=session,
+        anomalies_request=anomalies_request,
+    )
+
+
+@router.get("/tiering", response_model=TieringStatsResponse)
+async def get_tiering_stats(
+    session: Annotated[AsyncSession, Depends(get_async_session)],
+) -> TieringStatsResponse:
+    """Get cold tier fraction and per-tier read cost."""
+    return await KlinesService.get_tiering_stats(session=session)
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Response
+
+from app.metrics import metrics_payload
+
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """Prometheus metrics of this process."""
+    payload, content_type = metrics_payload()
+    return Response(content=payload, media_type=content_type)
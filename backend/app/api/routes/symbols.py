@@ -1,6 +1,6 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_async_session
@@ -15,11 +15,13 @@ router = APIRouter(prefix="/api/symbols", tags=["symbols"])
 async def get_symbols(
     symbols_request: Annotated[SymbolsRequest, Query()],
     session: Annotated[AsyncSession, Depends(get_async_session)],
-) -> SymbolsResponse:
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
     """Get list of active trading symbols from database."""
     return await SymbolsService.get_active(
         session=session,
         symbols_request=symbols_request,
+        if_none_match=if_none_match,
     )
 
 
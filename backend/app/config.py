@@ -1,3 +1,5 @@
+from pathlib import Path
+
 from pydantic import Field, computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -10,6 +12,40 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str = Field(default="localhost")
     POSTGRES_PORT: int = Field(default=5432)
 
+    # Cold tier (Parquet files for old closed candles)
+    COLD_STORAGE_DIR: Path = Field(default=Path("cold_storage"))
+    COLD_TIER_AFTER_DAYS: int = Field(default=90)
+
+    # Memory-mapped column files of both tiers, for scans of long histories
+    COLUMNAR_STORE_DIR: Path | None = Field(default=None)
+
+    # Read response cache
+    CACHE_MAX_BYTES: int = Field(default=256 * 1024 * 1024)
+    CACHE_MAX_ENTRY_BYTES: int = Field(default=32 * 1024 * 1024)
+    CACHE_SPILL_DIR: Path | None = Field(default=None)
+    CACHE_SPILL_MAX_BYTES: int = Field(default=2 * 1024 * 1024 * 1024)
+
+    # Indicator results cache
+    INDICATOR_CACHE_MAX_BYTES: int = Field(default=512 * 1024 * 1024)
+
+    # Ring buffers of the newest candles per series (48 bytes per candle)
+    RECENT_CACHE_CANDLES: int = Field(default=2000)
+    RECENT_CACHE_MAX_BYTES: int = Field(default=256 * 1024 * 1024)
+    RECENT_CACHE_WARM: bool = Field(default=True)
+
+    # Target lag of scheduled collection behind each candle close
+    FRESHNESS_TARGET_SECONDS: int = Field(default=300)
+
+    # Prometheus metrics of scripts (the API serves /metrics)
+    METRICS_PORT: int | None = Field(default=None)
+    METRICS_PUSHGATEWAY: str | None = Field(default=None)
+
+    # OpenTelemetry traces (OTLP/HTTP base URL, e.g. http://localhost:4318)
+    TRACING_OTLP_ENDPOINT: str | None = Field(default=None)
+    # Profile API requests sent with an X-Profile header
+    PROFILING_ENABLED: bool = Field(default=False)
+    PROFILE_DIR: Path = Field(default=Path("profiles"))
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
     @computed_field
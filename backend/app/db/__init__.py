@@ -1,5 +1,14 @@
 from .base import Base
-from .models import Candle, Exchange, ExchangeSymbol, MarketType, Symbol
+from .models import (
+    Candle,
+    CandleAnomaly,
+    Exchange,
+    ExchangeSymbol,
+    MarketType,
+    QualityCheckpoint,
+    SeriesCoverage,
+    Symbol,
+)
 from .session import get_async_session, get_sync_session
 
 
@@ -10,6 +19,9 @@ __all__ = [
     "Symbol",
     "ExchangeSymbol",
     "Candle",
+    "SeriesCoverage",
+    "QualityCheckpoint",
+    "CandleAnomaly",
     "get_async_session",
     "get_sync_session",
 ]
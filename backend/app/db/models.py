@@ -7,9 +7,11 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     UniqueConstraint,
+    text,
 )
 from sqlalchemy.orm import relationship
 
@@ -105,6 +107,13 @@ class ExchangeSymbol(Base):
     exchange_symbol_name = Column(String(100), nullable=True)
     is_active = Column(Boolean, default=True, nullable=False)
 
+    # Instrument metadata from the exchange, refreshed by update_symbols
+    base_asset = Column(String(50), nullable=True, index=True)
+    quote_asset = Column(String(50), nullable=True, index=True)
+    status = Column(String(50), nullable=True)
+    # When trading started; nothing before it is ever fetched
+    listed_at = Column(DateTime, nullable=True)
+
     created_at = Column(
         DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False
     )
@@ -119,6 +128,8 @@ class ExchangeSymbol(Base):
     market_type = relationship("MarketType", back_populates="exchange_symbols")
     symbol = relationship("Symbol", back_populates="exchange_symbols")
     candles = relationship("Candle", back_populates="exchange_symbol")
+    coverage = relationship("SeriesCoverage", back_populates="exchange_symbol")
+    anomalies = relationship("CandleAnomaly", back_populates="exchange_symbol")
 
     def __repr__(self):
         return f"<ExchangeSymbol(id={self.id}, exchange_id={self.exchange_id}, symbol_id={self.symbol_id})>"
@@ -132,6 +143,13 @@ class Candle(Base):
         UniqueConstraint(
             "exchange_symbol_id", "timeframe", "timestamp", name="uq_candle"
         ),
+        Index(
+            "ix_candles_unclosed",
+            "exchange_symbol_id",
+            "timeframe",
+            "timestamp",
+            postgresql_where=text("NOT closed"),
+        ),
     )
 
     id = Column(BigInteger, primary_key=True, autoincrement=True)
@@ -147,6 +165,9 @@ class Candle(Base):
     low = Column(Float, nullable=False)
     close = Column(Float, nullable=False)
     volume = Column(Float, nullable=False)
+    # Immutable once closed; False only for candles stored while still
+    # forming, which the next sync of the series overwrites and closes
+    closed = Column(Boolean, server_default=text("true"), nullable=False)
 
     created_at = Column(
         DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False
@@ -162,3 +183,114 @@ class Candle(Base):
 
     def __repr__(self):
         return f"<Candle(exchange_symbol_id={self.exchange_symbol_id}, timeframe={self.timeframe}, timestamp={self.timestamp})>"
+
+
+class SeriesCoverage(Base):
+    """Per-series summary of stored candles, maintained by the write path."""
+
+    __tablename__ = "series_coverage"
+    __table_args__ = (
+        UniqueConstraint("exchange_symbol_id", "timeframe", name="uq_series_coverage"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    exchange_symbol_id = Column(
+        Integer, ForeignKey("exchange_symbols.id"), nullable=False
+    )
+    timeframe = Column(String(10), nullable=False)
+
+    first_ts = Column(DateTime, nullable=False)
+    last_ts = Column(DateTime, nullable=False)
+    candle_count = Column(BigInteger, nullable=False)
+    # Number of missing candles between first_ts and last_ts
+    gap_count = Column(BigInteger, nullable=False)
+    # Candles before cold_until live in Parquet files, not in candles
+    cold_until = Column(DateTime, nullable=True)
+    cold_count = Column(BigInteger, default=0, nullable=False)
+
+    created_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+        onupdate=lambda: datetime.now(UTC),
+        nullable=False,
+    )
+
+    exchange_symbol = relationship("ExchangeSymbol", back_populates="coverage")
+
+    def __repr__(self):
+        return f"<SeriesCoverage(exchange_symbol_id={self.exchange_symbol_id}, timeframe={self.timeframe}, candle_count={self.candle_count})>"
+
+
+class QualityCheckpoint(Base):
+    """How far the data-quality checks have covered a series."""
+
+    __tablename__ = "quality_checkpoints"
+    __table_args__ = (
+        UniqueConstraint(
+            "exchange_symbol_id", "timeframe", name="uq_quality_checkpoint"
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+    exchange_symbol_id = Column(
+        Integer, ForeignKey("exchange_symbols.id"), nullable=False
+    )
+    timeframe = Column(String(10), nullable=False)
+
+    # Coverage of the series when it was last checked
+    checked_from = Column(DateTime, nullable=False)
+    checked_until = Column(DateTime, nullable=False)
+    checked_count = Column(BigInteger, nullable=False)
+
+    created_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False
+    )
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+        onupdate=lambda: datetime.now(UTC),
+        nullable=False,
+    )
+
+    def __repr__(self):
+        return f"<QualityCheckpoint(exchange_symbol_id={self.exchange_symbol_id}, timeframe={self.timeframe}, checked_until={self.checked_until})>"
+
+
+class CandleAnomaly(Base):
+    """A candle flagged by a data-quality rule."""
+
+    __tablename__ = "candle_anomalies"
+    __table_args__ = (
+        UniqueConstraint(
+            "exchange_symbol_id",
+            "timeframe",
+            "timestamp",
+            "rule",
+            name="uq_candle_anomaly",
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+
+    exchange_symbol_id = Column(
+        Integer, ForeignKey("exchange_symbols.id"), nullable=False
+    )
+    timeframe = Column(String(10), nullable=False)
+    timestamp = Column(DateTime, nullable=False)
+    rule = Column(String(50), nullable=False, index=True)
+    # Rule-specific measurement, e.g. run length or deviation
+    value = Column(Float, nullable=True)
+
+    created_at = Column(
+        DateTime(timezone=True), default=lambda: datetime.now(UTC), nullable=False
+    )
+
+    exchange_symbol = relationship("ExchangeSymbol", back_populates="anomalies")
+
+    def __repr__(self):
+        return f"<CandleAnomaly(exchange_symbol_id={self.exchange_symbol_id}, timeframe={self.timeframe}, timestamp={self.timestamp}, rule={self.rule})>"
@@ -1,3 +1,4 @@
+from datetime import timedelta
 from enum import StrEnum
 
 
@@ -27,3 +28,59 @@ class TimeframeEnum(StrEnum):
     h1 = "1h"
     h4 = "4h"
     d1 = "1d"
+
+
+class KlinesFormatEnum(StrEnum):
+    """Response formats for candle reads."""
+
+    JSON = "json"
+    NDJSON = "ndjson"
+    CSV = "csv"
+    ARROW = "arrow"
+    PARQUET = "parquet"
+    MSGPACK = "msgpack"
+
+
+class CandleFieldEnum(StrEnum):
+    """OHLCV candle fields."""
+
+    OPEN = "open"
+    HIGH = "high"
+    LOW = "low"
+    CLOSE = "close"
+    VOLUME = "volume"
+
+
+class DownsampleEnum(StrEnum):
+    """Downsampling methods for chart-sized candle reads."""
+
+    LTTB = "lttb"
+    OHLC = "ohlc"
+
+
+class IndicatorEnum(StrEnum):
+    """Supported technical indicators."""
+
+    SMA = "sma"
+    EMA = "ema"
+    RSI = "rsi"
+    ATR = "atr"
+    BBANDS = "bbands"
+
+
+class AnomalyRuleEnum(StrEnum):
+    """Data-quality rules that flag individual candles."""
+
+    OHLC_INCONSISTENT = "ohlc_inconsistent"
+    NONPOSITIVE_PRICE = "nonpositive_price"
+    NEGATIVE_VOLUME = "negative_volume"
+    ZERO_VOLUME_RUN = "zero_volume_run"
+    PRICE_SPIKE = "price_spike"
+    CROSS_EXCHANGE = "cross_exchange"
+
+
+TIMEFRAME_DELTA: dict[TimeframeEnum, timedelta] = {
+    TimeframeEnum.h1: timedelta(hours=1),
+    TimeframeEnum.h4: timedelta(hours=4),
+    TimeframeEnum.d1: timedelta(days=1),
+}
@@ -4,59 +4,146 @@ import time
 from abc import ABC, abstractmethod
 from collections.abc import AsyncGenerator
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import UTC, datetime
 
 import httpx
+from opentelemetry import trace
 
-from app.enums import MarketTypeEnum, QuoteAssetEnum, TimeframeEnum
+from app.enums import ExchangeEnum, MarketTypeEnum, QuoteAssetEnum, TimeframeEnum
+from app.metrics import (
+    CANDLES_FETCHED,
+    EXCHANGE_REQUEST_SECONDS,
+    EXCHANGE_RESPONSES,
+    EXCHANGE_RETRIES,
+    PAGES_FETCHED,
+    RATE_LIMIT_WAIT_SECONDS,
+)
+from app.tracing import tracer
 
 
 logger = logging.getLogger(__name__)
 
 
+def ms_to_datetime(ms: int | float) -> datetime:
+    """Naive UTC datetime of exchange epoch milliseconds, whatever the host TZ."""
+    return datetime.fromtimestamp(ms / 1000, UTC).replace(tzinfo=None)
+
+
+def datetime_to_ms(dt: datetime) -> int:
+    """Epoch milliseconds of a naive UTC datetime, for request params."""
+    return int(dt.replace(tzinfo=UTC).timestamp() * 1000)
+
+
 @dataclass
 class Kline:
     """Standardized candle structure."""
 
-    timestamp: datetime
+    timestamp: datetime  # open time, naive UTC
     open: float
     high: float
     low: float
     close: float
     volume: float
 
+    def __post_init__(self):
+        if self.timestamp.tzinfo is not None:
+            self.timestamp = self.timestamp.astimezone(UTC).replace(tzinfo=None)
+
+
+@dataclass
+class Instrument:
+    """Instrument metadata from an exchange's listing of tradable symbols."""
+
+    symbol: str
+    base_asset: str
+    quote_asset: str
+    status: str
+    # When trading started, None if the exchange does not publish it
+    listed_at: datetime | None = None
+
+
+@dataclass
+class StreamKline:
+    """Candle update from a kline WebSocket stream."""
+
+    stream: str  # the stream name it was subscribed under
+    kline: Kline
+    # False while the candle is still forming
+    closed: bool
+
 
 class RateLimiter:
     """Token-bucket rate limiter for async HTTP requests."""
 
-    def __init__(self, rate: float):
+    def __init__(self, rate: float, name: str = ""):
         """
         Args:
             rate: Maximum requests per second.
+            name: Label of the wait time metric (the exchange).
         """
         self._interval = 1.0 / rate
         self._semaphore = asyncio.Semaphore(1)
         self._last_request: float = 0.0
+        self._wait_seconds = RATE_LIMIT_WAIT_SECONDS.labels(name)
 
     async def acquire(self) -> None:
-        async with self._semaphore:
-            now = time.monotonic()
-            wait = self._last_request + self._interval - now
-            if wait > 0:
-                await asyncio.sleep(wait)
-            self._last_request = time.monotonic()
+        started = time.monotonic()
+        with tracer.start_as_current_span("rate_limit_wait"):
+            async with self._semaphore:
+                now = time.monotonic()
+                wait = self._last_request + self._interval - now
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._last_request = time.monotonic()
+        # Includes queueing behind other requests for the semaphore
+        self._wait_seconds.observe(self._last_request - started)
 
 
 class BaseExchangeClient(ABC):
     """Abstract base exchange client."""
 
+    EXCHANGE: ExchangeEnum  # set in subclasses
     RATE_LIMIT: float = 10.0  # requests per second, override in subclasses
+    PAGE_LIMIT: int = 1000  # candles per klines request
+    # Weight of one full klines page and the weight budget per minute, by
+    # market type; exchanges that only limit the request count leave them empty
+    REQUEST_WEIGHT: dict[MarketTypeEnum, int] = {}
+    WEIGHT_LIMIT: dict[MarketTypeEnum, int] = {}
     MAX_RETRIES: int = 3
     RETRY_STATUSES: set[int] = {429, 500, 502, 503, 504}
+    # get_klines pages run from end_time back to start_time (each page is
+    # still oldest first)
+    DESCENDING_PAGES: bool = False
+    # Kline WebSocket endpoints by market type, streams per connection, and
+    # the interval of application-level pings for exchanges that need them
+    WS_URLS: dict[MarketTypeEnum, str] = {}
+    WS_MAX_STREAMS: int = 200
+    WS_PING_INTERVAL: float | None = None
 
     def __init__(self, http_client: httpx.AsyncClient | None = None):
         self._external_client = http_client
-        self._rate_limiter = RateLimiter(self.RATE_LIMIT)
+        self._rate_limiter = RateLimiter(self.RATE_LIMIT, self.EXCHANGE.value)
+        # Requests retried by this client instance
+        self.retries = 0
+
+    def _observe_request(self, endpoint: str, status: str, started: float) -> None:
+        exchange = self.EXCHANGE.value
+        EXCHANGE_REQUEST_SECONDS.labels(exchange, endpoint).observe(
+            time.perf_counter() - started
+        )
+        EXCHANGE_RESPONSES.labels(exchange, status).inc()
+
+    def _page_span(self, stage: str, params: dict):
+        """A span for one stage of fetching a klines page."""
+        return tracer.start_as_current_span(
+            stage,
+            attributes={"exchange": self.EXCHANGE.value, "symbol": params["symbol"]},
+        )
+
+    def _record_page(self, market_type: MarketTypeEnum, candles: int) -> None:
+        labels = (self.EXCHANGE.value, market_type.value)
+        PAGES_FETCHED.labels(*labels).inc()
+        CANDLES_FETCHED.labels(*labels).inc(candles)
 
     async def _request_with_retry(
         self,
@@ -65,10 +152,13 @@ class BaseExchangeClient(ABC):
         params: dict,
     ) -> httpx.Response:
         """Execute GET request with rate limiting and exponential backoff retry."""
+        endpoint = httpx.URL(url).path
         for attempt in range(self.MAX_RETRIES):
             await self._rate_limiter.acquire()
+            started = time.perf_counter()
             try:
                 response = await client.get(url, params=params)
+                self._observe_request(endpoint, str(response.status_code), started)
                 if response.status_code not in self.RETRY_STATUSES:
                     response.raise_for_status()
                     return response
@@ -79,6 +169,13 @@ class BaseExchangeClient(ABC):
                 else:
                     delay = 2**attempt
 
+                EXCHANGE_RETRIES.labels(
+                    self.EXCHANGE.value, str(response.status_code)
+                ).inc()
+                self.retries += 1
+                trace.get_current_span().add_event(
+                    "retry", {"status": response.status_code, "delay": delay}
+                )
                 logger.warning(
                     "HTTP %d for %s, retry %d/%d in %.1fs",
                     response.status_code,
@@ -90,9 +187,15 @@ class BaseExchangeClient(ABC):
                 await asyncio.sleep(delay)
 
             except httpx.TransportError as e:
+                self._observe_request(endpoint, "transport", started)
                 if attempt == self.MAX_RETRIES - 1:
                     raise
                 delay = 2**attempt
+                EXCHANGE_RETRIES.labels(self.EXCHANGE.value, "transport").inc()
+                self.retries += 1
+                trace.get_current_span().add_event(
+                    "retry", {"error": type(e).__name__, "delay": delay}
+                )
                 logger.warning(
                     "Transport error for %s: %s, retry %d/%d in %.1fs",
                     url,
@@ -105,7 +208,13 @@ class BaseExchangeClient(ABC):
 
         # Final attempt without catching
         await self._rate_limiter.acquire()
-        response = await client.get(url, params=params)
+        started = time.perf_counter()
+        try:
+            response = await client.get(url, params=params)
+        except httpx.TransportError:
+            self._observe_request(endpoint, "transport", started)
+            raise
+        self._observe_request(endpoint, str(response.status_code), started)
         response.raise_for_status()
         return response
 
@@ -121,16 +230,55 @@ class BaseExchangeClient(ABC):
         """
         Fetch historical candles, yielding batches as they arrive.
 
-        Each yield is a list of Kline objects from one API page.
+        Each yield is a list of Kline objects from one API page. Without an
+        end_time before the forming candle, the last page ends with it
+        (save_klines holds it out).
         """
         yield  # pragma: no cover
         raise NotImplementedError  # pragma: no cover
 
+    @abstractmethod
+    async def get_first_candle_time(
+        self,
+        symbol: str,
+        market_type: MarketTypeEnum = MarketTypeEnum.SPOT,
+    ) -> datetime | None:
+        """
+        Open time of the symbol's oldest candle, at daily or coarser precision
+        (never later than the oldest hourly candle). None if it has none.
+
+        Costs one request; used when the instrument listing has no listing time.
+        """
+        pass
+
     @staticmethod
     @abstractmethod
     async def get_active_symbols(
         market_type: MarketTypeEnum = MarketTypeEnum.FUTURES,
         quote_asset: QuoteAssetEnum = QuoteAssetEnum.USDT,
-    ) -> list[str]:
-        """Get list of active trading symbols."""
+    ) -> list[Instrument]:
+        """Get metadata of the active trading symbols quoted in quote_asset."""
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def stream_name(symbol: str, timeframe: TimeframeEnum) -> str:
+        """Name of the kline stream of a symbol and timeframe."""
         pass
+
+    @staticmethod
+    @abstractmethod
+    def subscribe_messages(streams: list[str]) -> list[str]:
+        """Messages subscribing a connection to kline streams."""
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def parse_stream_message(message: str | bytes) -> list[StreamKline]:
+        """Candle updates in a stream message; empty for acks and pongs."""
+        pass
+
+    @staticmethod
+    def ping_message() -> str | None:
+        """Application-level ping, for exchanges with WS_PING_INTERVAL."""
+        return None
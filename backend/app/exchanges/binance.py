@@ -1,10 +1,18 @@
+import json
 from collections.abc import AsyncGenerator
 from datetime import datetime
 
 import httpx
 
-from app.enums import MarketTypeEnum, QuoteAssetEnum, TimeframeEnum
-from app.exchanges.base import BaseExchangeClient, Kline
+from app.enums import ExchangeEnum, MarketTypeEnum, QuoteAssetEnum, TimeframeEnum
+from app.exchanges.base import (
+    BaseExchangeClient,
+    Instrument,
+    Kline,
+    StreamKline,
+    datetime_to_ms,
+    ms_to_datetime,
+)
 
 
 BINANCE_BASE_URLS: dict[MarketTypeEnum, str] = {
@@ -22,17 +30,32 @@ BINANCE_EXCHANGE_INFO_ENDPOINTS: dict[MarketTypeEnum, str] = {
     MarketTypeEnum.FUTURES: "/fapi/v1/exchangeInfo",
 }
 
+BINANCE_WS_URLS: dict[MarketTypeEnum, str] = {
+    MarketTypeEnum.SPOT: "wss://stream.binance.com:9443/ws",
+    MarketTypeEnum.FUTURES: "wss://fstream.binance.com/ws",
+}
+
 
 class BinanceClient(BaseExchangeClient):
     """Binance public API client (spot + futures)."""
 
+    EXCHANGE = ExchangeEnum.BINANCE
     RATE_LIMIT: float = 20.0
+    REQUEST_WEIGHT: dict[MarketTypeEnum, int] = {
+        MarketTypeEnum.SPOT: 2,
+        MarketTypeEnum.FUTURES: 5,  # limit 500-1000
+    }
+    WEIGHT_LIMIT: dict[MarketTypeEnum, int] = {
+        MarketTypeEnum.SPOT: 6000,
+        MarketTypeEnum.FUTURES: 2400,
+    }
+    WS_URLS = BINANCE_WS_URLS
 
     @staticmethod
     async def get_active_symbols(
         market_type: MarketTypeEnum = MarketTypeEnum.FUTURES,
         quote_asset: QuoteAssetEnum = QuoteAssetEnum.USDT,
-    ) -> list[str]:
+    ) -> list[Instrument]:
         base_url = BINANCE_BASE_URLS[market_type]
         endpoint = BINANCE_EXCHANGE_INFO_ENDPOINTS[market_type]
         url = f"{base_url}{endpoint}"
@@ -42,14 +65,53 @@ class BinanceClient(BaseExchangeClient):
             response.raise_for_status()
             exchange_info = response.json()
 
+        # Futures also list delivery contracts (BTCUSDT_250627); spot has no
+        # contractType. onboardDate is only published for futures.
         return [
-            item["symbol"]
+            Instrument(
+                symbol=item["symbol"],
+                base_asset=item["baseAsset"],
+                quote_asset=item["quoteAsset"],
+                status=item["status"],
+                listed_at=(
+                    ms_to_datetime(item["onboardDate"])
+                    if item.get("onboardDate")
+                    else None
+                ),
+            )
             for item in exchange_info["symbols"]
-            if item["symbol"].endswith(quote_asset.value.upper())
+            if item["quoteAsset"] == quote_asset.value.upper()
             and item["status"] == "TRADING"
+            and item.get("contractType", "PERPETUAL").endswith("PERPETUAL")
         ]
 
-    _PAGE_LIMIT = 1000
+    async def get_first_candle_time(
+        self,
+        symbol: str,
+        market_type: MarketTypeEnum = MarketTypeEnum.SPOT,
+    ) -> datetime | None:
+        base_url = BINANCE_BASE_URLS[market_type]
+        endpoint = BINANCE_KLINE_ENDPOINTS[market_type]
+        params = {
+            "symbol": symbol.upper(),
+            "interval": "1d",
+            "startTime": 0,
+            "limit": 1,
+        }
+
+        own_client = self._external_client is None
+        client = self._external_client or httpx.AsyncClient(timeout=30)
+        try:
+            data = await self._fetch_klines_page(
+                client, f"{base_url}{endpoint}", params
+            )
+        finally:
+            if own_client:
+                await client.aclose()
+
+        if not data:
+            return None
+        return ms_to_datetime(data[0][0])
 
     async def get_klines(
         self,
@@ -66,10 +128,10 @@ class BinanceClient(BaseExchangeClient):
         params: dict = {
             "symbol": symbol.upper(),
             "interval": timeframe,
-            "limit": self._PAGE_LIMIT,
+            "limit": self.PAGE_LIMIT,
         }
         if end_time:
-            params["endTime"] = int(end_time.timestamp() * 1000)
+            params["endTime"] = datetime_to_ms(end_time)
 
         current_start = start_time
         own_client = self._external_client is None
@@ -77,19 +139,22 @@ class BinanceClient(BaseExchangeClient):
 
         try:
             while True:
-                params["startTime"] = int(current_start.timestamp() * 1000)
+                params["startTime"] = datetime_to_ms(current_start)
 
                 data = await self._fetch_klines_page(client, url, params)
                 if not data:
                     break
 
-                yield self._parse_klines(data)
+                self._record_page(market_type, len(data))
+                with self._page_span("parse", params):
+                    klines = self._parse_klines(data)
+                yield klines
 
-                if len(data) < self._PAGE_LIMIT:
+                if len(data) < self.PAGE_LIMIT:
                     break
 
                 last_open_time_ms = data[-1][0]
-                current_start = datetime.fromtimestamp((last_open_time_ms + 1) / 1000)
+                current_start = ms_to_datetime(last_open_time_ms + 1)
                 if end_time and current_start >= end_time:
                     break
         finally:
@@ -99,8 +164,10 @@ class BinanceClient(BaseExchangeClient):
     async def _fetch_klines_page(
         self, client: httpx.AsyncClient, url: str, params: dict
     ) -> list:
-        response = await self._request_with_retry(client, url, params)
-        return response.json()
+        with self._page_span("fetch_page", params):
+            response = await self._request_with_retry(client, url, params)
+        with self._page_span("decode_json", params):
+            return response.json()
 
     def _parse_klines(self, data: list) -> list[Kline]:
         """
@@ -123,7 +190,7 @@ class BinanceClient(BaseExchangeClient):
         klines = []
         for item in data:
             kline = Kline(
-                timestamp=datetime.fromtimestamp(item[0] / 1000),
+                timestamp=ms_to_datetime(item[0]),
                 open=float(item[1]),
                 high=float(item[2]),
                 low=float(item[3]),
@@ -132,3 +199,41 @@ class BinanceClient(BaseExchangeClient):
             )
             klines.append(kline)
         return klines
+
+    @staticmethod
+    def stream_name(symbol: str, timeframe: TimeframeEnum) -> str:
+        return f"{symbol.lower()}@kline_{timeframe.value}"
+
+    @staticmethod
+    def subscribe_messages(streams: list[str]) -> list[str]:
+        # One message per 200 streams keeps under the incoming message limit
+        return [
+            json.dumps(
+                {"method": "SUBSCRIBE", "params": streams[i : i + 200], "id": i + 1}
+            )
+            for i in range(0, len(streams), 200)
+        ]
+
+    @staticmethod
+    def parse_stream_message(message: str | bytes) -> list[StreamKline]:
+        """
+        Parse a Binance kline event; subscription acks yield nothing.
+
+        {"e": "kline", "s": "BTCUSDT", "k": {"t": 1499040000000, "i": "1h",
+         "o": "0.0010", "c": "0.0020", "h": "0.0025", "l": "0.0015",
+         "v": "1000", "x": false, ...}}
+        """
+        data = json.loads(message)
+        if data.get("e") != "kline":
+            return []
+        k = data["k"]
+        kline = Kline(
+            timestamp=ms_to_datetime(k["t"]),
+            open=float(k["o"]),
+            high=float(k["h"]),
+            low=float(k["l"]),
+            close=float(k["c"]),
+            volume=float(k["v"]),
+        )
+        stream = f"{k['s'].lower()}@kline_{k['i']}"
+        return [StreamKline(stream=stream, kline=kline, closed=k["x"])]
@@ -1,14 +1,31 @@
+import json
+import logging
 from collections.abc import AsyncGenerator
 from datetime import datetime
 
 import httpx
 
-from app.enums import MarketTypeEnum, QuoteAssetEnum, TimeframeEnum
-from app.exchanges.base import BaseExchangeClient, Kline
+from app.enums import ExchangeEnum, MarketTypeEnum, QuoteAssetEnum, TimeframeEnum
+from app.exchanges.base import (
+    BaseExchangeClient,
+    Instrument,
+    Kline,
+    StreamKline,
+    datetime_to_ms,
+    ms_to_datetime,
+)
+
+
+logger = logging.getLogger(__name__)
 
 
 BYBIT_BASE_URL = "https://api.bybit.com"
 
+BYBIT_WS_URLS: dict[MarketTypeEnum, str] = {
+    MarketTypeEnum.SPOT: "wss://stream.bybit.com/v5/public/spot",
+    MarketTypeEnum.FUTURES: "wss://stream.bybit.com/v5/public/linear",
+}
+
 BYBIT_CATEGORY_MAP: dict[MarketTypeEnum, str] = {
     MarketTypeEnum.SPOT: "spot",
     MarketTypeEnum.FUTURES: "linear",
@@ -24,16 +41,21 @@ BYBIT_TIMEFRAME_MAP: dict[TimeframeEnum, str] = {
 class BybitClient(BaseExchangeClient):
     """Bybit V5 public API client (spot + linear futures)."""
 
+    EXCHANGE = ExchangeEnum.BYBIT
     RATE_LIMIT: float = 10.0
+    DESCENDING_PAGES = True
+    WS_URLS = BYBIT_WS_URLS
+    # Bybit drops connections without a ping every 20 seconds
+    WS_PING_INTERVAL = 20.0
 
     @staticmethod
     async def get_active_symbols(
         market_type: MarketTypeEnum = MarketTypeEnum.FUTURES,
         quote_asset: QuoteAssetEnum = QuoteAssetEnum.USDT,
-    ) -> list[str]:
+    ) -> list[Instrument]:
         category = BYBIT_CATEGORY_MAP[market_type]
         url = f"{BYBIT_BASE_URL}/v5/market/instruments-info"
-        symbols: list[str] = []
+        instruments: list[Instrument] = []
 
         async with httpx.AsyncClient(timeout=30) as client:
             cursor: str | None = None
@@ -55,17 +77,59 @@ class BybitClient(BaseExchangeClient):
 
                 result = body["result"]
                 for item in result["list"]:
-                    sym = item["symbol"]
-                    if sym.endswith(quote_asset.value.upper()):
-                        symbols.append(sym)
+                    if item["quoteCoin"] != quote_asset.value.upper():
+                        continue
+                    # Linear also lists dated futures (BTCUSDT-27JUN25); spot
+                    # has no contractType and no launchTime
+                    if item.get("contractType", "LinearPerpetual") != "LinearPerpetual":
+                        continue
+                    launch_ms = int(item.get("launchTime") or 0)
+                    instruments.append(
+                        Instrument(
+                            symbol=item["symbol"],
+                            base_asset=item["baseCoin"],
+                            quote_asset=item["quoteCoin"],
+                            status=item["status"],
+                            listed_at=(
+                                ms_to_datetime(launch_ms) if launch_ms else None
+                            ),
+                        )
+                    )
 
                 cursor = result.get("nextPageCursor")
                 if not cursor:
                     break
 
-        return symbols
+        return instruments
+
+    async def get_first_candle_time(
+        self,
+        symbol: str,
+        market_type: MarketTypeEnum = MarketTypeEnum.SPOT,
+    ) -> datetime | None:
+        # Pages hold the newest candles of the range, so ask for monthly ones:
+        # a full history fits in one page and the oldest is the listing month
+        params = {
+            "category": BYBIT_CATEGORY_MAP[market_type],
+            "symbol": symbol.upper(),
+            "interval": "M",
+            "limit": self.PAGE_LIMIT,
+            "start": 0,
+        }
+
+        own_client = self._external_client is None
+        client = self._external_client or httpx.AsyncClient(timeout=30)
+        try:
+            data = await self._fetch_klines_page(
+                client, f"{BYBIT_BASE_URL}/v5/market/kline", params
+            )
+        finally:
+            if own_client:
+                await client.aclose()
 
-    _PAGE_LIMIT = 1000
+        if not data:
+            return None
+        return ms_to_datetime(int(data[-1][0]))
 
     async def get_klines(
         self,
@@ -79,14 +143,14 @@ class BybitClient(BaseExchangeClient):
         interval = BYBIT_TIMEFRAME_MAP[timeframe]
         url = f"{BYBIT_BASE_URL}/v5/market/kline"
 
-        start_ms = int(start_time.timestamp() * 1000)
-        current_end_ms = int(end_time.timestamp() * 1000) if end_time else None
+        start_ms = datetime_to_ms(start_time)
+        current_end_ms = datetime_to_ms(end_time) if end_time else None
 
         params: dict = {
             "category": category,
             "symbol": symbol.upper(),
             "interval": interval,
-            "limit": self._PAGE_LIMIT,
+            "limit": self.PAGE_LIMIT,
             "start": start_ms,
         }
 
@@ -102,9 +166,12 @@ class BybitClient(BaseExchangeClient):
                 if not data:
                     break
 
-                yield self._parse_klines(data)
+                self._record_page(market_type, len(data))
+                with self._page_span("parse", params):
+                    klines = self._parse_klines(data)
+                yield klines
 
-                if len(data) < self._PAGE_LIMIT:
+                if len(data) < self.PAGE_LIMIT:
                     break
 
                 # Bybit returns newest first: data[0]=newest, data[-1]=oldest.
@@ -120,8 +187,10 @@ class BybitClient(BaseExchangeClient):
     async def _fetch_klines_page(
         self, client: httpx.AsyncClient, url: str, params: dict
     ) -> list:
-        response = await self._request_with_retry(client, url, params)
-        body = response.json()
+        with self._page_span("fetch_page", params):
+            response = await self._request_with_retry(client, url, params)
+        with self._page_span("decode_json", params):
+            body = response.json()
 
         if body.get("retCode") != 0:
             raise RuntimeError(f"Bybit API error: {body.get('retMsg')}")
@@ -143,7 +212,7 @@ class BybitClient(BaseExchangeClient):
         klines = []
         for item in reversed(data):
             kline = Kline(
-                timestamp=datetime.fromtimestamp(int(item[0]) / 1000),
+                timestamp=ms_to_datetime(int(item[0])),
                 open=float(item[1]),
                 high=float(item[2]),
                 low=float(item[3]),
@@ -152,3 +221,52 @@ class BybitClient(BaseExchangeClient):
             )
             klines.append(kline)
         return klines
+
+    @staticmethod
+    def stream_name(symbol: str, timeframe: TimeframeEnum) -> str:
+        return f"kline.{BYBIT_TIMEFRAME_MAP[timeframe]}.{symbol.upper()}"
+
+    @staticmethod
+    def subscribe_messages(streams: list[str]) -> list[str]:
+        # Spot accepts at most 10 topics per subscribe request
+        return [
+            json.dumps({"op": "subscribe", "args": streams[i : i + 10]})
+            for i in range(0, len(streams), 10)
+        ]
+
+    @staticmethod
+    def parse_stream_message(message: str | bytes) -> list[StreamKline]:
+        """
+        Parse a Bybit V5 kline message; acks and pongs yield nothing.
+
+        {"topic": "kline.60.BTCUSDT", "type": "snapshot", "data": [
+            {"start": 1672324800000, "interval": "60", "open": "16649.5",
+             "close": "16677", "high": "16677", "low": "16608",
+             "volume": "2.081", "confirm": false, ...}
+        ]}
+        """
+        data = json.loads(message)
+        topic = data.get("topic", "")
+        if not topic.startswith("kline."):
+            if data.get("op") == "subscribe" and not data.get("success"):
+                logger.warning("Bybit subscription failed: %s", data.get("ret_msg"))
+            return []
+        return [
+            StreamKline(
+                stream=topic,
+                kline=Kline(
+                    timestamp=ms_to_datetime(int(item["start"])),
+                    open=float(item["open"]),
+                    high=float(item["high"]),
+                    low=float(item["low"]),
+                    close=float(item["close"]),
+                    volume=float(item["volume"]),
+                ),
+                closed=item["confirm"],
+            )
+            for item in data["data"]
+        ]
+
+    @staticmethod
+    def ping_message() -> str | None:
+        return json.dumps({"op": "ping"})
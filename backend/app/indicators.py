@@ -0,0 +1,213 @@
+"""Vectorized technical indicators with resumable state.
+
+Every indicator takes whole NumPy arrays and returns its output arrays plus
+a state object. Passing that state back with the candles that follow
+extends the series without recomputing the history:
+
+    out, state = compute(IndicatorEnum.EMA, {"close": close[:n]}, period=20)
+    more, state = compute(IndicatorEnum.EMA, {"close": close[n:]}, period=20,
+                          state=state)
+    # concatenating out and more equals computing over close at once
+
+Recursive indicators (EMA, RSI, ATR) are evaluated in closed form over
+blocks sized so the decay factors stay in floating point range.
+"""
+
+import math
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.enums import IndicatorEnum
+
+
+@dataclass
+class IndicatorState:
+    """What an indicator needs to continue after the last processed candle."""
+
+    # Last period - 1 inputs, for windowed indicators
+    tail: np.ndarray = field(default_factory=lambda: np.empty(0))
+    # Last smoothed values, for recursive indicators
+    last: dict[str, float] = field(default_factory=dict)
+    prev_close: float = math.nan
+    count: int = 0
+
+
+def _ewm(x: np.ndarray, alpha: float, initial: float | None) -> np.ndarray:
+    """
+    y[t] = alpha * x[t] + (1 - alpha) * y[t-1], with y[-1] = initial.
+
+    With initial None the series is seeded with x[0]. Each block is solved
+    with cumulative sums scaled by (1 - alpha)^-i; the block length keeps
+    that factor below 1e100.
+    """
+    n = len(x)
+    out = np.empty(n)
+    if n == 0:
+        return out
+
+    decay = 1.0 - alpha
+    if initial is None:
+        initial = x[0]
+    if decay == 0.0:
+        return x.astype(np.float64, copy=True)
+
+    block = max(1, int(100 * math.log(10) / -math.log(decay)))
+    prev = initial
+    for start in range(0, n, block):
+        chunk = x[start : start + block]
+        powers = decay ** np.arange(1, len(chunk) + 1)
+        scaled = np.cumsum(alpha * chunk / powers)
+        out[start : start + len(chunk)] = powers * (prev + scaled)
+        prev = out[start + len(chunk) - 1]
+    return out
+
+
+def _with_tail(x: np.ndarray, state: IndicatorState) -> np.ndarray:
+    return np.concatenate([state.tail, x]) if len(state.tail) else x
+
+
+def _rolling_mean(x: np.ndarray, period: int) -> np.ndarray:
+    """Mean of each full window; windows shorter than period are NaN."""
+    out = np.full(len(x), np.nan)
+    if len(x) >= period:
+        sums = np.cumsum(np.concatenate([[0.0], x]))
+        out[period - 1 :] = (sums[period:] - sums[:-period]) / period
+    return out
+
+
+def _warmup(values: np.ndarray, count_before: int, period: int) -> np.ndarray:
+    """Blank out values produced before period inputs were seen."""
+    blank = max(0, min(len(values), period - count_before))
+    values[:blank] = np.nan
+    return values
+
+
+def sma(
+    arrays: dict[str, np.ndarray], period: int, state: IndicatorState | None = None
+) -> tuple[dict[str, np.ndarray], IndicatorState]:
+    state = state or IndicatorState()
+    close = arrays["close"]
+    window = _with_tail(close, state)
+    values = _rolling_mean(window, period)[len(state.tail) :]
+    new_state = IndicatorState(
+        tail=window[-(period - 1) :] if period > 1 else np.empty(0)
+    )
+    return {"sma": values}, new_state
+
+
+def ema(
+    arrays: dict[str, np.ndarray], period: int, state: IndicatorState | None = None
+) -> tuple[dict[str, np.ndarray], IndicatorState]:
+    state = state or IndicatorState()
+    close = arrays["close"]
+    values = _ewm(close, 2.0 / (period + 1), state.last.get("ema"))
+    new_state = IndicatorState(
+        last={"ema": values[-1]} if len(values) else state.last,
+        count=state.count + len(close),
+    )
+    return {"ema": _warmup(values, state.count, period)}, new_state
+
+
+def rsi(
+    arrays: dict[str, np.ndarray], period: int, state: IndicatorState | None = None
+) -> tuple[dict[str, np.ndarray], IndicatorState]:
+    """Wilder's RSI (smoothing factor 1 / period)."""
+    state = state or IndicatorState()
+    close = arrays["close"]
+    if len(close) == 0:
+        return {"rsi": np.empty(0)}, state
+
+    prev = np.concatenate([[state.prev_close], close[:-1]])
+    change = close - prev
+    if state.count == 0:
+        change[0] = 0.0
+    gain = np.clip(change, 0, None)
+    loss = np.clip(-change, 0, None)
+
+    avg_gain = _ewm(gain, 1.0 / period, state.last.get("gain"))
+    avg_loss = _ewm(loss, 1.0 / period, state.last.get("loss"))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    values = np.where(avg_loss == 0, 100.0, values)
+
+    new_state = IndicatorState(
+        last={"gain": avg_gain[-1], "loss": avg_loss[-1]},
+        prev_close=close[-1],
+        count=state.count + len(close),
+    )
+    return {"rsi": _warmup(values, state.count, period + 1)}, new_state
+
+
+def atr(
+    arrays: dict[str, np.ndarray], period: int, state: IndicatorState | None = None
+) -> tuple[dict[str, np.ndarray], IndicatorState]:
+    """Wilder's Average True Range."""
+    state = state or IndicatorState()
+    high, low, close = arrays["high"], arrays["low"], arrays["close"]
+    if len(close) == 0:
+        return {"atr": np.empty(0)}, state
+
+    prev_close = np.concatenate([[state.prev_close], close[:-1]])
+    true_range = np.fmax(
+        high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close))
+    )
+    values = _ewm(true_range, 1.0 / period, state.last.get("atr"))
+
+    new_state = IndicatorState(
+        last={"atr": values[-1]},
+        prev_close=close[-1],
+        count=state.count + len(close),
+    )
+    return {"atr": _warmup(values, state.count, period)}, new_state
+
+
+def bbands(
+    arrays: dict[str, np.ndarray],
+    period: int,
+    std_dev: float = 2.0,
+    state: IndicatorState | None = None,
+) -> tuple[dict[str, np.ndarray], IndicatorState]:
+    """Bollinger Bands: SMA and population standard deviation of the window."""
+    state = state or IndicatorState()
+    close = arrays["close"]
+    window = _with_tail(close, state)
+
+    middle = _rolling_mean(window, period)
+    deviation = np.full(len(window), np.nan)
+    if len(window) >= period:
+        deviation[period - 1 :] = sliding_window_view(window, period).std(axis=1)
+
+    skip = len(state.tail)
+    new_state = IndicatorState(
+        tail=window[-(period - 1) :] if period > 1 else np.empty(0)
+    )
+    return {
+        "middle": middle[skip:],
+        "upper": (middle + std_dev * deviation)[skip:],
+        "lower": (middle - std_dev * deviation)[skip:],
+    }, new_state
+
+
+INDICATORS: dict[IndicatorEnum, Callable] = {
+    IndicatorEnum.SMA: sma,
+    IndicatorEnum.EMA: ema,
+    IndicatorEnum.RSI: rsi,
+    IndicatorEnum.ATR: atr,
+    IndicatorEnum.BBANDS: bbands,
+}
+
+
+def compute(
+    indicator: IndicatorEnum,
+    arrays: dict[str, np.ndarray],
+    period: int,
+    std_dev: float = 2.0,
+    state: IndicatorState | None = None,
+) -> tuple[dict[str, np.ndarray], IndicatorState]:
+    """Run an indicator over new candles, continuing from state if given."""
+    if indicator == IndicatorEnum.BBANDS:
+        return bbands(arrays, period, std_dev, state)
+    return INDICATORS[indicator](arrays, period, state)
@@ -1,21 +1,54 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from app.api.routes import klines, symbols
+from app.api.routes import klines, metrics, symbols
+from app.config import settings
+from app.metrics import MetricsMiddleware
+from app.services.cache import listen_for_invalidations
+from app.services.recent import recent_candles
+from app.tracing import TracingMiddleware, setup_tracing
 
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Keep a LISTEN connection for cache invalidation while the app runs
+    (connecting in the background, so the app starts with the database
+    down), and warm the recent candle cache in the background.
+    """
+    setup_tracing("api")
+    listener = asyncio.create_task(listen_for_invalidations())
+    warming = None
+    if settings.RECENT_CACHE_WARM:
+        warming = asyncio.create_task(recent_candles.warm())
+    try:
+        yield
+    finally:
+        if warming is not None:
+            warming.cancel()
+        listener.cancel()
+
+
 app = FastAPI(
     title="Crypto History Collector",
     version="0.1.0",
     description="FastAPI application for collecting historical crypto exchange data.",
+    lifespan=lifespan,
 )
 
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+
 # Include API routes
 app.include_router(symbols.router)
 app.include_router(klines.router)
+app.include_router(metrics.router)
 
 
 @app.get("/", tags=["root"])
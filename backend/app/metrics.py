@@ -0,0 +1,229 @@
+"""Prometheus metrics for the exchange clients and streams, the write path, the DB pool and the API.
+
+The API serves them at GET /metrics. Scripts wrap their run in
+script_metrics(), which exposes them on METRICS_PORT and/or pushes them to
+METRICS_PUSHGATEWAY when those settings are set.
+"""
+
+import logging
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    push_to_gateway,
+    start_http_server,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from app.config import settings
+from app.db.session import async_engine
+
+
+logger = logging.getLogger(__name__)
+
+# Sub-millisecond buckets for local work, up to tens of seconds for retries
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+# Seconds to hours, for lags behind candle closes
+FRESHNESS_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 14400)
+
+EXCHANGE_REQUEST_SECONDS = Histogram(
+    "exchange_request_seconds",
+    "Exchange HTTP request latency, one observation per attempt",
+    ["exchange", "endpoint"],
+    buckets=LATENCY_BUCKETS,
+)
+EXCHANGE_RESPONSES = Counter(
+    "exchange_responses_total",
+    "Exchange HTTP responses by status code ('transport' for connection errors)",
+    ["exchange", "status"],
+)
+EXCHANGE_RETRIES = Counter(
+    "exchange_retries_total",
+    "Exchange requests retried, by the status code or 'transport' that caused it",
+    ["exchange", "reason"],
+)
+RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "exchange_rate_limit_wait_seconds",
+    "Time spent waiting for the client rate limiter before a request",
+    ["exchange"],
+    buckets=LATENCY_BUCKETS,
+)
+PAGES_FETCHED = Counter(
+    "exchange_pages_fetched_total",
+    "Kline pages fetched from exchanges",
+    ["exchange", "market_type"],
+)
+CANDLES_FETCHED = Counter(
+    "exchange_candles_fetched_total",
+    "Candles fetched from exchanges",
+    ["exchange", "market_type"],
+)
+SAVE_KLINES_SECONDS = Histogram(
+    "save_klines_seconds",
+    "Duration of KlinesRepository.save_klines, including the commit",
+    ["timeframe"],
+    buckets=LATENCY_BUCKETS,
+)
+CANDLES_INSERTED = Counter(
+    "candles_inserted_total",
+    "Candles inserted by save_klines",
+    ["timeframe"],
+)
+CANDLES_REVISED = Counter(
+    "candles_revised_total",
+    "Candles stored while forming that save_klines overwrote with the closed candle",
+    ["timeframe"],
+)
+CANDLES_SKIPPED = Counter(
+    "candles_skipped_total",
+    "Candles passed to save_klines but not written (duplicates, forming or cold tier)",
+    ["timeframe"],
+)
+STREAM_CANDLES = Counter(
+    "exchange_stream_candles_total",
+    "Closed candles received from exchange kline WebSocket streams",
+    ["exchange", "market_type"],
+)
+STREAM_RECONNECTS = Counter(
+    "exchange_stream_reconnects_total",
+    "Exchange WebSocket connections lost and reopened",
+    ["exchange", "market_type"],
+)
+SYNC_JOBS = Counter(
+    "collection_sync_jobs_total",
+    "Scheduled incremental syncs by result (ok, error, or coalesced into a queued one)",
+    ["exchange", "timeframe", "result"],
+)
+SYNC_CLOSE_DELAY_SECONDS = Histogram(
+    "collection_sync_close_delay_seconds",
+    "Time from a candle close to the end of the scheduled sync that followed it",
+    ["exchange", "timeframe"],
+    buckets=FRESHNESS_BUCKETS,
+)
+SYNC_QUEUE_JOBS = Gauge(
+    "collection_sync_queue_jobs",
+    "Scheduled syncs waiting for a worker",
+    ["exchange"],
+)
+FRESHNESS_LAG_SECONDS = Gauge(
+    "series_freshness_lag_seconds",
+    "Time the oldest closed candle missing from a series has been closed",
+    ["exchange", "market_type", "timeframe", "symbol"],
+)
+SERIES_OVER_FRESHNESS_TARGET = Gauge(
+    "series_over_freshness_target",
+    "Series lagging more than FRESHNESS_TARGET_SECONDS behind candle closes",
+    ["exchange", "market_type", "timeframe"],
+)
+API_REQUEST_SECONDS = Histogram(
+    "api_request_seconds",
+    "API request latency until the response body is sent, by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+class PoolCollector(Collector):
+    """Connection pool usage of the async engine, read at scrape time."""
+
+    def collect(self):
+        pool = async_engine.pool
+        metric = GaugeMetricFamily(
+            "db_pool_connections", "Async engine pool connections", labels=["state"]
+        )
+        metric.add_metric(["checked_out"], pool.checkedout())
+        metric.add_metric(["idle"], pool.checkedin())
+        metric.add_metric(["overflow"], max(pool.overflow(), 0))
+        yield metric
+        yield GaugeMetricFamily(
+            "db_pool_size", "Async engine pool size (excluding overflow)", pool.size()
+        )
+
+
+REGISTRY.register(PoolCollector())
+
+
+def metrics_payload() -> tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by method, route and status.
+
+    Pure ASGI rather than BaseHTTPMiddleware, so streamed responses are timed
+    to their last chunk and nothing is buffered.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The matched route's template keeps label cardinality bounded
+            route = scope.get("route")
+            API_REQUEST_SECONDS.labels(
+                scope["method"], route.path if route else "unmatched", status
+            ).observe(time.perf_counter() - started)
+
+
+@contextmanager
+def script_metrics(job: str) -> Iterator[None]:
+    """
+    Expose metrics while a script runs (METRICS_PORT) and push the final
+    values when it ends (METRICS_PUSHGATEWAY). Does nothing if neither is set.
+    """
+    if settings.METRICS_PORT is not None:
+        start_http_server(settings.METRICS_PORT)
+        logger.info("Serving metrics on :%d/metrics", settings.METRICS_PORT)
+    try:
+        yield
+    finally:
+        if settings.METRICS_PUSHGATEWAY:
+            try:
+                push_to_gateway(
+                    settings.METRICS_PUSHGATEWAY, job=job, registry=REGISTRY
+                )
+            except OSError as e:
+                logger.warning("Could not push metrics: %s", e)
@@ -0,0 +1,219 @@
+from datetime import UTC, datetime
+
+from sqlalchemy import BigInteger, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import Exchange, ExchangeSymbol, MarketType, SeriesCoverage, Symbol
+from app.enums import TIMEFRAME_DELTA, ExchangeEnum, MarketTypeEnum, TimeframeEnum
+
+
+class CoverageRepository:
+    """Repository for the per-series coverage summary."""
+
+    @staticmethod
+    async def update_coverage(
+        session: AsyncSession,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        inserted_timestamps: list[datetime],
+    ) -> None:
+        """
+        Merge newly inserted candle timestamps into the series coverage row.
+
+        Must be called in the same transaction as the insert, with only the
+        timestamps that were actually inserted (duplicates excluded), so that
+        candle_count stays exact.
+        """
+        if not inserted_timestamps:
+            return
+
+        step_seconds = int(TIMEFRAME_DELTA[timeframe].total_seconds())
+        first_ts = min(inserted_timestamps)
+        last_ts = max(inserted_timestamps)
+        count = len(inserted_timestamps)
+
+        stmt = insert(SeriesCoverage).values(
+            exchange_symbol_id=exchange_symbol_id,
+            timeframe=timeframe.value,
+            first_ts=first_ts,
+            last_ts=last_ts,
+            candle_count=count,
+            gap_count=int((last_ts - first_ts).total_seconds()) // step_seconds
+            + 1
+            - count,
+        )
+
+        new_first_ts = func.least(SeriesCoverage.first_ts, stmt.excluded.first_ts)
+        new_last_ts = func.greatest(SeriesCoverage.last_ts, stmt.excluded.last_ts)
+        new_count = SeriesCoverage.candle_count + stmt.excluded.candle_count
+        span_seconds = func.extract("epoch", new_last_ts - new_first_ts).cast(
+            BigInteger
+        )
+
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_series_coverage",
+            set_={
+                "first_ts": new_first_ts,
+                "last_ts": new_last_ts,
+                "candle_count": new_count,
+                "gap_count": span_seconds // step_seconds + 1 - new_count,
+                "updated_at": datetime.now(UTC),
+            },
+        )
+        await session.execute(stmt)
+
+    @staticmethod
+    async def get_cold_until(
+        session: AsyncSession,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+    ) -> datetime | None:
+        """Return the cold tier boundary of a series, None if nothing is cold."""
+        stmt = select(SeriesCoverage.cold_until).where(
+            SeriesCoverage.exchange_symbol_id == exchange_symbol_id,
+            SeriesCoverage.timeframe == timeframe.value,
+        )
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def get_cold_until_many(
+        session: AsyncSession,
+        exchange_symbol_ids: list[int],
+        timeframe: TimeframeEnum,
+    ) -> dict[int, datetime]:
+        """Return cold tier boundaries by exchange_symbol_id for series that have one."""
+        stmt = select(
+            SeriesCoverage.exchange_symbol_id, SeriesCoverage.cold_until
+        ).where(
+            SeriesCoverage.exchange_symbol_id.in_(exchange_symbol_ids),
+            SeriesCoverage.timeframe == timeframe.value,
+            SeriesCoverage.cold_until.is_not(None),
+        )
+        result = await session.execute(stmt)
+        return dict(result.all())
+
+    @staticmethod
+    async def mark_cold(
+        session: AsyncSession,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        cold_until: datetime,
+        moved_count: int,
+    ) -> None:
+        """Advance the cold tier boundary after candles were moved to Parquet."""
+        stmt = (
+            update(SeriesCoverage)
+            .where(
+                SeriesCoverage.exchange_symbol_id == exchange_symbol_id,
+                SeriesCoverage.timeframe == timeframe.value,
+            )
+            .values(
+                cold_until=cold_until,
+                cold_count=SeriesCoverage.cold_count + moved_count,
+            )
+        )
+        await session.execute(stmt)
+
+    @staticmethod
+    async def get_tier_totals(session: AsyncSession) -> tuple[int, int]:
+        """Return (cold candle count, total candle count) across all series."""
+        stmt = select(
+            func.coalesce(func.sum(SeriesCoverage.cold_count), 0),
+            func.coalesce(func.sum(SeriesCoverage.candle_count), 0),
+        )
+        result = await session.execute(stmt)
+        cold_count, total_count = result.one()
+        return int(cold_count), int(total_count)
+
+    @staticmethod
+    async def get_coverage(
+        session: AsyncSession,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol_name: str | None = None,
+        timeframe: TimeframeEnum | None = None,
+    ) -> list[dict]:
+        """
+        Get coverage rows for an exchange and market type.
+
+        Args:
+            session: Async database session
+            exchange: Exchange enum
+            market_type: Market type enum
+            symbol_name: Optional symbol filter
+            timeframe: Optional timeframe filter
+
+        Returns:
+            List of dicts with exchange_symbol_id, symbol, timeframe,
+            first_ts, last_ts, candle_count, gap_count and cold_until
+        """
+        stmt = (
+            select(
+                SeriesCoverage.exchange_symbol_id,
+                Symbol.name.label("symbol"),
+                SeriesCoverage.timeframe,
+                SeriesCoverage.first_ts,
+                SeriesCoverage.last_ts,
+                SeriesCoverage.candle_count,
+                SeriesCoverage.gap_count,
+                SeriesCoverage.cold_until,
+            )
+            .join(
+                ExchangeSymbol, ExchangeSymbol.id == SeriesCoverage.exchange_symbol_id
+            )
+            .join(Exchange, Exchange.id == ExchangeSymbol.exchange_id)
+            .join(MarketType, MarketType.id == ExchangeSymbol.market_type_id)
+            .join(Symbol, Symbol.id == ExchangeSymbol.symbol_id)
+            .where(
+                Exchange.name == exchange.value,
+                MarketType.name == market_type.value,
+            )
+            .order_by(Symbol.name, SeriesCoverage.timeframe)
+        )
+        if symbol_name is not None:
+            stmt = stmt.where(Symbol.name == symbol_name)
+        if timeframe is not None:
+            stmt = stmt.where(SeriesCoverage.timeframe == timeframe.value)
+
+        result = await session.execute(stmt)
+        return [dict(row) for row in result.mappings().all()]
+
+    @staticmethod
+    async def get_active_series(session: AsyncSession) -> list[dict]:
+        """
+        Get the stored series of active symbols on every exchange and market.
+
+        Returns:
+            List of dicts with exchange, market_type, symbol,
+            exchange_symbol_id and timeframe (as enums)
+        """
+        stmt = (
+            select(
+                Exchange.name,
+                MarketType.name,
+                Symbol.name,
+                SeriesCoverage.exchange_symbol_id,
+                SeriesCoverage.timeframe,
+            )
+            .join(
+                ExchangeSymbol, ExchangeSymbol.id == SeriesCoverage.exchange_symbol_id
+            )
+            .join(Exchange, Exchange.id == ExchangeSymbol.exchange_id)
+            .join(MarketType, MarketType.id == ExchangeSymbol.market_type_id)
+            .join(Symbol, Symbol.id == ExchangeSymbol.symbol_id)
+            .where(ExchangeSymbol.is_active == True)  # noqa: E712
+            .order_by(SeriesCoverage.exchange_symbol_id, SeriesCoverage.timeframe)
+        )
+        result = await session.execute(stmt)
+        return [
+            {
+                "exchange": ExchangeEnum(exchange),
+                "market_type": MarketTypeEnum(market_type),
+                "symbol": symbol,
+                "exchange_symbol_id": exchange_symbol_id,
+                "timeframe": TimeframeEnum(timeframe),
+            }
+            for exchange, market_type, symbol, exchange_symbol_id, timeframe in result.all()
+        ]
@@ -1,10 +1,42 @@
-from sqlalchemy import select
+import asyncio
+import time
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from datetime import UTC, datetime
+
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    Integer,
+    Select,
+    column,
+    delete,
+    func,
+    literal_column,
+    select,
+    values,
+)
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
 from app.db import Candle, Exchange, ExchangeSymbol, MarketType, Symbol
-from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.enums import CandleFieldEnum, ExchangeEnum, MarketTypeEnum, TimeframeEnum
 from app.exchanges.base import Kline
+from app.metrics import (
+    CANDLES_INSERTED,
+    CANDLES_REVISED,
+    CANDLES_SKIPPED,
+    SAVE_KLINES_SECONDS,
+)
+from app.repositories.coverage import CoverageRepository
+from app.services.timeframes import current_candle_open
+from app.storage.columnar import columnar_store
+from app.tracing import tracer
+
+
+# NOTIFY channel for committed candle inserts, payload
+# "exchange_symbol_id,timeframe,first_ts,last_ts"
+CANDLES_WRITTEN_CHANNEL = "candles_written"
 
 
 class KlinesRepository:
@@ -15,10 +47,12 @@ class KlinesRepository:
         exchange: ExchangeEnum,
         market_type: MarketTypeEnum,
         symbol_name: str,
+        active_only: bool = True,
     ) -> int | None:
         """Resolve exchange_symbol_id from exchange + market_type + symbol name.
 
-        Returns the id if found and active, None otherwise.
+        Returns the id if found (and active, unless active_only is False),
+        None otherwise.
         """
         stmt = (
             select(ExchangeSymbol.id)
@@ -29,12 +63,44 @@ class KlinesRepository:
                 Exchange.name == exchange.value,
                 MarketType.name == market_type.value,
                 Symbol.name == symbol_name,
-                ExchangeSymbol.is_active == True,  # noqa: E712
             )
         )
+        if active_only:
+            stmt = stmt.where(ExchangeSymbol.is_active == True)  # noqa: E712
         result = await session.execute(stmt)
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def resolve_exchange_symbols(
+        session: AsyncSession,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol_names: list[str] | None = None,
+    ) -> list[tuple[int, str]]:
+        """
+        Resolve (exchange_symbol_id, symbol name) pairs ordered by name.
+
+        With symbol_names, returns those that exist (active or not); without,
+        returns all active symbols.
+        """
+        stmt = (
+            select(ExchangeSymbol.id, Symbol.name)
+            .join(Exchange, Exchange.id == ExchangeSymbol.exchange_id)
+            .join(MarketType, MarketType.id == ExchangeSymbol.market_type_id)
+            .join(Symbol, Symbol.id == ExchangeSymbol.symbol_id)
+            .where(
+                Exchange.name == exchange.value,
+                MarketType.name == market_type.value,
+            )
+            .order_by(Symbol.name)
+        )
+        if symbol_names:
+            stmt = stmt.where(Symbol.name.in_(symbol_names))
+        else:
+            stmt = stmt.where(ExchangeSymbol.is_active == True)  # noqa: E712
+        result = await session.execute(stmt)
+        return [(es_id, name) for es_id, name in result.all()]
+
     @staticmethod
     async def save_klines(
         session: AsyncSession,
@@ -42,34 +108,487 @@ class KlinesRepository:
         timeframe: TimeframeEnum,
         klines: list[Kline],
     ) -> int:
-        """Bulk insert klines, skipping duplicates. Returns count of inserted rows."""
-        if not klines:
-            return 0
+        """
+        Bulk insert closed klines. Returns count of inserted rows.
+
+        Candles still forming (opened at or after current_candle_open) are
+        held out, so every stored candle is closed and immutable: existing
+        closed rows are never rewritten. Only rows stored while forming
+        (closed is false, from before they were held out) are overwritten
+        and closed, counted as revised. Kline timestamps and
+        current_candle_open are both naive UTC, so the hold-out does not
+        depend on the host's timezone.
 
-        rows = [
-            {
+        Series coverage is updated in the same transaction from the timestamps
+        actually inserted, and a CANDLES_WRITTEN_CHANNEL notification covering
+        inserts and revisions is sent on commit. The committed inserts are
+        then appended to the columnar store, if enabled (a revision removes
+        the series from it).
+        """
+        started = time.perf_counter()
+        received = len(klines)
+        with tracer.start_as_current_span(
+            "save_klines",
+            attributes={
                 "exchange_symbol_id": exchange_symbol_id,
                 "timeframe": timeframe.value,
-                "timestamp": k.timestamp,
-                "open": k.open,
-                "high": k.high,
-                "low": k.low,
-                "close": k.close,
-                "volume": k.volume,
-            }
-            for k in klines
-        ]
-
-        batch_size = 3000
-        total_inserted = 0
-        for i in range(0, len(rows), batch_size):
-            batch = rows[i : i + batch_size]
-            stmt = (
-                insert(Candle)
-                .values(batch)
-                .on_conflict_do_nothing(constraint="uq_candle")
+                "candles": received,
+            },
+        ) as span:
+            forming_open = current_candle_open(timeframe)
+            klines = [k for k in klines if k.timestamp < forming_open]
+
+            cold_until = await CoverageRepository.get_cold_until(
+                session, exchange_symbol_id, timeframe
+            )
+            if cold_until is not None:
+                # Candles before the boundary already live in the cold tier
+                klines = [k for k in klines if k.timestamp >= cold_until]
+
+            if not klines:
+                CANDLES_SKIPPED.labels(timeframe.value).inc(received)
+                return 0
+
+            with tracer.start_as_current_span("build_rows"):
+                rows = [
+                    {
+                        "exchange_symbol_id": exchange_symbol_id,
+                        "timeframe": timeframe.value,
+                        "timestamp": k.timestamp,
+                        "open": k.open,
+                        "high": k.high,
+                        "low": k.low,
+                        "close": k.close,
+                        "volume": k.volume,
+                    }
+                    for k in klines
+                ]
+
+            batch_size = 3000
+            inserted_timestamps: list = []
+            revised_timestamps: list = []
+            for i in range(0, len(rows), batch_size):
+                batch = rows[i : i + batch_size]
+                with tracer.start_as_current_span(
+                    "execute_insert", attributes={"rows": len(batch)}
+                ):
+                    stmt = insert(Candle).values(batch)
+                    stmt = stmt.on_conflict_do_update(
+                        constraint="uq_candle",
+                        set_={
+                            **{
+                                name: stmt.excluded[name]
+                                for name in ("open", "high", "low", "close", "volume")
+                            },
+                            "closed": True,
+                            "updated_at": datetime.now(UTC),
+                        },
+                        # Closed rows are final; conflicts with them are skipped
+                        where=~Candle.closed,
+                    ).returning(
+                        Candle.timestamp,
+                        # xmax is 0 for inserted rows, set for updated ones
+                        literal_column("xmax = 0", type_=Boolean),
+                    )
+                    result = await session.execute(stmt)
+                    for timestamp, was_inserted in result.all():
+                        if was_inserted:
+                            inserted_timestamps.append(timestamp)
+                        else:
+                            revised_timestamps.append(timestamp)
+
+            written_timestamps = inserted_timestamps + revised_timestamps
+            with tracer.start_as_current_span("update_coverage"):
+                await CoverageRepository.update_coverage(
+                    session=session,
+                    exchange_symbol_id=exchange_symbol_id,
+                    timeframe=timeframe,
+                    inserted_timestamps=inserted_timestamps,
+                )
+                if written_timestamps:
+                    # Delivered to listeners only on commit
+                    payload = (
+                        f"{exchange_symbol_id},{timeframe.value},"
+                        f"{min(written_timestamps).isoformat()},"
+                        f"{max(written_timestamps).isoformat()}"
+                    )
+                    await session.execute(
+                        select(func.pg_notify(CANDLES_WRITTEN_CHANNEL, payload))
+                    )
+            with tracer.start_as_current_span("commit"):
+                await session.commit()
+
+            if columnar_store is not None and written_timestamps:
+                with tracer.start_as_current_span("columnar_append"):
+                    # In a thread: both wait for the series lock
+                    if revised_timestamps:
+                        await asyncio.to_thread(
+                            columnar_store.remove, exchange_symbol_id, timeframe
+                        )
+                    inserted_set = set(inserted_timestamps)
+                    await asyncio.to_thread(
+                        columnar_store.append,
+                        exchange_symbol_id,
+                        timeframe,
+                        [
+                            (k.timestamp, k.open, k.high, k.low, k.close, k.volume)
+                            for k in klines
+                            if k.timestamp in inserted_set
+                        ],
+                    )
+
+            inserted = len(inserted_timestamps)
+            revised = len(revised_timestamps)
+            span.set_attribute("inserted", inserted)
+            span.set_attribute("revised", revised)
+
+        SAVE_KLINES_SECONDS.labels(timeframe.value).observe(
+            time.perf_counter() - started
+        )
+        CANDLES_INSERTED.labels(timeframe.value).inc(inserted)
+        CANDLES_REVISED.labels(timeframe.value).inc(revised)
+        CANDLES_SKIPPED.labels(timeframe.value).inc(received - inserted - revised)
+        return inserted
+
+    @staticmethod
+    async def get_unclosed_starts(
+        session: AsyncSession,
+        exchange_symbol_ids: list[int],
+        timeframe: TimeframeEnum | None = None,
+    ) -> dict[tuple[int, str], datetime]:
+        """
+        Oldest candle stored while still forming, by (exchange_symbol_id,
+        timeframe), for series that have one.
+
+        Syncs start there, so those candles are fetched again and closed.
+        """
+        stmt = (
+            select(
+                Candle.exchange_symbol_id,
+                Candle.timeframe,
+                func.min(Candle.timestamp),
+            )
+            .where(
+                Candle.exchange_symbol_id.in_(exchange_symbol_ids),
+                ~Candle.closed,
+            )
+            .group_by(Candle.exchange_symbol_id, Candle.timeframe)
+        )
+        if timeframe is not None:
+            stmt = stmt.where(Candle.timeframe == timeframe.value)
+        result = await session.execute(stmt)
+        return {(es_id, tf): ts for es_id, tf, ts in result.all()}
+
+    @staticmethod
+    async def get_klines(
+        session: AsyncSession,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+        limit: int | None = None,
+    ) -> list:
+        """
+        Get candles in [start_time, end_time) from the hot table, oldest first.
+
+        Returns:
+            List of (timestamp, open, high, low, close, volume) rows
+        """
+        stmt = KlinesRepository._range_query(
+            exchange_symbol_id, timeframe, start_time, end_time
+        )
+        if limit is not None:
+            stmt = stmt.limit(limit)
+
+        result = await session.execute(stmt)
+        return list(result.all())
+
+    @staticmethod
+    async def get_recent_klines(
+        session: AsyncSession,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        limit: int,
+        after: datetime | None = None,
+    ) -> list:
+        """
+        Get the newest `limit` candles from the hot table (only those after
+        `after`, if given), oldest first.
+
+        Returns:
+            List of (timestamp, open, high, low, close, volume) rows
+        """
+        stmt = (
+            KlinesRepository._range_query(exchange_symbol_id, timeframe, None, None)
+            .order_by(None)
+            .order_by(Candle.timestamp.desc())
+            .limit(limit)
+        )
+        if after is not None:
+            stmt = stmt.where(Candle.timestamp > after)
+
+        result = await session.execute(stmt)
+        return list(reversed(result.all()))
+
+    @staticmethod
+    async def stream_klines(
+        session: AsyncSession,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+        chunk_size: int = 5000,
+    ) -> AsyncGenerator[list, None]:
+        """
+        Stream candles in [start_time, end_time) through a server-side cursor.
+
+        Yields lists of at most chunk_size (timestamp, open, high, low, close,
+        volume) rows, oldest first, so memory stays constant for any range.
+        """
+        stmt = KlinesRepository._range_query(
+            exchange_symbol_id, timeframe, start_time, end_time
+        ).execution_options(yield_per=chunk_size)
+
+        result = await session.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+
+    @staticmethod
+    async def copy_klines_csv(
+        session: AsyncSession,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        ticker: str,
+        output: Callable[[bytes], Awaitable],
+        start_time: datetime | None = None,
+    ) -> int:
+        """
+        Stream candles from start_time on as CSV rows with COPY ... TO STDOUT.
+
+        Rows are Date (YYYY-MM-DD HH:MM:SS), ticker, open, high, low, close,
+        volume, oldest first, formatted by Postgres and passed to output in
+        chunks without building Python row objects.
+
+        Returns:
+            Number of rows copied
+        """
+        connection = await session.connection()
+        raw = await connection.get_raw_connection()
+        status = await raw.driver_connection.copy_from_query(
+            "SELECT to_char(timestamp, 'YYYY-MM-DD HH24:MI:SS'), $1::text, "
+            "open, high, low, close, volume FROM candles "
+            "WHERE exchange_symbol_id = $2 AND timeframe = $3 AND timestamp >= $4 "
+            "ORDER BY timestamp",
+            ticker,
+            exchange_symbol_id,
+            timeframe.value,
+            start_time or datetime.min,
+            output=output,
+            format="csv",
+        )
+        return int(status.split()[-1])
+
+    @staticmethod
+    async def get_panel_rows(
+        session: AsyncSession,
+        exchange_symbol_ids: list[int],
+        timeframe: TimeframeEnum,
+        fields: list[CandleFieldEnum],
+        start_time: datetime,
+        end_time: datetime,
+    ) -> list:
+        """
+        Get candles of many series in [start_time, end_time) in one query.
+
+        Returns:
+            List of (exchange_symbol_id, timestamp, *fields) rows, unordered
+        """
+        stmt = select(
+            Candle.exchange_symbol_id,
+            Candle.timestamp,
+            *(getattr(Candle, field.value) for field in fields),
+        ).where(
+            Candle.exchange_symbol_id.in_(exchange_symbol_ids),
+            Candle.timeframe == timeframe.value,
+            Candle.timestamp >= start_time,
+            Candle.timestamp < end_time,
+        )
+        result = await session.execute(stmt)
+        return list(result.all())
+
+    @staticmethod
+    async def get_quote_volumes(
+        session: AsyncSession,
+        exchange_symbol_ids: list[int],
+        timeframe: TimeframeEnum,
+        start_time: datetime,
+    ) -> dict[int, float]:
+        """Traded quote volume (close x volume) per series since start_time."""
+        stmt = (
+            select(
+                Candle.exchange_symbol_id,
+                func.sum(Candle.close * Candle.volume),
+            )
+            .where(
+                Candle.exchange_symbol_id.in_(exchange_symbol_ids),
+                Candle.timeframe == timeframe.value,
+                Candle.timestamp >= start_time,
+            )
+            .group_by(Candle.exchange_symbol_id)
+        )
+        result = await session.execute(stmt)
+        return {es_id: float(volume or 0.0) for es_id, volume in result.all()}
+
+    @staticmethod
+    async def get_aligned_rows(
+        session: AsyncSession,
+        series_ids: list[list[int]],
+        starts: list[datetime],
+        timeframe: TimeframeEnum,
+        field: CandleFieldEnum,
+        end_time: datetime | None = None,
+    ) -> list:
+        """
+        Join several series on timestamp in one query.
+
+        Args:
+            series_ids: Per group, the exchange_symbol_ids to align (one per leg)
+            starts: Per group, the first timestamp to include
+            end_time: Range end (exclusive)
+
+        Returns:
+            List of (group index, timestamp, value per leg) rows for
+            timestamps present in every series of the group, ordered by
+            group and timestamp
+        """
+        n_legs = len(series_ids[0])
+        groups = values(
+            column("idx", Integer),
+            column("start_time", DateTime),
+            *(column(f"id{leg}", Integer) for leg in range(n_legs)),
+            name="groups",
+        ).data(
+            [
+                (idx, start, *ids)
+                for idx, (ids, start) in enumerate(zip(series_ids, starts))
+            ]
+        )
+
+        legs = [aliased(Candle, name=f"c{leg}") for leg in range(n_legs)]
+        base = legs[0]
+        stmt = (
+            select(
+                groups.c.idx,
+                base.timestamp,
+                *(getattr(leg, field.value) for leg in legs),
+            )
+            .select_from(groups)
+            .join(
+                base,
+                (base.exchange_symbol_id == groups.c.id0)
+                & (base.timeframe == timeframe.value)
+                & (base.timestamp >= groups.c.start_time),
+            )
+            .order_by(groups.c.idx, base.timestamp)
+        )
+        for n, leg in enumerate(legs[1:], start=1):
+            stmt = stmt.join(
+                leg,
+                (leg.exchange_symbol_id == groups.c[f"id{n}"])
+                & (leg.timeframe == timeframe.value)
+                & (leg.timestamp == base.timestamp),
             )
-            result = await session.execute(stmt)
-            total_inserted += result.rowcount
-        await session.commit()
-        return total_inserted
+        if end_time is not None:
+            stmt = stmt.where(base.timestamp < end_time)
+
+        result = await session.execute(stmt)
+        return list(result.all())
+
+    @staticmethod
+    def _range_query(
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        start_time: datetime | None,
+        end_time: datetime | None,
+    ) -> Select:
+        stmt = (
+            select(
+                Candle.timestamp,
+                Candle.open,
+                Candle.high,
+                Candle.low,
+                Candle.close,
+                Candle.volume,
+            )
+            .where(
+                Candle.exchange_symbol_id == exchange_symbol_id,
+                Candle.timeframe == timeframe.value,
+            )
+            .order_by(Candle.timestamp)
+        )
+        if start_time is not None:
+            stmt = stmt.where(Candle.timestamp >= start_time)
+        if end_time is not None:
+            stmt = stmt.where(Candle.timestamp < end_time)
+        return stmt
+
+    @staticmethod
+    async def get_year_counts(
+        session: AsyncSession,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        after: datetime | None = None,
+    ) -> dict[int, int]:
+        """
+        Count stored candles per calendar year, optionally only those with
+        timestamp > after.
+        """
+        year = func.extract("year", Candle.timestamp).cast(Integer)
+        stmt = (
+            select(year, func.count())
+            .where(
+                Candle.exchange_symbol_id == exchange_symbol_id,
+                Candle.timeframe == timeframe.value,
+            )
+            .group_by(year)
+        )
+        if after is not None:
+            stmt = stmt.where(Candle.timestamp > after)
+        result = await session.execute(stmt)
+        return dict(result.all())
+
+    @staticmethod
+    async def get_first_timestamp(
+        session: AsyncSession,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        start_time: datetime | None = None,
+    ) -> datetime | None:
+        """Get the oldest hot candle timestamp at or after start_time."""
+        stmt = select(func.min(Candle.timestamp)).where(
+            Candle.exchange_symbol_id == exchange_symbol_id,
+            Candle.timeframe == timeframe.value,
+        )
+        if start_time is not None:
+            stmt = stmt.where(Candle.timestamp >= start_time)
+
+        result = await session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def delete_klines(
+        session: AsyncSession,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        start_time: datetime,
+        end_time: datetime,
+    ) -> int:
+        """Delete candles in [start_time, end_time). Returns count of deleted rows."""
+        stmt = delete(Candle).where(
+            Candle.exchange_symbol_id == exchange_symbol_id,
+            Candle.timeframe == timeframe.value,
+            Candle.timestamp >= start_time,
+            Candle.timestamp < end_time,
+        )
+        result = await session.execute(stmt)
+        return result.rowcount
@@ -0,0 +1,248 @@
+from datetime import UTC, datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import (
+    Candle,
+    CandleAnomaly,
+    Exchange,
+    ExchangeSymbol,
+    MarketType,
+    QualityCheckpoint,
+    Symbol,
+)
+from app.enums import (
+    TIMEFRAME_DELTA,
+    AnomalyRuleEnum,
+    ExchangeEnum,
+    MarketTypeEnum,
+    TimeframeEnum,
+)
+
+
+class QualityRepository:
+
+    @staticmethod
+    async def get_series_summary(
+        session: AsyncSession,
+        exchange_symbol_ids: list[int],
+        timeframe: TimeframeEnum,
+    ) -> list:
+        """
+        Summarize many series in one query.
+
+        Returns:
+            List of (exchange_symbol_id, candle count, first timestamp, last
+            timestamp, candles off the timeframe grid) rows
+        """
+        step_seconds = int(TIMEFRAME_DELTA[timeframe].total_seconds())
+        off_grid = func.extract("epoch", Candle.timestamp) % step_seconds != 0
+        stmt = (
+            select(
+                Candle.exchange_symbol_id,
+                func.count(),
+                func.min(Candle.timestamp),
+                func.max(Candle.timestamp),
+                func.count().filter(off_grid),
+            )
+            .where(
+                Candle.exchange_symbol_id.in_(exchange_symbol_ids),
+                Candle.timeframe == timeframe.value,
+            )
+            .group_by(Candle.exchange_symbol_id)
+        )
+        result = await session.execute(stmt)
+        return list(result.all())
+
+    @staticmethod
+    async def find_gaps(
+        session: AsyncSession,
+        exchange_symbol_ids: list[int],
+        timeframe: TimeframeEnum,
+    ) -> list[tuple[int, datetime, datetime]]:
+        """
+        Find consecutive candles more or less than one timeframe apart, for
+        many series in one pass with LAG.
+
+        Returns:
+            List of (exchange_symbol_id, previous timestamp, timestamp) rows,
+            ordered by series and time
+        """
+        prev_ts = (
+            func.lag(Candle.timestamp)
+            .over(partition_by=Candle.exchange_symbol_id, order_by=Candle.timestamp)
+            .label("prev_ts")
+        )
+        candles = (
+            select(Candle.exchange_symbol_id, Candle.timestamp, prev_ts)
+            .where(
+                Candle.exchange_symbol_id.in_(exchange_symbol_ids),
+                Candle.timeframe == timeframe.value,
+            )
+            .subquery()
+        )
+        stmt = (
+            select(candles.c.exchange_symbol_id, candles.c.prev_ts, candles.c.timestamp)
+            .where(
+                candles.c.prev_ts.is_not(None),
+                candles.c.timestamp - candles.c.prev_ts != TIMEFRAME_DELTA[timeframe],
+            )
+            .order_by(candles.c.exchange_symbol_id, candles.c.timestamp)
+        )
+        result = await session.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+    @staticmethod
+    async def find_duplicates(
+        session: AsyncSession,
+        exchange_symbol_ids: list[int],
+        timeframe: TimeframeEnum,
+    ) -> list[tuple[int, datetime, int]]:
+        """
+        Find timestamps stored more than once, for many series in one query.
+
+        Returns:
+            List of (exchange_symbol_id, timestamp, count) rows
+        """
+        stmt = (
+            select(Candle.exchange_symbol_id, Candle.timestamp, func.count())
+            .where(
+                Candle.exchange_symbol_id.in_(exchange_symbol_ids),
+                Candle.timeframe == timeframe.value,
+            )
+            .group_by(Candle.exchange_symbol_id, Candle.timestamp)
+            .having(func.count() > 1)
+            .order_by(Candle.exchange_symbol_id, Candle.timestamp)
+        )
+        result = await session.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+    @staticmethod
+    async def get_checkpoints(
+        session: AsyncSession,
+        exchange_symbol_ids: list[int],
+        timeframe: TimeframeEnum,
+    ) -> dict[int, tuple[datetime, datetime, int]]:
+        """Return (checked_from, checked_until, checked_count) by exchange_symbol_id."""
+        stmt = select(
+            QualityCheckpoint.exchange_symbol_id,
+            QualityCheckpoint.checked_from,
+            QualityCheckpoint.checked_until,
+            QualityCheckpoint.checked_count,
+        ).where(
+            QualityCheckpoint.exchange_symbol_id.in_(exchange_symbol_ids),
+            QualityCheckpoint.timeframe == timeframe.value,
+        )
+        result = await session.execute(stmt)
+        return {row[0]: tuple(row[1:]) for row in result.all()}
+
+    @staticmethod
+    async def save_checkpoint(
+        session: AsyncSession,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        checked_from: datetime,
+        checked_until: datetime,
+        checked_count: int,
+    ) -> None:
+        stmt = insert(QualityCheckpoint).values(
+            exchange_symbol_id=exchange_symbol_id,
+            timeframe=timeframe.value,
+            checked_from=checked_from,
+            checked_until=checked_until,
+            checked_count=checked_count,
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_quality_checkpoint",
+            set_={
+                "checked_from": stmt.excluded.checked_from,
+                "checked_until": stmt.excluded.checked_until,
+                "checked_count": stmt.excluded.checked_count,
+                "updated_at": datetime.now(UTC),
+            },
+        )
+        await session.execute(stmt)
+
+    @staticmethod
+    async def save_anomalies(
+        session: AsyncSession,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        anomalies: list[tuple[datetime, AnomalyRuleEnum, float | None]],
+    ) -> None:
+        """
+        Store flagged candles. A candle already flagged by the same rule keeps
+        one row with the larger value (e.g. the longest zero-volume run seen).
+        """
+        batch_size = 3000
+        for i in range(0, len(anomalies), batch_size):
+            stmt = insert(CandleAnomaly).values(
+                [
+                    {
+                        "exchange_symbol_id": exchange_symbol_id,
+                        "timeframe": timeframe.value,
+                        "timestamp": ts,
+                        "rule": rule.value,
+                        "value": value,
+                    }
+                    for ts, rule, value in anomalies[i : i + batch_size]
+                ]
+            )
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_candle_anomaly",
+                set_={"value": func.greatest(CandleAnomaly.value, stmt.excluded.value)},
+            )
+            await session.execute(stmt)
+
+    @staticmethod
+    async def get_anomalies(
+        session: AsyncSession,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol_name: str | None = None,
+        timeframe: TimeframeEnum | None = None,
+        rule: AnomalyRuleEnum | None = None,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+        limit: int = 1000,
+    ) -> list[dict]:
+        """
+        Get flagged candles for an exchange and market type, newest first.
+
+        Returns:
+            List of dicts with symbol, timeframe, timestamp, rule and value
+        """
+        stmt = (
+            select(
+                Symbol.name.label("symbol"),
+                CandleAnomaly.timeframe,
+                CandleAnomaly.timestamp,
+                CandleAnomaly.rule,
+                CandleAnomaly.value,
+            )
+            .join(ExchangeSymbol, ExchangeSymbol.id == CandleAnomaly.exchange_symbol_id)
+            .join(Exchange, Exchange.id == ExchangeSymbol.exchange_id)
+            .join(MarketType, MarketType.id == ExchangeSymbol.market_type_id)
+            .join(Symbol, Symbol.id == ExchangeSymbol.symbol_id)
+            .where(
+                Exchange.name == exchange.value,
+                MarketType.name == market_type.value,
+            )
+            .order_by(CandleAnomaly.timestamp.desc(), Symbol.name)
+            .limit(limit)
+        )
+        if symbol_name is not None:
+            stmt = stmt.where(Symbol.name == symbol_name)
+        if timeframe is not None:
+            stmt = stmt.where(CandleAnomaly.timeframe == timeframe.value)
+        if rule is not None:
+            stmt = stmt.where(CandleAnomaly.rule == rule.value)
+        if start_time is not None:
+            stmt = stmt.where(CandleAnomaly.timestamp >= start_time)
+        if end_time is not None:
+            stmt = stmt.where(CandleAnomaly.timestamp < end_time)
+
+        result = await session.execute(stmt)
+        return [dict(row) for row in result.mappings().all()]
@@ -1,9 +1,16 @@
-from sqlalchemy import select
+from datetime import datetime
+
+from sqlalchemy import func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from app.db import Exchange, ExchangeSymbol, MarketType, Symbol
 from app.enums import ExchangeEnum, MarketTypeEnum, QuoteAssetEnum
+from app.exchanges.base import Instrument
+
+
+# NOTIFY channel for symbol universe changes, payload "exchange,market_type"
+SYMBOLS_UPDATED_CHANNEL = "symbols_updated"
 
 
 class SymbolsRepository:
@@ -14,11 +21,14 @@ class SymbolsRepository:
         session: AsyncSession,
         exchange: ExchangeEnum,
         market_type: MarketTypeEnum,
-        current_symbols: list[str],
+        instruments: list[Instrument],
     ) -> dict:
         """
         Update symbols in database: add new, reactivate returned, deactivate missing.
 
+        Instrument metadata is refreshed on every listed symbol; a known
+        listing time is kept when the exchange does not publish one.
+
         Returns:
             Dict with update statistics (added, activated, deactivated, total_active)
         """
@@ -49,15 +59,21 @@ class SymbolsRepository:
         added = 0
         activated = 0
         deactivated = 0
-        current_symbols_set = set(current_symbols)
+        current_symbols_set = {instrument.symbol for instrument in instruments}
 
         # add new or reactivate
-        for symbol_name in current_symbols:
+        for instrument in instruments:
+            symbol_name = instrument.symbol
             if symbol_name in existing_by_name:
                 es = existing_by_name[symbol_name]
                 if not es.is_active:
                     es.is_active = True
                     activated += 1
+                es.base_asset = instrument.base_asset
+                es.quote_asset = instrument.quote_asset
+                es.status = instrument.status
+                if instrument.listed_at is not None:
+                    es.listed_at = instrument.listed_at
             else:
                 # get or create Symbol
                 result = await session.execute(
@@ -75,6 +91,10 @@ class SymbolsRepository:
                     symbol_id=symbol.id,
                     exchange_symbol_name=symbol_name,
                     is_active=True,
+                    base_asset=instrument.base_asset,
+                    quote_asset=instrument.quote_asset,
+                    status=instrument.status,
+                    listed_at=instrument.listed_at,
                 )
                 session.add(exchange_symbol)
                 added += 1
@@ -85,10 +105,18 @@ class SymbolsRepository:
                 es.is_active = False
                 deactivated += 1
 
+        if added or activated or deactivated:
+            await session.execute(
+                select(
+                    func.pg_notify(
+                        SYMBOLS_UPDATED_CHANNEL, f"{exchange.value},{market_type.value}"
+                    )
+                )
+            )
         await session.commit()
 
         return {
-            "total_active": len(current_symbols),
+            "total_active": len(instruments),
             "added": added,
             "activated": activated,
             "deactivated": deactivated,
@@ -122,9 +150,36 @@ class SymbolsRepository:
                 Exchange.name == exchange.value,
                 MarketType.name == market_type.value,
                 ExchangeSymbol.is_active == True,  # noqa: E712
-                Symbol.name.endswith(quote_asset.value.upper()),
+                ExchangeSymbol.quote_asset == quote_asset.value.upper(),
             )
         )
 
         result = await session.execute(stmt)
         return list(result.scalars().all())
+
+    @staticmethod
+    async def get_listed_at(
+        session: AsyncSession,
+        exchange_symbol_ids: list[int],
+    ) -> dict[int, datetime]:
+        """Return listing times by exchange_symbol_id for symbols that have one."""
+        stmt = select(ExchangeSymbol.id, ExchangeSymbol.listed_at).where(
+            ExchangeSymbol.id.in_(exchange_symbol_ids),
+            ExchangeSymbol.listed_at.is_not(None),
+        )
+        result = await session.execute(stmt)
+        return dict(result.all())
+
+    @staticmethod
+    async def set_listed_at(
+        session: AsyncSession,
+        listed_at: dict[int, datetime],
+    ) -> None:
+        """Store listing times found by probing the exchange, then commit."""
+        for exchange_symbol_id, ts in listed_at.items():
+            await session.execute(
+                update(ExchangeSymbol)
+                .where(ExchangeSymbol.id == exchange_symbol_id)
+                .values(listed_at=ts)
+            )
+        await session.commit()
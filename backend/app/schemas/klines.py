@@ -1,8 +1,17 @@
 from datetime import datetime, timezone
 
-from pydantic import BaseModel, field_validator, model_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
 
-from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.enums import (
+    AnomalyRuleEnum,
+    CandleFieldEnum,
+    DownsampleEnum,
+    ExchangeEnum,
+    IndicatorEnum,
+    KlinesFormatEnum,
+    MarketTypeEnum,
+    TimeframeEnum,
+)
 
 
 class CollectKlinesRequest(BaseModel):
@@ -34,3 +43,451 @@ class CollectKlinesResponse(BaseModel):
     timeframe: TimeframeEnum
     fetched: int
     inserted: int
+
+
+class CollectProgress(BaseModel):
+    """Progress event of a streamed collection, sent after each saved page."""
+
+    pages: int = Field(..., description="Pages fetched and saved so far")
+    fetched: int = Field(..., description="Candles fetched so far")
+    inserted: int = Field(..., description="Candles inserted so far")
+    cursor: datetime = Field(
+        ...,
+        description="Timestamp the fetch has reached (Bybit pages run backwards)",
+    )
+    candles_per_second: float = Field(..., description="Average fetch rate")
+    retries: int = Field(..., description="Exchange requests retried so far")
+    expected: int = Field(..., description="Candles expected in the whole range")
+    eta_seconds: float | None = Field(
+        default=None, description="Estimated time to completion at the average rate"
+    )
+
+
+class KlinesRequest(BaseModel):
+    """Request parameters for reading stored candles."""
+
+    exchange: ExchangeEnum = Field(
+        default=ExchangeEnum.BINANCE, description="Exchange name"
+    )
+    market_type: MarketTypeEnum = Field(
+        default=MarketTypeEnum.FUTURES, description="Market type"
+    )
+    symbol: str = Field(..., description="Symbol name")
+    timeframe: TimeframeEnum = Field(default=TimeframeEnum.h1, description="Timeframe")
+    start_time: datetime | None = Field(
+        default=None, description="Range start (inclusive)"
+    )
+    end_time: datetime | None = Field(default=None, description="Range end (exclusive)")
+    cursor: datetime | None = Field(
+        default=None,
+        description="Timestamp of the last candle of the previous page (json only)",
+    )
+    limit: int = Field(
+        default=1000, ge=1, le=10000, description="Page size (json only)"
+    )
+    format: KlinesFormatEnum | None = Field(
+        default=None,
+        description="json: one page; other formats stream the whole range. "
+        "Defaults to the Accept header, then json",
+    )
+    max_points: int | None = Field(
+        default=None,
+        ge=3,
+        le=100000,
+        description="Downsample the whole range to at most this many candles "
+        "(disables paging)",
+    )
+    downsample: DownsampleEnum = Field(
+        default=DownsampleEnum.OHLC,
+        description="lttb: close-price line points; ohlc: merged candles",
+    )
+
+    @field_validator("start_time", "end_time", "cursor", mode="after")
+    @classmethod
+    def strip_timezone(cls, v: datetime | None) -> datetime | None:
+        if v is not None and v.tzinfo is not None:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+    @model_validator(mode="after")
+    def validate_time_range(self):
+        if (
+            self.start_time is not None
+            and self.end_time is not None
+            and self.start_time >= self.end_time
+        ):
+            raise ValueError("start_time must be before end_time")
+        return self
+
+
+class RecentKlinesRequest(BaseModel):
+    """Request parameters for the newest candles of a series."""
+
+    exchange: ExchangeEnum = Field(
+        default=ExchangeEnum.BINANCE, description="Exchange name"
+    )
+    market_type: MarketTypeEnum = Field(
+        default=MarketTypeEnum.FUTURES, description="Market type"
+    )
+    symbol: str = Field(..., description="Symbol name")
+    timeframe: TimeframeEnum = Field(default=TimeframeEnum.h1, description="Timeframe")
+    limit: int = Field(
+        default=100,
+        ge=1,
+        le=10000,
+        description="Number of candles; served from memory up to "
+        "RECENT_CACHE_CANDLES",
+    )
+    format: KlinesFormatEnum | None = Field(
+        default=None, description="Defaults to the Accept header, then json"
+    )
+
+
+class CandleItem(BaseModel):
+    timestamp: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+class KlinesResponse(BaseModel):
+    """One page of stored candles, oldest first."""
+
+    exchange: ExchangeEnum
+    market_type: MarketTypeEnum
+    symbol: str
+    timeframe: TimeframeEnum
+    candles: list[CandleItem]
+    count: int
+    next_cursor: datetime | None = Field(
+        ..., description="Pass as cursor to get the next page, null on the last page"
+    )
+
+
+class PanelRequest(BaseModel):
+    """Request parameters for an aligned multi-symbol price panel."""
+
+    exchange: ExchangeEnum = Field(
+        default=ExchangeEnum.BINANCE, description="Exchange name"
+    )
+    market_type: MarketTypeEnum = Field(
+        default=MarketTypeEnum.FUTURES, description="Market type"
+    )
+    symbols: list[str] = Field(
+        default_factory=list, description="Symbols, empty for all active"
+    )
+    timeframe: TimeframeEnum = Field(default=TimeframeEnum.h1, description="Timeframe")
+    fields: list[CandleFieldEnum] = Field(
+        default_factory=lambda: [CandleFieldEnum.CLOSE],
+        description="Candle fields per symbol",
+    )
+    start_time: datetime = Field(..., description="Range start (inclusive)")
+    end_time: datetime | None = Field(
+        default=None,
+        description="Range end (exclusive), defaults to the forming candle",
+    )
+    format: KlinesFormatEnum | None = Field(
+        default=None,
+        description="Streamed format, defaults to the Accept header, then arrow",
+    )
+
+    @field_validator("start_time", "end_time", mode="after")
+    @classmethod
+    def strip_timezone(cls, v: datetime | None) -> datetime | None:
+        if v is not None and v.tzinfo is not None:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+    @model_validator(mode="after")
+    def validate_time_range(self):
+        if self.end_time is not None and self.start_time >= self.end_time:
+            raise ValueError("start_time must be before end_time")
+        return self
+
+
+class IndicatorRequest(BaseModel):
+    """Request parameters for a technical indicator over stored candles."""
+
+    exchange: ExchangeEnum = Field(
+        default=ExchangeEnum.BINANCE, description="Exchange name"
+    )
+    market_type: MarketTypeEnum = Field(
+        default=MarketTypeEnum.FUTURES, description="Market type"
+    )
+    symbol: str = Field(..., description="Symbol name")
+    timeframe: TimeframeEnum = Field(default=TimeframeEnum.h1, description="Timeframe")
+    indicator: IndicatorEnum = Field(..., description="Indicator")
+    period: int = Field(default=14, ge=1, le=1000, description="Lookback period")
+    std_dev: float = Field(
+        default=2.0, gt=0, description="Band width in standard deviations (bbands)"
+    )
+    start_time: datetime | None = Field(
+        default=None, description="Range start (inclusive)"
+    )
+    end_time: datetime | None = Field(default=None, description="Range end (exclusive)")
+    format: KlinesFormatEnum | None = Field(
+        default=None, description="Defaults to the Accept header, then json"
+    )
+
+    @field_validator("start_time", "end_time", mode="after")
+    @classmethod
+    def strip_timezone(cls, v: datetime | None) -> datetime | None:
+        if v is not None and v.tzinfo is not None:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+
+class IndicatorResponse(BaseModel):
+    """Indicator values in columnar form; null during warm-up."""
+
+    exchange: ExchangeEnum
+    market_type: MarketTypeEnum
+    symbol: str
+    timeframe: TimeframeEnum
+    indicator: IndicatorEnum
+    period: int
+    timestamps: list[datetime]
+    values: dict[str, list[float | None]]
+
+
+class SpreadRequest(BaseModel):
+    """Request parameters for cross-exchange spread, basis and ratio series."""
+
+    legs: list[str] = Field(
+        ...,
+        min_length=2,
+        description="Series to align as exchange:market_type, the first is the base",
+    )
+    symbols: list[str] = Field(
+        default_factory=list,
+        description="Symbols, empty for all active symbols listed on every leg",
+    )
+    timeframe: TimeframeEnum = Field(default=TimeframeEnum.h1, description="Timeframe")
+    field: CandleFieldEnum = Field(
+        default=CandleFieldEnum.CLOSE, description="Candle field to compare"
+    )
+    start_time: datetime | None = Field(
+        default=None, description="Range start (inclusive)"
+    )
+    end_time: datetime | None = Field(default=None, description="Range end (exclusive)")
+    summary_only: bool = Field(
+        default=False, description="json only: return statistics without series"
+    )
+    format: KlinesFormatEnum | None = Field(
+        default=None, description="Defaults to the Accept header, then json"
+    )
+
+    @field_validator("legs", mode="after")
+    @classmethod
+    def validate_legs(cls, v: list[str]) -> list[str]:
+        for leg in v:
+            exchange, _, market_type = leg.partition(":")
+            ExchangeEnum(exchange)
+            MarketTypeEnum(market_type)
+        if len(set(v)) != len(v):
+            raise ValueError("legs must be distinct")
+        return v
+
+    @field_validator("start_time", "end_time", mode="after")
+    @classmethod
+    def strip_timezone(cls, v: datetime | None) -> datetime | None:
+        if v is not None and v.tzinfo is not None:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+    @model_validator(mode="after")
+    def validate_time_range(self):
+        if self.start_time and self.end_time and self.start_time >= self.end_time:
+            raise ValueError("start_time must be before end_time")
+        return self
+
+    @property
+    def parsed_legs(self) -> list[tuple[ExchangeEnum, MarketTypeEnum]]:
+        return [
+            (ExchangeEnum(exchange), MarketTypeEnum(market_type))
+            for exchange, _, market_type in (leg.partition(":") for leg in self.legs)
+        ]
+
+
+class SpreadStats(BaseModel):
+    """Range-wide statistics of one metric; null when there are no candles."""
+
+    mean: float | None
+    std: float | None
+    min: float | None
+    max: float | None
+    last: float | None
+
+
+class SpreadItem(BaseModel):
+    """One leg against the base leg for one symbol."""
+
+    symbol: str
+    leg: str
+    count: int = Field(..., description="Timestamps present on both legs")
+    spread: SpreadStats = Field(..., description="leg - base")
+    basis: SpreadStats = Field(..., description="leg / base - 1")
+    ratio: SpreadStats = Field(..., description="leg / base")
+    timestamps: list[datetime] | None = None
+    values: dict[str, list[float | None]] | None = Field(
+        default=None, description="spread, basis and ratio per timestamp"
+    )
+
+
+class SpreadResponse(BaseModel):
+    """Spread, basis and ratio of every leg against the base leg."""
+
+    base_leg: str
+    timeframe: TimeframeEnum
+    field: CandleFieldEnum
+    items: list[SpreadItem]
+    count: int
+
+
+class AnomaliesRequest(BaseModel):
+    """Request parameters for candles flagged by data-quality checks."""
+
+    exchange: ExchangeEnum = Field(
+        default=ExchangeEnum.BINANCE, description="Exchange name"
+    )
+    market_type: MarketTypeEnum = Field(
+        default=MarketTypeEnum.FUTURES, description="Market type"
+    )
+    symbol: str | None = Field(default=None, description="Symbol, all if omitted")
+    timeframe: TimeframeEnum | None = Field(
+        default=None, description="Timeframe, all if omitted"
+    )
+    rule: AnomalyRuleEnum | None = Field(
+        default=None, description="Rule, all if omitted"
+    )
+    start_time: datetime | None = Field(
+        default=None, description="Range start (inclusive)"
+    )
+    end_time: datetime | None = Field(default=None, description="Range end (exclusive)")
+    limit: int = Field(default=1000, ge=1, le=10000, description="Max anomalies")
+
+    @field_validator("start_time", "end_time", mode="after")
+    @classmethod
+    def strip_timezone(cls, v: datetime | None) -> datetime | None:
+        if v is not None and v.tzinfo is not None:
+            return v.astimezone(timezone.utc).replace(tzinfo=None)
+        return v
+
+
+class AnomalyItem(BaseModel):
+    symbol: str
+    timeframe: TimeframeEnum
+    timestamp: datetime
+    rule: AnomalyRuleEnum
+    value: float | None = Field(
+        ..., description="Rule measurement: run length, deviation, price"
+    )
+
+
+class AnomaliesResponse(BaseModel):
+    """Flagged candles, newest first."""
+
+    exchange: ExchangeEnum
+    market_type: MarketTypeEnum
+    anomalies: list[AnomalyItem]
+    count: int
+
+
+class CoverageRequest(BaseModel):
+    """Request parameters for stored series coverage."""
+
+    exchange: ExchangeEnum = Field(
+        default=ExchangeEnum.BINANCE, description="Exchange name"
+    )
+    market_type: MarketTypeEnum = Field(
+        default=MarketTypeEnum.FUTURES, description="Market type"
+    )
+    symbol: str | None = Field(default=None, description="Symbol filter")
+    timeframe: TimeframeEnum | None = Field(
+        default=None, description="Timeframe filter"
+    )
+
+
+class SeriesCoverageItem(BaseModel):
+    """Stored range of one (symbol, timeframe) series."""
+
+    symbol: str
+    timeframe: TimeframeEnum
+    first_ts: datetime
+    last_ts: datetime
+    candle_count: int
+    gap_count: int = Field(
+        ..., description="Number of missing candles between first_ts and last_ts"
+    )
+
+
+class CoverageResponse(BaseModel):
+    """Response with stored series coverage."""
+
+    exchange: ExchangeEnum
+    market_type: MarketTypeEnum
+    series: list[SeriesCoverageItem]
+    count: int
+
+
+class FreshnessRequest(BaseModel):
+    """Request parameters for series freshness."""
+
+    exchange: ExchangeEnum = Field(
+        default=ExchangeEnum.BINANCE, description="Exchange name"
+    )
+    market_type: MarketTypeEnum = Field(
+        default=MarketTypeEnum.FUTURES, description="Market type"
+    )
+    timeframe: TimeframeEnum | None = Field(
+        default=None, description="Timeframe filter"
+    )
+    target_seconds: int | None = Field(
+        default=None,
+        ge=0,
+        description="Freshness target (default FRESHNESS_TARGET_SECONDS)",
+    )
+
+
+class SeriesFreshnessItem(BaseModel):
+    """Freshness of one (symbol, timeframe) series."""
+
+    symbol: str
+    timeframe: TimeframeEnum
+    last_ts: datetime
+    lag_seconds: float = Field(
+        ...,
+        description="Time the oldest missing closed candle has been closed "
+        "(0 when up to date)",
+    )
+    within_target: bool
+
+
+class FreshnessResponse(BaseModel):
+    """Response with per-series freshness lag against a target, worst first."""
+
+    exchange: ExchangeEnum
+    market_type: MarketTypeEnum
+    target_seconds: int
+    series: list[SeriesFreshnessItem]
+    count: int
+    over_target: int
+
+
+class TieringStatsResponse(BaseModel):
+    """Cold tier size and per-tier read cost since process start."""
+
+    cold_candles: int
+    total_candles: int
+    cold_fraction: float
+    cold_reads: int
+    cold_rows_read: int
+    cold_read_seconds: float
+    hot_reads: int
+    hot_rows_read: int
+    hot_read_seconds: float
+    columnar_reads: int
+    columnar_rows_read: int
+    columnar_read_seconds: float
@@ -12,8 +12,12 @@ import httpx
 
 from app.db.session import AsyncSessionLocal
 from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.metrics import script_metrics
 from app.repositories.klines import KlinesRepository
+from app.repositories.symbols import SymbolsRepository
 from app.services.mappers import EXCHANGE_CLIENTS
+from app.services.timeframes import floor_timestamp
+from app.tracing import script_tracing
 
 
 logging.basicConfig(
@@ -32,6 +36,7 @@ END_TIME = datetime(2026, 2, 10)  # None = up to now
 EXCHANGE = ExchangeEnum.BYBIT
 MARKET_TYPE = MarketTypeEnum.FUTURES
 MAX_CONCURRENT = 5  # parallel symbols
+PROFILE_PATH = None  # e.g. Path("profiles/backfill.json") for a flamegraph
 # ───────────────────────────────────────────────────────────────
 
 
@@ -63,13 +68,24 @@ async def backfill_symbol(
                 )
                 return symbol, 0, -1  # -1 = skipped
 
+            # Skip the history before the symbol was listed
+            listed_at = await SymbolsRepository.get_listed_at(
+                session, [exchange_symbol_id]
+            )
+            start_time = START_TIME
+            if exchange_symbol_id in listed_at:
+                start_time = max(
+                    START_TIME,
+                    floor_timestamp(listed_at[exchange_symbol_id], TIMEFRAME),
+                )
+
             fetched = 0
             inserted = 0
 
             async for batch in client.get_klines(
                 symbol=symbol,
                 timeframe=TIMEFRAME,
-                start_time=START_TIME,
+                start_time=start_time,
                 end_time=END_TIME,
                 market_type=MARKET_TYPE,
             ):
@@ -133,4 +149,7 @@ async def main() -> None:
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    with script_metrics("backfill_klines"), script_tracing(
+        "backfill_klines", PROFILE_PATH
+    ):
+        asyncio.run(main())
@@ -0,0 +1,148 @@
+"""Run data-quality checks on candles added since the last run.
+
+Flags inconsistent OHLC, non-positive prices, negative volume, zero-volume
+runs, price spikes against neighbouring candles and closes that deviate from
+the same symbol on the other exchange. Flagged candles are stored in
+candle_anomalies (served by GET /api/klines/anomalies); a per-series
+checkpoint makes the next run check only new candles.
+
+Edit the configuration below, then run:
+    python -m app.scripts.check_quality
+"""
+
+import asyncio
+import logging
+
+from app.db.session import AsyncSessionLocal
+from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.repositories.coverage import CoverageRepository
+from app.repositories.klines import KlinesRepository
+from app.repositories.quality import QualityRepository
+from app.services.quality import QualityService
+from app.storage.cold import ColdStore
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+# ── Configuration ──────────────────────────────────────────────
+EXCHANGES = list(ExchangeEnum)
+MARKET_TYPES = list(MarketTypeEnum)
+TIMEFRAMES = [TimeframeEnum.h1, TimeframeEnum.h4, TimeframeEnum.d1]
+CONCURRENCY = 8  # series checked at once, one DB connection each
+# ───────────────────────────────────────────────────────────────
+
+
+async def check_series(
+    exchange: ExchangeEnum,
+    market_type: MarketTypeEnum,
+    timeframe: TimeframeEnum,
+    coverage: dict,
+    checkpoint: tuple | None,
+    other_id: int | None,
+    cold_store: ColdStore,
+    semaphore: asyncio.Semaphore,
+) -> int:
+    async with semaphore, AsyncSessionLocal() as session:
+        flagged = await QualityService.check_series(
+            session=session,
+            cold_store=cold_store,
+            exchange=exchange,
+            market_type=market_type,
+            symbol=coverage["symbol"],
+            timeframe=timeframe,
+            coverage=coverage,
+            checkpoint=checkpoint,
+            other_exchange_symbol_id=other_id,
+        )
+    if flagged:
+        logger.info(
+            "%s %s %s %s: %d anomalies",
+            exchange.value,
+            market_type.value,
+            coverage["symbol"],
+            timeframe.value,
+            flagged,
+        )
+    return flagged
+
+
+async def main() -> None:
+    cold_store = ColdStore()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    tasks, labels = [], []
+
+    async with AsyncSessionLocal() as session:
+        ids_by_exchange = {
+            (exchange, market_type): {
+                name: es_id
+                for es_id, name in await KlinesRepository.resolve_exchange_symbols(
+                    session, exchange, market_type
+                )
+            }
+            for exchange in ExchangeEnum
+            for market_type in MARKET_TYPES
+        }
+
+        for exchange in EXCHANGES:
+            # Closes are compared with the first other exchange listing the symbol
+            others = [e for e in ExchangeEnum if e != exchange]
+            for market_type in MARKET_TYPES:
+                for timeframe in TIMEFRAMES:
+                    coverage = await CoverageRepository.get_coverage(
+                        session, exchange, market_type, timeframe=timeframe
+                    )
+                    checkpoints = await QualityRepository.get_checkpoints(
+                        session,
+                        [row["exchange_symbol_id"] for row in coverage],
+                        timeframe,
+                    )
+                    for row in coverage:
+                        other_id = next(
+                            (
+                                ids_by_exchange[(other, market_type)][row["symbol"]]
+                                for other in others
+                                if row["symbol"]
+                                in ids_by_exchange[(other, market_type)]
+                            ),
+                            None,
+                        )
+                        tasks.append(
+                            check_series(
+                                exchange,
+                                market_type,
+                                timeframe,
+                                row,
+                                checkpoints.get(row["exchange_symbol_id"]),
+                                other_id,
+                                cold_store,
+                                semaphore,
+                            )
+                        )
+                        labels.append(
+                            f"{exchange.value} {market_type.value} "
+                            f"{row['symbol']} {timeframe.value}"
+                        )
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    failed = [
+        f"{label} ({result})"
+        for label, result in zip(labels, results)
+        if isinstance(result, Exception)
+    ]
+    flagged = sum(r for r in results if not isinstance(r, Exception))
+
+    logger.info("─" * 40)
+    logger.info("Done. Checked %d series, flagged %d candles", len(tasks), flagged)
+    if failed:
+        logger.error("Failed (%d):\n  - %s", len(failed), "\n  - ".join(failed))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,18 +1,31 @@
 """Export klines from DB to CSV files (one file per ticker).
 
+Symbols are exported concurrently, each as a stream: cold-tier months are
+converted with Arrow and hot candles are copied with COPY ... TO STDOUT,
+while a writer thread compresses and writes the previous chunk. Series in the
+columnar store are converted from its mapped files instead. Memory stays
+constant whatever the number of candles.
+
 Edit the configuration below, then run:
     python -m app.scripts.export_klines_csv
 """
 
 import asyncio
-import csv
+import os
+import time
+from datetime import datetime
 from pathlib import Path
 
-from sqlalchemy import select
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 
-from app.db.models import Candle, Exchange, ExchangeSymbol, MarketType, Symbol
 from app.db.session import AsyncSessionLocal
 from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.repositories.coverage import CoverageRepository
+from app.repositories.klines import KlinesRepository
+from app.storage.cold import ColdStore
+from app.storage.columnar import columnar_store
 
 
 # ── Configuration ──────────────────────────────────────────────
@@ -20,86 +33,186 @@ EXCHANGE = ExchangeEnum.BYBIT
 MARKET_TYPE = MarketTypeEnum.FUTURES
 TIMEFRAME = TimeframeEnum.h1
 OUTPUT_DIR = Path("exported_klines")
+CONCURRENCY = 4  # symbols exported at once, one DB connection each
+COMPRESSION = None  # None, "gzip" or "zstd"
+WRITE_QUEUE_CHUNKS = 16  # chunks buffered between DB reads and file writes
+COLUMNAR_CHUNK_CANDLES = 50_000  # candles per chunk read from the columnar store
 # ───────────────────────────────────────────────────────────────
 
+HEADER = b"Date,Ticker,Open,High,Low,Close,Volume\n"
+EXTENSIONS = {None: ".csv", "gzip": ".csv.gz", "zstd": ".csv.zst"}
+
+
+class ChunkWriter:
+    """
+    Write chunks to a (compressed) file from a worker thread.
+
+    put() only waits when WRITE_QUEUE_CHUNKS chunks are pending, so reading
+    the next chunk overlaps with compressing and writing the previous one.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.tmp_path = path.with_name(path.name + ".tmp")
+        self.queue: asyncio.Queue[bytes | None] = asyncio.Queue(WRITE_QUEUE_CHUNKS)
+        self.task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> "ChunkWriter":
+        if COMPRESSION is None:
+            self.stream = pa.OSFile(str(self.tmp_path), "wb")
+        else:
+            self.stream = pa.CompressedOutputStream(str(self.tmp_path), COMPRESSION)
+        self.task = asyncio.create_task(self._drain())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        failed = exc_type is not None
+        try:
+            if not self.task.done():
+                await self.put(None)
+            await self.task
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.stream.close()
+            if failed:
+                self.tmp_path.unlink(missing_ok=True)
+            else:
+                os.replace(self.tmp_path, self.path)
+
+    async def put(self, chunk: bytes | None) -> None:
+        if self.task.done():
+            await self.task
+        # Surface a write failing while waiting for room in the full queue,
+        # which would otherwise never drain
+        put = asyncio.ensure_future(self.queue.put(chunk))
+        await asyncio.wait({put, self.task}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            await self.task
+
+    async def _drain(self) -> None:
+        while (chunk := await self.queue.get()) is not None:
+            await asyncio.to_thread(self.stream.write, chunk)
+
+
+def candles_csv(table: pa.Table, ticker: str) -> bytes:
+    """Format a table of candles like the COPY output of the hot tier."""
+    dates = pc.strftime(
+        table["timestamp"].cast(pa.timestamp("s"), safe=False),
+        format="%Y-%m-%d %H:%M:%S",
+    )
+    rows = pa.table(
+        {
+            "date": dates,
+            "ticker": pa.array([ticker] * table.num_rows, type=pa.string()),
+            **{
+                name: table[name] for name in ("open", "high", "low", "close", "volume")
+            },
+        }
+    )
+    sink = pa.BufferOutputStream()
+    pa_csv.write_csv(
+        rows,
+        sink,
+        pa_csv.WriteOptions(include_header=False, quoting_style="none"),
+    )
+    return sink.getvalue().to_pybytes()
+
+
+async def export_symbol(
+    es_id: int,
+    symbol_name: str,
+    cold_until: datetime | None,
+    cold_store: ColdStore,
+    semaphore: asyncio.Semaphore,
+) -> int:
+    async with semaphore, AsyncSessionLocal() as session:
+        filepath = OUTPUT_DIR / f"{symbol_name}{EXTENSIONS[COMPRESSION]}"
+        count = 0
+        async with ChunkWriter(filepath) as writer:
+            await writer.put(HEADER)
+
+            chunks = None
+            if columnar_store is not None:
+                chunks = columnar_store.iter_range(
+                    es_id, TIMEFRAME, chunk_size=COLUMNAR_CHUNK_CANDLES
+                )
+            if chunks is not None:
+                for table in chunks:
+                    await writer.put(candles_csv(table, symbol_name))
+                    count += table.num_rows
+            else:
+                if cold_until is not None:
+                    for table in cold_store.iter_months(
+                        EXCHANGE,
+                        MARKET_TYPE,
+                        symbol_name,
+                        TIMEFRAME,
+                        end_time=cold_until,
+                    ):
+                        await writer.put(candles_csv(table, symbol_name))
+                        count += table.num_rows
+
+                count += await KlinesRepository.copy_klines_csv(
+                    session,
+                    es_id,
+                    TIMEFRAME,
+                    symbol_name,
+                    writer.put,
+                    start_time=cold_until,
+                )
+
+        if count == 0:
+            filepath.unlink(missing_ok=True)
+        else:
+            print(f"{symbol_name}: {count} candles -> {filepath}")
+        return count
+
 
 async def main() -> None:
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-
-    total_symbols = 0
-    total_candles = 0
-    failed_symbols: list[str] = []
+    cold_store = ColdStore()
+    started = time.perf_counter()
 
     async with AsyncSessionLocal() as session:
-        # Get all active exchange symbols for the configured exchange + market type
-        query = (
-            select(ExchangeSymbol.id, Symbol.name)
-            .join(Exchange, ExchangeSymbol.exchange_id == Exchange.id)
-            .join(MarketType, ExchangeSymbol.market_type_id == MarketType.id)
-            .join(Symbol, ExchangeSymbol.symbol_id == Symbol.id)
-            .where(
-                Exchange.name == EXCHANGE.value,
-                MarketType.name == MARKET_TYPE.value,
-                ExchangeSymbol.is_active.is_(True),
-            )
-            .order_by(Symbol.name)
+        # All active exchange symbols for the configured exchange + market type
+        exchange_symbols = await KlinesRepository.resolve_exchange_symbols(
+            session, EXCHANGE, MARKET_TYPE
         )
-        result = await session.execute(query)
-        exchange_symbols = result.all()
-
-        for es_id, symbol_name in exchange_symbols:
-            try:
-                # Query candles ordered by timestamp
-                candle_query = (
-                    select(
-                        Candle.timestamp,
-                        Candle.open,
-                        Candle.high,
-                        Candle.low,
-                        Candle.close,
-                        Candle.volume,
-                    )
-                    .where(
-                        Candle.exchange_symbol_id == es_id,
-                        Candle.timeframe == TIMEFRAME.value,
-                    )
-                    .order_by(Candle.timestamp)
-                )
-                candle_result = await session.execute(candle_query)
-                candles = candle_result.all()
-
-                if not candles:
-                    continue
-
-                # Write CSV
-                filepath = OUTPUT_DIR / f"{symbol_name}.csv"
-                with open(filepath, "w", newline="", encoding="utf-8") as f:
-                    writer = csv.writer(f)
-                    writer.writerow(
-                        ["Date", "Ticker", "Open", "High", "Low", "Close", "Volume"]
-                    )
-                    for ts, open_, high, low, close, volume in candles:
-                        writer.writerow(
-                            [
-                                ts.strftime("%Y-%m-%d %H:%M:%S"),
-                                symbol_name,
-                                open_,
-                                high,
-                                low,
-                                close,
-                                volume,
-                            ]
-                        )
-
-                total_symbols += 1
-                total_candles += len(candles)
-                print(f"{symbol_name}: {len(candles)} candles -> {filepath}")
-            except Exception as e:
-                failed_symbols.append(f"{symbol_name} ({e})")
-                print(f"SKIP {symbol_name}: {e}")
+        cold_until = await CoverageRepository.get_cold_until_many(
+            session, [es_id for es_id, _ in exchange_symbols], TIMEFRAME
+        )
+
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    results = await asyncio.gather(
+        *(
+            export_symbol(
+                es_id, symbol_name, cold_until.get(es_id), cold_store, semaphore
+            )
+            for es_id, symbol_name in exchange_symbols
+        ),
+        return_exceptions=True,
+    )
 
+    total_symbols = 0
+    total_candles = 0
+    failed_symbols: list[str] = []
+    for (_, symbol_name), result in zip(exchange_symbols, results):
+        if isinstance(result, Exception):
+            failed_symbols.append(f"{symbol_name} ({result})")
+            print(f"SKIP {symbol_name}: {result}")
+        elif result:
+            total_symbols += 1
+            total_candles += result
+
+    elapsed = time.perf_counter() - started
     print("─" * 40)
-    print(f"Done. Exported {total_candles} candles for {total_symbols} symbols.")
+    print(
+        f"Done. Exported {total_candles} candles for {total_symbols} symbols "
+        f"in {elapsed:.1f}s."
+    )
     if failed_symbols:
         print(f"\nFailed ({len(failed_symbols)}):")
         for s in failed_symbols:
@@ -0,0 +1,263 @@
+"""Export klines to a partitioned Parquet dataset, incrementally.
+
+Layout (Hive-style, readable with pyarrow.dataset / DuckDB / Spark):
+    {OUTPUT_DIR}/exchange={e}/market={m}/timeframe={tf}/symbol={s}/year={YYYY}/data.parquet
+    {OUTPUT_DIR}/manifest.json
+
+The manifest records, per series, the exported high-water mark (last
+timestamp and candle count) and the candle count of every year partition.
+A later run compares it with series coverage and rewrites only what changed:
+    - unchanged series are skipped without reading candles
+    - candles appended after the high-water mark rewrite the last year
+      partition and add new ones
+    - anything else (backfilled history) recounts candles per year and
+      rewrites the years whose counts differ
+
+Edit the configuration below, then run:
+    python -m app.scripts.export_klines_parquet
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+from datetime import UTC, datetime
+from pathlib import Path
+
+import pyarrow.parquet as pq
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.repositories.coverage import CoverageRepository
+from app.repositories.klines import KlinesRepository
+from app.services.tiering import TieringService
+from app.storage.cold import ColdStore
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+# ── Configuration ──────────────────────────────────────────────
+EXCHANGE = ExchangeEnum.BYBIT
+MARKET_TYPE = MarketTypeEnum.FUTURES
+TIMEFRAME = TimeframeEnum.h1
+OUTPUT_DIR = Path("exported_dataset")
+CONCURRENCY = 4  # series exported at once, one DB connection each
+# ───────────────────────────────────────────────────────────────
+
+MANIFEST_VERSION = 1
+
+
+def series_key(symbol: str) -> str:
+    return f"{EXCHANGE.value}/{MARKET_TYPE.value}/{TIMEFRAME.value}/{symbol}"
+
+
+def series_dir(symbol: str) -> Path:
+    return (
+        OUTPUT_DIR
+        / f"exchange={EXCHANGE.value}"
+        / f"market={MARKET_TYPE.value}"
+        / f"timeframe={TIMEFRAME.value}"
+        / f"symbol={symbol}"
+    )
+
+
+def load_manifest() -> dict:
+    path = OUTPUT_DIR / "manifest.json"
+    if not path.exists():
+        return {"version": MANIFEST_VERSION, "series": {}}
+    manifest = json.loads(path.read_text())
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise RuntimeError(f"Unsupported manifest version in {path}")
+    return manifest
+
+
+def save_manifest(manifest: dict) -> None:
+    path = OUTPUT_DIR / "manifest.json"
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(tmp_path, path)
+
+
+async def count_years(
+    session: AsyncSession, coverage: dict, cold_store: ColdStore
+) -> dict[int, int]:
+    """Candles per year across both tiers."""
+    counts = await KlinesRepository.get_year_counts(
+        session, coverage["exchange_symbol_id"], TIMEFRAME
+    )
+    months = cold_store.month_counts(
+        EXCHANGE, MARKET_TYPE, coverage["symbol"], TIMEFRAME
+    )
+    for month, count in months.items():
+        year = int(month[:4])
+        counts[year] = counts.get(year, 0) + count
+    return counts
+
+
+async def plan_series(
+    session: AsyncSession,
+    coverage: dict,
+    previous: dict | None,
+    cold_store: ColdStore,
+) -> tuple[dict[int, int], set[int]]:
+    """
+    Work out the year counts after this run and the years to rewrite.
+
+    Returns:
+        (candles per year, years whose partition must be (re)written)
+    """
+    if previous is None:
+        years = await count_years(session, coverage, cold_store)
+        return years, set(years)
+
+    last_ts = datetime.fromisoformat(previous["last_ts"])
+    previous_years = {int(year): count for year, count in previous["years"].items()}
+    new_candles = coverage["candle_count"] - previous["candle_count"]
+
+    if new_candles >= 0 and coverage["first_ts"] >= datetime.fromisoformat(
+        previous["first_ts"]
+    ):
+        appended = await KlinesRepository.get_year_counts(
+            session, coverage["exchange_symbol_id"], TIMEFRAME, after=last_ts
+        )
+        if sum(appended.values()) == new_candles:
+            years = dict(previous_years)
+            for year, count in appended.items():
+                years[year] = years.get(year, 0) + count
+            return years, set(appended)
+
+    # History changed somewhere: compare year by year
+    years = await count_years(session, coverage, cold_store)
+    changed = {
+        year
+        for year in set(years) | set(previous_years)
+        if years.get(year) != previous_years.get(year)
+    }
+    return years, changed
+
+
+async def write_year(
+    session: AsyncSession, coverage: dict, year: int, cold_store: ColdStore
+) -> tuple[int, datetime | None]:
+    """
+    Rewrite a year's partition.
+
+    Returns:
+        (candles written, timestamp of the last one or None)
+    """
+    table = await TieringService.read_range(
+        session=session,
+        cold_store=cold_store,
+        exchange=EXCHANGE,
+        market_type=MARKET_TYPE,
+        symbol=coverage["symbol"],
+        exchange_symbol_id=coverage["exchange_symbol_id"],
+        timeframe=TIMEFRAME,
+        start_time=datetime(year, 1, 1),
+        end_time=datetime(year + 1, 1, 1),
+    )
+    year_dir = series_dir(coverage["symbol"]) / f"year={year}"
+    if table.num_rows == 0:
+        shutil.rmtree(year_dir, ignore_errors=True)
+        return 0, None
+
+    year_dir.mkdir(parents=True, exist_ok=True)
+    path = year_dir / "data.parquet"
+    tmp_path = year_dir / "data.parquet.tmp"
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, path)
+    return table.num_rows, table["timestamp"][-1].as_py()
+
+
+async def export_series(
+    coverage: dict,
+    manifest: dict,
+    cold_store: ColdStore,
+    semaphore: asyncio.Semaphore,
+) -> int:
+    """Bring one series up to date; returns the number of partitions written."""
+    key = series_key(coverage["symbol"])
+    previous = manifest["series"].get(key)
+    if (
+        previous is not None
+        and previous["candle_count"] == coverage["candle_count"]
+        and previous["first_ts"] == coverage["first_ts"].isoformat()
+        and previous["last_ts"] == coverage["last_ts"].isoformat()
+    ):
+        return 0
+
+    last_written: dict[int, datetime] = {}
+    async with semaphore, AsyncSessionLocal() as session:
+        years, dirty = await plan_series(session, coverage, previous, cold_store)
+        for year in sorted(dirty):
+            written, last_ts = await write_year(session, coverage, year, cold_store)
+            # Differs if candles landed while exporting
+            years[year] = written
+            if last_ts is not None:
+                last_written[year] = last_ts
+    years = {year: count for year, count in sorted(years.items()) if count}
+
+    # Describe what the partitions hold, which may be newer than the coverage
+    # read before exporting, so the next run's plan starts from there
+    last_year = max(years, default=None)
+    if last_year in last_written:
+        last_ts = last_written[last_year].isoformat()
+    elif previous is not None and last_year is not None:
+        last_ts = previous["last_ts"]
+    else:
+        last_ts = coverage["last_ts"].isoformat()
+    manifest["series"][key] = {
+        "first_ts": coverage["first_ts"].isoformat(),
+        "last_ts": last_ts,
+        "candle_count": sum(years.values()),
+        "years": {str(year): count for year, count in years.items()},
+        "exported_at": datetime.now(UTC).replace(tzinfo=None).isoformat(),
+    }
+    logger.info("%s: rewrote %d partitions", coverage["symbol"], len(dirty))
+    return len(dirty)
+
+
+async def main() -> None:
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest()
+    cold_store = ColdStore()
+
+    async with AsyncSessionLocal() as session:
+        coverage = await CoverageRepository.get_coverage(
+            session, EXCHANGE, MARKET_TYPE, timeframe=TIMEFRAME
+        )
+
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    results = await asyncio.gather(
+        *(export_series(row, manifest, cold_store, semaphore) for row in coverage),
+        return_exceptions=True,
+    )
+    save_manifest(manifest)
+
+    failed = 0
+    for row, result in zip(coverage, results):
+        if isinstance(result, Exception):
+            failed += 1
+            logger.error("SKIP %s: %s", row["symbol"], result)
+
+    written = sum(r for r in results if not isinstance(r, Exception))
+    updated = sum(1 for r in results if not isinstance(r, Exception) and r)
+    logger.info("─" * 40)
+    logger.info(
+        "Done. %d/%d series changed, %d partitions written, %d failed",
+        updated,
+        len(coverage),
+        written,
+        failed,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
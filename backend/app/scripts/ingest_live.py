@@ -0,0 +1,68 @@
+"""Ingest closed candles live from exchange kline WebSocket streams.
+
+Subscribes to the streams of every active symbol on the configured exchanges
+and market types, saves closed candles in batches and, after every
+(re)connect, fetches the candles missed while disconnected over REST. Runs
+until interrupted; pending candles are saved on exit.
+
+Edit the configuration below, then run:
+    python -m app.scripts.ingest_live
+
+To run against the local stand-in (python -m benchmarks.mock_streams), set
+WS_URLS to {ExchangeEnum.BINANCE: "ws://localhost:8765/binance", ...}.
+"""
+
+import asyncio
+import logging
+
+from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.metrics import script_metrics
+from app.services.live import CandleWriter, LiveIngestionService
+from app.tracing import script_tracing
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+# ── Configuration ──────────────────────────────────────────────
+EXCHANGES = list(ExchangeEnum)
+MARKET_TYPES = [MarketTypeEnum.FUTURES]
+TIMEFRAMES = [TimeframeEnum.h1, TimeframeEnum.h4, TimeframeEnum.d1]
+FLUSH_INTERVAL = 2.0  # seconds between batched writes
+MAX_PENDING = 5000  # candles buffered before an early write
+WS_URLS: dict[ExchangeEnum, str] = {}  # overrides, e.g. a local stand-in
+# ───────────────────────────────────────────────────────────────
+
+
+async def main() -> None:
+    writer = CandleWriter(flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING)
+    services = [
+        LiveIngestionService(
+            exchange=exchange,
+            market_type=market_type,
+            timeframes=TIMEFRAMES,
+            writer=writer,
+            ws_url=WS_URLS.get(exchange),
+        )
+        for exchange in EXCHANGES
+        for market_type in MARKET_TYPES
+    ]
+    writer_task = asyncio.create_task(writer.run())
+    try:
+        await asyncio.gather(*(service.run() for service in services))
+    finally:
+        writer_task.cancel()
+        await asyncio.gather(writer_task, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    with script_metrics("ingest_live"), script_tracing("ingest_live"):
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            logger.info("Stopped")
@@ -0,0 +1,162 @@
+"""Plan and run a backfill of only the candles that are not stored yet.
+
+The target is exchanges x market types x timeframes x symbols over a time
+range, starting no earlier than each symbol's listing. Stored coverage
+(first/last candle and the gaps in between, both tiers) is subtracted from
+it, leaving the fetch windows; neighbouring windows are joined when that
+costs no extra requests and long ones are sharded. The plan is printed with its
+request count, weight and wall time under each exchange's rate limits and,
+with --execute, run on all exchanges at once, each with its own rate limiter.
+
+Defaults come from the configuration below; override them on the command line:
+    python -m app.scripts.plan_backfill --exchanges binance --timeframes 1h 4h
+    python -m app.scripts.plan_backfill --symbols BTCUSDT ETHUSDT --execute
+    python -m app.scripts.plan_backfill --execute --profile profiles/backfill.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from datetime import UTC, datetime
+from pathlib import Path
+
+from app.db.session import AsyncSessionLocal
+from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.metrics import script_metrics
+from app.services.backfill import BackfillService, FetchWindow, estimate
+from app.storage.cold import ColdStore
+from app.tracing import script_tracing
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+# ── Configuration ──────────────────────────────────────────────
+EXCHANGES = list(ExchangeEnum)
+MARKET_TYPES = list(MarketTypeEnum)
+TIMEFRAMES = [TimeframeEnum.h1]
+SYMBOLS: list[str] = []  # empty = all active symbols
+START_TIME = datetime(2020, 1, 1)
+END_TIME = None  # None = up to the last closed candle
+MAX_CONCURRENT = 5  # windows in flight per exchange
+MAX_LISTED = 20  # windows printed per exchange
+# ───────────────────────────────────────────────────────────────
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--exchanges", nargs="+", type=ExchangeEnum, default=EXCHANGES)
+    parser.add_argument(
+        "--market-types", nargs="+", type=MarketTypeEnum, default=MARKET_TYPES
+    )
+    parser.add_argument(
+        "--timeframes", nargs="+", type=TimeframeEnum, default=TIMEFRAMES
+    )
+    parser.add_argument("--symbols", nargs="+", default=SYMBOLS)
+    parser.add_argument("--start", type=datetime.fromisoformat, default=START_TIME)
+    parser.add_argument("--end", type=datetime.fromisoformat, default=END_TIME)
+    parser.add_argument("--max-concurrent", type=int, default=MAX_CONCURRENT)
+    parser.add_argument(
+        "--json", type=Path, default=None, help="write the plan to this file"
+    )
+    parser.add_argument(
+        "--execute", action="store_true", help="run the plan after printing it"
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        default=None,
+        help="write a speedscope flamegraph of the run to this file",
+    )
+    return parser.parse_args()
+
+
+def print_plan(windows: list[FetchWindow]) -> None:
+    estimates = estimate(windows)
+    for exchange, est in estimates.items():
+        weight = ", ".join(f"{m.value} {w}" for m, w in est.weight.items())
+        print(
+            f"{exchange.value}: {est.windows} windows, {est.candles} candles, "
+            f"{est.requests} requests, weight {weight}, ~{est.seconds:.0f}s"
+        )
+        listed = [w for w in windows if w.exchange == exchange]
+        for window in listed[:MAX_LISTED]:
+            print(
+                f"  {window.market_type.value} {window.symbol} "
+                f"{window.timeframe.value}: {window.start_time} -> "
+                f"{window.end_time} ({window.candles} candles, "
+                f"{window.requests} requests)"
+            )
+        if len(listed) > MAX_LISTED:
+            print(f"  ... and {len(listed) - MAX_LISTED} more windows")
+
+    print("─" * 40)
+    if estimates:
+        # Exchanges run in parallel, so the slowest one sets the wall time
+        print(
+            f"Plan: {len(windows)} windows, "
+            f"{sum(e.requests for e in estimates.values())} requests, "
+            f"~{max(e.seconds for e in estimates.values()):.0f}s"
+        )
+    else:
+        print("Nothing to fetch.")
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with AsyncSessionLocal() as session:
+        windows = await BackfillService.plan(
+            session=session,
+            cold_store=ColdStore(),
+            exchanges=args.exchanges,
+            market_types=args.market_types,
+            timeframes=args.timeframes,
+            start_time=args.start,
+            end_time=args.end,
+            symbols=args.symbols or None,
+        )
+
+    print_plan(windows)
+    if args.json is not None:
+        plan = {
+            "generated_at": datetime.now(UTC).replace(tzinfo=None).isoformat(),
+            "estimates": [e.as_dict() for e in estimate(windows).values()],
+            "windows": [w.as_dict() for w in windows],
+        }
+        args.json.write_text(json.dumps(plan, indent=2))
+
+    if not args.execute or not windows:
+        return
+
+    results = await BackfillService.run(windows, args.max_concurrent)
+
+    total_fetched = 0
+    total_inserted = 0
+    errors: list[str] = []
+    for window, result in zip(windows, results):
+        if isinstance(result, BaseException):
+            errors.append(
+                f"{window.exchange.value} {window.market_type.value} "
+                f"{window.symbol} {window.timeframe.value} "
+                f"{window.start_time}: {result}"
+            )
+            continue
+        fetched, inserted = result
+        total_fetched += fetched
+        total_inserted += inserted
+
+    logger.info("─" * 40)
+    logger.info("Done. Fetched %d, inserted %d", total_fetched, total_inserted)
+    if errors:
+        logger.error("Failed (%d):\n  - %s", len(errors), "\n  - ".join(errors))
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with script_metrics("plan_backfill"), script_tracing("plan_backfill", args.profile):
+        asyncio.run(main(args))
@@ -0,0 +1,72 @@
+"""Keep every active symbol fresh with scheduled incremental syncs.
+
+Shortly after each candle close of the configured timeframes, queues a sync
+of the closed candles since the last stored one for every active symbol of
+the configured exchanges and market types. Syncs are started over SPREAD
+seconds, PRIORITIES first and then by traded volume, and freshness lag
+against FRESHNESS_TARGET_SECONDS is logged every REPORT_INTERVAL seconds
+(and exported as Prometheus gauges). Runs until interrupted.
+
+Edit the configuration below, then run:
+    python -m app.scripts.schedule_collection
+"""
+
+import asyncio
+import logging
+
+import httpx
+
+from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.metrics import script_metrics
+from app.services.mappers import EXCHANGE_CLIENTS
+from app.services.scheduler import CollectionScheduler
+from app.tracing import script_tracing
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+# ── Configuration ──────────────────────────────────────────────
+EXCHANGES = list(ExchangeEnum)
+MARKET_TYPES = [MarketTypeEnum.FUTURES]
+TIMEFRAMES = [TimeframeEnum.h1, TimeframeEnum.h4, TimeframeEnum.d1]
+PRIORITIES = {"BTCUSDT": 10, "ETHUSDT": 10}  # first; the rest by traded volume
+WORKERS = 4  # syncs at once per exchange, sharing its rate limit
+SETTLE_DELAY = 5.0  # seconds after a close before its syncs start
+SPREAD = 120.0  # seconds over which a close's syncs are started
+NEW_SERIES_CANDLES = 1000  # candles fetched for series without history
+REPORT_INTERVAL = 60.0  # seconds between freshness reports
+# ───────────────────────────────────────────────────────────────
+
+
+async def main() -> None:
+    async with httpx.AsyncClient(timeout=30) as http_client:
+        scheduler = CollectionScheduler(
+            exchanges=EXCHANGES,
+            market_types=MARKET_TYPES,
+            timeframes=TIMEFRAMES,
+            priorities=PRIORITIES,
+            workers=WORKERS,
+            settle_delay=SETTLE_DELAY,
+            spread=SPREAD,
+            new_series_candles=NEW_SERIES_CANDLES,
+            report_interval=REPORT_INTERVAL,
+            clients={
+                exchange: EXCHANGE_CLIENTS[exchange](http_client=http_client)
+                for exchange in EXCHANGES
+            },
+        )
+        await scheduler.run()
+
+
+if __name__ == "__main__":
+    with script_metrics("schedule_collection"), script_tracing("schedule_collection"):
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            logger.info("Stopped")
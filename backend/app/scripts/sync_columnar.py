@@ -0,0 +1,153 @@
+"""Build the columnar store (COLUMNAR_STORE_DIR) from both tiers.
+
+Writes every active series of the configured exchanges, market types and
+timeframes that is not stored yet (all of them with REBUILD) to memory-mapped
+column files. Each series is read from the cold tier and the hot table into
+a new directory, then, under the series lock that save_klines appends under,
+topped up with the candles committed meanwhile and swapped in. A build that
+may have missed a gap fill or revision committed meanwhile is discarded.
+Re-run it to rebuild those and series removed after inserts inside their
+range.
+
+Edit the configuration below, then run:
+    python -m app.scripts.sync_columnar
+"""
+
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from app.db.session import AsyncSessionLocal
+from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.repositories.coverage import CoverageRepository
+from app.repositories.klines import KlinesRepository
+from app.services.recent import SeriesRef
+from app.services.tiering import TieringService, rows_to_table
+from app.storage.cold import ColdStore
+from app.storage.columnar import ColumnarStore, columnar_store
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+# ── Configuration ──────────────────────────────────────────────
+EXCHANGES = list(ExchangeEnum)
+MARKET_TYPES = [MarketTypeEnum.FUTURES]
+TIMEFRAMES = [TimeframeEnum.h1, TimeframeEnum.h4, TimeframeEnum.d1]
+REBUILD = False  # also rebuild series already stored
+CONCURRENCY = 4  # series built at once, one DB connection each
+# ───────────────────────────────────────────────────────────────
+
+
+async def build_series(
+    ref: SeriesRef,
+    store: ColumnarStore,
+    cold_store: ColdStore,
+    semaphore: asyncio.Semaphore,
+) -> int:
+    async with semaphore, AsyncSessionLocal() as session:
+        builder = store.builder(ref.exchange_symbol_id, ref.timeframe)
+        try:
+            async for table in TieringService.stream_range(
+                session,
+                cold_store,
+                ref.exchange,
+                ref.market_type,
+                ref.symbol,
+                ref.exchange_symbol_id,
+                ref.timeframe,
+                chunk_size=50_000,
+                use_columnar=False,
+            ):
+                builder.write(table)
+
+            # Appends wait for the lock (in threads), and skip what the top-up
+            # wrote; writes the stream may have missed spoil the build
+            async with store.lock_async(ref.exchange_symbol_id, ref.timeframe):
+                start_time = None
+                if builder.last_ts is not None:
+                    start_time = builder.last_ts + timedelta(milliseconds=1)
+                rows = await KlinesRepository.get_klines(
+                    session, ref.exchange_symbol_id, ref.timeframe, start_time
+                )
+                published = builder.publish(rows_to_table(rows))
+        except BaseException:
+            builder.discard()
+            raise
+
+    if not published:
+        logger.warning(
+            "%s %s/%s %s: candles inside the series were written during the "
+            "build, discarded it; re-run to rebuild",
+            ref.symbol,
+            ref.exchange.value,
+            ref.market_type.value,
+            ref.timeframe.value,
+        )
+        return 0
+
+    logger.info(
+        "%s %s/%s %s: %d candles",
+        ref.symbol,
+        ref.exchange.value,
+        ref.market_type.value,
+        ref.timeframe.value,
+        builder.rows,
+    )
+    return builder.rows
+
+
+async def main() -> None:
+    if columnar_store is None:
+        logger.error("COLUMNAR_STORE_DIR is not set")
+        return
+    started = time.perf_counter()
+
+    async with AsyncSessionLocal() as session:
+        refs = [
+            SeriesRef(**row)
+            for row in await CoverageRepository.get_active_series(session)
+            if row["exchange"] in EXCHANGES
+            and row["market_type"] in MARKET_TYPES
+            and row["timeframe"] in TIMEFRAMES
+        ]
+    if not REBUILD:
+        refs = [
+            ref
+            for ref in refs
+            if columnar_store.row_count(ref.exchange_symbol_id, ref.timeframe) is None
+        ]
+    logger.info("Building %d series in %s", len(refs), columnar_store.root.resolve())
+
+    cold_store = ColdStore()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    results = await asyncio.gather(
+        *(build_series(ref, columnar_store, cold_store, semaphore) for ref in refs),
+        return_exceptions=True,
+    )
+
+    failed = [
+        f"{ref.symbol} {ref.timeframe.value} ({result})"
+        for ref, result in zip(refs, results)
+        if isinstance(result, Exception)
+    ]
+    total = sum(r for r in results if not isinstance(r, Exception))
+    logger.info("─" * 40)
+    logger.info(
+        "Done. %d candles in %d series, %.1fs",
+        total,
+        len(refs) - len(failed),
+        time.perf_counter() - started,
+    )
+    if failed:
+        logger.error("Failed (%d):\n  - %s", len(failed), "\n  - ".join(failed))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
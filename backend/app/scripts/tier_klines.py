@@ -0,0 +1,82 @@
+"""Move closed candles older than COLD_TIER_AFTER_DAYS to Parquet files.
+
+Edit the configuration below, then run:
+    python -m app.scripts.tier_klines
+"""
+
+import asyncio
+import logging
+from datetime import UTC, datetime
+
+from sqlalchemy import select
+
+from app.db.models import Exchange, ExchangeSymbol, MarketType, Symbol
+from app.db.session import AsyncSessionLocal
+from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.services.tiering import TieringService
+from app.storage.cold import ColdStore
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+# ── Configuration ──────────────────────────────────────────────
+EXCHANGE = ExchangeEnum.BYBIT
+MARKET_TYPE = MarketTypeEnum.FUTURES
+TIMEFRAMES = [TimeframeEnum.h1, TimeframeEnum.h4, TimeframeEnum.d1]
+# ───────────────────────────────────────────────────────────────
+
+
+async def main() -> None:
+    cold_store = ColdStore()
+    now = datetime.now(UTC).replace(tzinfo=None)
+
+    total_moved = 0
+    failed: list[str] = []
+
+    async with AsyncSessionLocal() as session:
+        query = (
+            select(ExchangeSymbol.id, Symbol.name)
+            .join(Exchange, ExchangeSymbol.exchange_id == Exchange.id)
+            .join(MarketType, ExchangeSymbol.market_type_id == MarketType.id)
+            .join(Symbol, ExchangeSymbol.symbol_id == Symbol.id)
+            .where(
+                Exchange.name == EXCHANGE.value,
+                MarketType.name == MARKET_TYPE.value,
+            )
+            .order_by(Symbol.name)
+        )
+        result = await session.execute(query)
+        exchange_symbols = result.all()
+
+        for es_id, symbol_name in exchange_symbols:
+            for timeframe in TIMEFRAMES:
+                try:
+                    total_moved += await TieringService.tier_series(
+                        session=session,
+                        cold_store=cold_store,
+                        exchange=EXCHANGE,
+                        market_type=MARKET_TYPE,
+                        symbol=symbol_name,
+                        exchange_symbol_id=es_id,
+                        timeframe=timeframe,
+                        now=now,
+                    )
+                except Exception as e:
+                    await session.rollback()
+                    failed.append(f"{symbol_name} {timeframe.value} ({e})")
+                    logger.error("SKIP %s %s: %s", symbol_name, timeframe.value, e)
+
+    logger.info("─" * 40)
+    logger.info("Done. Moved %d candles to %s", total_moved, cold_store.root.resolve())
+    if failed:
+        logger.error("Failed (%d):\n  - %s", len(failed), "\n  - ".join(failed))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,107 +1,192 @@
-"""Validate klines data integrity: detect gaps and duplicates.
+"""Validate klines data integrity: detect gaps, duplicates and off-grid candles.
+
+Every exchange/market type/timeframe combination is checked concurrently
+with three set-based queries over all of its series (a summary, gaps via
+LAG, duplicates), plus a NumPy pass over cold-tier timestamps. Results are
+printed and written as a JSON report.
 
 Edit the configuration below, then run:
     python -m app.scripts.validate_klines
 """
 
 import asyncio
-from datetime import timedelta
-
-from sqlalchemy import func, select
+import json
+import time
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
 
-from app.db.models import Candle, Exchange, ExchangeSymbol, MarketType, Symbol
 from app.db.session import AsyncSessionLocal
-from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.enums import TIMEFRAME_DELTA, ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.repositories.coverage import CoverageRepository
+from app.repositories.klines import KlinesRepository
+from app.repositories.quality import QualityRepository
+from app.storage.cold import ColdStore, cold_gaps
 
 
 # ── Configuration ──────────────────────────────────────────────
-EXCHANGE = ExchangeEnum.BYBIT
-MARKET_TYPE = MarketTypeEnum.FUTURES
-TIMEFRAME = TimeframeEnum.h1
+EXCHANGES = list(ExchangeEnum)
+MARKET_TYPES = list(MarketTypeEnum)
+TIMEFRAMES = list(TimeframeEnum)
+CONCURRENCY = 8  # combinations checked at once, one DB connection each
+REPORT_PATH = Path("validation_report.json")
+MAX_LISTED = 100  # gaps / duplicates listed per series in the report
 # ───────────────────────────────────────────────────────────────
 
-TIMEFRAME_DELTA = {
-    TimeframeEnum.h1: timedelta(hours=1),
-    TimeframeEnum.h4: timedelta(hours=4),
-    TimeframeEnum.d1: timedelta(days=1),
-}
-
 
-async def main() -> None:
-    expected_step = TIMEFRAME_DELTA[TIMEFRAME]
-
-    symbols_checked = 0
-    symbols_with_issues = 0
-
-    async with AsyncSessionLocal() as session:
-        # Get all active exchange symbols for the configured exchange + market type
-        query = (
-            select(ExchangeSymbol.id, Symbol.name)
-            .join(Exchange, ExchangeSymbol.exchange_id == Exchange.id)
-            .join(MarketType, ExchangeSymbol.market_type_id == MarketType.id)
-            .join(Symbol, ExchangeSymbol.symbol_id == Symbol.id)
-            .where(
-                Exchange.name == EXCHANGE.value,
-                MarketType.name == MARKET_TYPE.value,
-                ExchangeSymbol.is_active.is_(True),
+def gap_item(prev_ts: datetime, next_ts: datetime, step: timedelta) -> dict:
+    return {
+        "after": prev_ts.isoformat(),
+        "before": next_ts.isoformat(),
+        "missing": max(0, (next_ts - prev_ts) // step - 1),
+        "irregular": (next_ts - prev_ts) % step != timedelta(0),
+    }
+
+
+async def validate_combination(
+    exchange: ExchangeEnum,
+    market_type: MarketTypeEnum,
+    timeframe: TimeframeEnum,
+    cold_store: ColdStore,
+    semaphore: asyncio.Semaphore,
+) -> dict:
+    step = TIMEFRAME_DELTA[timeframe]
+    async with semaphore, AsyncSessionLocal() as session:
+        exchange_symbols = await KlinesRepository.resolve_exchange_symbols(
+            session, exchange, market_type
+        )
+        ids = [es_id for es_id, _ in exchange_symbols]
+        summary, gaps, duplicates, cold_until = [], [], [], {}
+        if ids:
+            summary = await QualityRepository.get_series_summary(
+                session, ids, timeframe
             )
-            .order_by(Symbol.name)
+            gaps = await QualityRepository.find_gaps(session, ids, timeframe)
+            duplicates = await QualityRepository.find_duplicates(
+                session, ids, timeframe
+            )
+            cold_until = await CoverageRepository.get_cold_until_many(
+                session, ids, timeframe
+            )
+
+    summary_by_id = {row[0]: row[1:] for row in summary}
+    gaps_by_id: dict[int, list] = {}
+    for es_id, prev_ts, next_ts in gaps:
+        gaps_by_id.setdefault(es_id, []).append((prev_ts, next_ts))
+    duplicates_by_id: dict[int, list] = {}
+    for es_id, ts, count in duplicates:
+        duplicates_by_id.setdefault(es_id, []).append((ts, count))
+
+    series = []
+    for es_id, symbol in exchange_symbols:
+        count, first_ts, last_ts, off_grid = summary_by_id.get(
+            es_id, (0, None, None, 0)
         )
-        result = await session.execute(query)
-        exchange_symbols = result.all()
-
-        for es_id, symbol_name in exchange_symbols:
-            symbols_checked += 1
-
-            # Check duplicates
-            dup_query = (
-                select(Candle.timestamp, func.count().label("cnt"))
-                .where(
-                    Candle.exchange_symbol_id == es_id,
-                    Candle.timeframe == TIMEFRAME.value,
-                )
-                .group_by(Candle.timestamp)
-                .having(func.count() > 1)
+        series_gaps = gaps_by_id.get(es_id, [])
+        if es_id in cold_until:
+            cold_ts = cold_store.read_timestamps(
+                exchange, market_type, symbol, timeframe
             )
-            dup_result = await session.execute(dup_query)
-            duplicates = dup_result.all()
-
-            # Get sorted timestamps for gap detection
-            ts_query = (
-                select(Candle.timestamp)
-                .where(
-                    Candle.exchange_symbol_id == es_id,
-                    Candle.timeframe == TIMEFRAME.value,
-                )
-                .order_by(Candle.timestamp)
+            series_gaps = cold_gaps(cold_ts, first_ts, step) + series_gaps
+            count += len(cold_ts)
+            if len(cold_ts):
+                first_ts = cold_ts[0].astype(datetime)
+                last_ts = last_ts or cold_ts[-1].astype(datetime)
+        if count == 0:
+            continue
+
+        series_duplicates = duplicates_by_id.get(es_id, [])
+        series.append(
+            {
+                "symbol": symbol,
+                "candles": count,
+                "first_ts": first_ts.isoformat(),
+                "last_ts": last_ts.isoformat() if last_ts else None,
+                "gap_count": len(series_gaps),
+                "missing_candles": sum(
+                    max(0, (b - a) // step - 1) for a, b in series_gaps
+                ),
+                "duplicate_count": len(series_duplicates),
+                "off_grid_count": off_grid,
+                "gaps": [gap_item(a, b, step) for a, b in series_gaps[:MAX_LISTED]],
+                "duplicates": [
+                    {"timestamp": ts.isoformat(), "count": n}
+                    for ts, n in series_duplicates[:MAX_LISTED]
+                ],
+            }
+        )
+
+    with_issues = [
+        s
+        for s in series
+        if s["gap_count"] or s["duplicate_count"] or s["off_grid_count"]
+    ]
+    return {
+        "exchange": exchange.value,
+        "market_type": market_type.value,
+        "timeframe": timeframe.value,
+        "series_checked": len(series),
+        "series_with_issues": len(with_issues),
+        "candles": sum(s["candles"] for s in series),
+        "gaps": sum(s["gap_count"] for s in series),
+        "missing_candles": sum(s["missing_candles"] for s in series),
+        "duplicates": sum(s["duplicate_count"] for s in series),
+        "off_grid": sum(s["off_grid_count"] for s in series),
+        "series": with_issues,
+    }
+
+
+def print_combination(result: dict) -> None:
+    print(
+        f"{result['exchange']}/{result['market_type']}/{result['timeframe']}: "
+        f"{result['series_checked']} symbols, {result['series_with_issues']} with issues"
+    )
+    for s in result["series"]:
+        print(
+            f"  {s['symbol']}: {s['candles']} candles, {s['gap_count']} gaps "
+            f"({s['missing_candles']} missing), {s['duplicate_count']} duplicates, "
+            f"{s['off_grid_count']} off-grid"
+        )
+        for gap in s["gaps"][:5]:
+            print(
+                f"    gap: {gap['after']} -> {gap['before']} ({gap['missing']} missing)"
             )
-            ts_result = await session.execute(ts_query)
-            timestamps = [row[0] for row in ts_result.all()]
-
-            # Detect gaps
-            gaps = []
-            for i in range(1, len(timestamps)):
-                diff = timestamps[i] - timestamps[i - 1]
-                if diff != expected_step:
-                    gaps.append((timestamps[i - 1], timestamps[i], diff))
-
-            if duplicates or gaps:
-                symbols_with_issues += 1
-                print(
-                    f"{symbol_name}: {len(timestamps)} candles, "
-                    f"{len(gaps)} gaps, {len(duplicates)} duplicates"
-                )
-                for prev_ts, next_ts, diff in gaps[:5]:
-                    print(f"  gap: {prev_ts} -> {next_ts} (delta={diff})")
-                if len(gaps) > 5:
-                    print(f"  ... and {len(gaps) - 5} more gaps")
-                for ts, cnt in duplicates[:5]:
-                    print(f"  duplicate: {ts} (count={cnt})")
+        if s["gap_count"] > 5:
+            print(f"    ... and {s['gap_count'] - 5} more gaps")
+        for dup in s["duplicates"][:5]:
+            print(f"    duplicate: {dup['timestamp']} (count={dup['count']})")
+
+
+async def main() -> None:
+    started = time.perf_counter()
+    cold_store = ColdStore()
+    combinations = [
+        (exchange, market_type, timeframe)
+        for exchange in EXCHANGES
+        for market_type in MARKET_TYPES
+        for timeframe in TIMEFRAMES
+    ]
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    results = await asyncio.gather(
+        *(validate_combination(*combo, cold_store, semaphore) for combo in combinations)
+    )
+    results = [r for r in results if r["series_checked"]]
+    elapsed = time.perf_counter() - started
+
+    for result in results:
+        print_combination(result)
+
+    report = {
+        "generated_at": datetime.now(UTC).replace(tzinfo=None).isoformat(),
+        "elapsed_seconds": round(elapsed, 3),
+        "combinations": results,
+    }
+    REPORT_PATH.write_text(json.dumps(report, indent=2))
 
     print("─" * 40)
     print(
-        f"Done. Checked {symbols_checked} symbols, "
-        f"{symbols_with_issues} with issues."
+        f"Done. Checked {sum(r['series_checked'] for r in results)} series, "
+        f"{sum(r['series_with_issues'] for r in results)} with issues, "
+        f"in {elapsed:.1f}s. Report: {REPORT_PATH}"
     )
 
 
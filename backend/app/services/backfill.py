@@ -0,0 +1,451 @@
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+from app.enums import TIMEFRAME_DELTA, ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.repositories.coverage import CoverageRepository
+from app.repositories.klines import KlinesRepository
+from app.repositories.quality import QualityRepository
+from app.repositories.symbols import SymbolsRepository
+from app.services.mappers import EXCHANGE_CLIENTS
+from app.services.timeframes import (
+    ceil_timestamp,
+    current_candle_open,
+    floor_timestamp,
+)
+from app.storage.cold import ColdStore, cold_gaps
+from app.tracing import tracer
+
+
+logger = logging.getLogger(__name__)
+
+# Windows longer than this many pages are split into page-aligned shards, so
+# one long history is fetched by several tasks without extra requests
+SHARD_PAGES = 10
+
+
+@dataclass
+class FetchWindow:
+    """Candles to fetch for one series, from start_time up to end_time (exclusive)."""
+
+    exchange: ExchangeEnum
+    market_type: MarketTypeEnum
+    symbol: str
+    exchange_symbol_id: int
+    timeframe: TimeframeEnum
+    start_time: datetime
+    end_time: datetime
+
+    @property
+    def candles(self) -> int:
+        return (self.end_time - self.start_time) // TIMEFRAME_DELTA[self.timeframe]
+
+    @property
+    def requests(self) -> int:
+        return page_count(self.candles, EXCHANGE_CLIENTS[self.exchange].PAGE_LIMIT)
+
+    @property
+    def weight(self) -> int:
+        client_cls = EXCHANGE_CLIENTS[self.exchange]
+        return self.requests * client_cls.REQUEST_WEIGHT.get(self.market_type, 1)
+
+    def as_dict(self) -> dict:
+        return {
+            "exchange": self.exchange.value,
+            "market_type": self.market_type.value,
+            "symbol": self.symbol,
+            "timeframe": self.timeframe.value,
+            "start_time": self.start_time.isoformat(),
+            "end_time": self.end_time.isoformat(),
+            "candles": self.candles,
+            "requests": self.requests,
+            "weight": self.weight,
+        }
+
+
+@dataclass
+class ExchangeEstimate:
+    """Cost of the windows of one exchange under its rate limits."""
+
+    exchange: ExchangeEnum
+    windows: int = 0
+    candles: int = 0
+    requests: int = 0
+    weight: dict[MarketTypeEnum, int] = field(default_factory=dict)
+
+    @property
+    def seconds(self) -> float:
+        """
+        Wall time at the client's request rate, or at the weight budget of a
+        market type if that is the tighter limit.
+        """
+        client_cls = EXCHANGE_CLIENTS[self.exchange]
+        seconds = self.requests / client_cls.RATE_LIMIT
+        for market_type, weight in self.weight.items():
+            if market_type in client_cls.WEIGHT_LIMIT:
+                limit = client_cls.WEIGHT_LIMIT[market_type]
+                seconds = max(seconds, weight / limit * 60)
+        return seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "exchange": self.exchange.value,
+            "windows": self.windows,
+            "candles": self.candles,
+            "requests": self.requests,
+            "weight": {m.value: w for m, w in self.weight.items()},
+            "seconds": round(self.seconds, 1),
+        }
+
+
+def page_count(candles: int, page_limit: int) -> int:
+    """Requests needed for a window: full pages plus a partial one."""
+    return -(-candles // page_limit)
+
+
+def missing_windows(
+    start_time: datetime,
+    end_time: datetime,
+    step: timedelta,
+    first_ts: datetime | None,
+    last_ts: datetime | None,
+    gaps: list[tuple[datetime, datetime]],
+) -> list[tuple[datetime, datetime]]:
+    """
+    Ranges of [start_time, end_time) not covered by a stored series.
+
+    That is the range before its first candle, the gaps between consecutive
+    candles (previous, next timestamp) and the range after its last candle.
+    """
+    if first_ts is None:
+        ranges = [(start_time, end_time)]
+    else:
+        ranges = [(start_time, first_ts)]
+        ranges += [(prev_ts + step, next_ts) for prev_ts, next_ts in gaps]
+        ranges.append((last_ts + step, end_time))
+
+    windows = []
+    for window_start, window_end in ranges:
+        window_start = max(window_start, start_time)
+        window_end = min(window_end, end_time)
+        if window_end - window_start >= step:
+            windows.append((window_start, window_end))
+    return windows
+
+
+def merge_windows(
+    windows: list[tuple[datetime, datetime]], step: timedelta, page_limit: int
+) -> list[tuple[datetime, datetime]]:
+    """
+    Join neighbouring windows when fetching across the stored candles between
+    them takes no more requests than fetching them apart.
+
+    Refetched candles are ignored by save_klines.
+    """
+    merged: list[tuple[datetime, datetime]] = []
+    for window_start, window_end in windows:
+        if merged:
+            prev_start, prev_end = merged[-1]
+            apart = page_count((prev_end - prev_start) // step, page_limit) + (
+                page_count((window_end - window_start) // step, page_limit)
+            )
+            if page_count((window_end - prev_start) // step, page_limit) <= apart:
+                merged[-1] = (prev_start, window_end)
+                continue
+        merged.append((window_start, window_end))
+    return merged
+
+
+def shard_windows(
+    windows: list[tuple[datetime, datetime]], step: timedelta, page_limit: int
+) -> list[tuple[datetime, datetime]]:
+    """Split windows into shards of at most SHARD_PAGES full pages."""
+    shard = step * page_limit * SHARD_PAGES
+    shards = []
+    for window_start, window_end in windows:
+        while window_end - window_start > shard:
+            shards.append((window_start, window_start + shard))
+            window_start += shard
+        shards.append((window_start, window_end))
+    return shards
+
+
+def estimate(windows: list[FetchWindow]) -> dict[ExchangeEnum, ExchangeEstimate]:
+    """Request count, weight and wall time of a plan, per exchange."""
+    estimates: dict[ExchangeEnum, ExchangeEstimate] = {}
+    for window in windows:
+        est = estimates.setdefault(window.exchange, ExchangeEstimate(window.exchange))
+        est.windows += 1
+        est.candles += window.candles
+        est.requests += window.requests
+        est.weight[window.market_type] = (
+            est.weight.get(window.market_type, 0) + window.weight
+        )
+    return estimates
+
+
+class BackfillService:
+    """Plan backfills from stored coverage and run them per exchange."""
+
+    @staticmethod
+    async def plan(
+        session: AsyncSession,
+        cold_store: ColdStore,
+        exchanges: list[ExchangeEnum],
+        market_types: list[MarketTypeEnum],
+        timeframes: list[TimeframeEnum],
+        start_time: datetime,
+        end_time: datetime | None = None,
+        symbols: list[str] | None = None,
+    ) -> list[FetchWindow]:
+        """
+        Fetch windows that bring every target series up to date.
+
+        Targets are the given symbols (all active ones if None) on every
+        exchange/market type that lists them, for each timeframe, between
+        start_time and end_time (None = up to the forming candle, which is
+        never planned). Nothing before a symbol's listing time is planned;
+        symbols without one are probed once and the result is stored.
+        """
+        windows: list[FetchWindow] = []
+        for exchange in exchanges:
+            page_limit = EXCHANGE_CLIENTS[exchange].PAGE_LIMIT
+            for market_type in market_types:
+                exchange_symbols = await KlinesRepository.resolve_exchange_symbols(
+                    session, exchange, market_type, symbols
+                )
+                if not exchange_symbols:
+                    continue
+                listed_at = await BackfillService._listing_times(
+                    session, exchange, market_type, exchange_symbols
+                )
+                for timeframe in timeframes:
+                    step = TIMEFRAME_DELTA[timeframe]
+                    start = ceil_timestamp(start_time, timeframe)
+                    end = current_candle_open(timeframe)
+                    if end_time is not None:
+                        end = min(end, ceil_timestamp(end_time, timeframe))
+                    if end <= start:
+                        continue
+
+                    names = dict(exchange_symbols)
+                    coverage = {
+                        row["exchange_symbol_id"]: row
+                        for row in await CoverageRepository.get_coverage(
+                            session, exchange, market_type, timeframe=timeframe
+                        )
+                        if row["exchange_symbol_id"] in names
+                    }
+                    gaps = await BackfillService._series_gaps(
+                        session,
+                        cold_store,
+                        exchange,
+                        market_type,
+                        timeframe,
+                        [
+                            row
+                            for row in coverage.values()
+                            if row["gap_count"] > 0
+                            and row["first_ts"] < end
+                            and row["last_ts"] >= start
+                        ],
+                    )
+                    for es_id, symbol in exchange_symbols:
+                        row = coverage.get(es_id)
+                        series_start = start
+                        if es_id in listed_at:
+                            series_start = max(
+                                start, floor_timestamp(listed_at[es_id], timeframe)
+                            )
+                        ranges = missing_windows(
+                            series_start,
+                            end,
+                            step,
+                            row["first_ts"] if row else None,
+                            row["last_ts"] if row else None,
+                            gaps.get(es_id, []),
+                        )
+                        windows += [
+                            FetchWindow(
+                                exchange,
+                                market_type,
+                                symbol,
+                                es_id,
+                                timeframe,
+                                window_start,
+                                window_end,
+                            )
+                            for window_start, window_end in shard_windows(
+                                merge_windows(ranges, step, page_limit),
+                                step,
+                                page_limit,
+                            )
+                        ]
+        return windows
+
+    @staticmethod
+    async def _listing_times(
+        session: AsyncSession,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        exchange_symbols: list[tuple[int, str]],
+    ) -> dict[int, datetime]:
+        """
+        Listing times by exchange_symbol_id, probing the exchange for the
+        symbols whose instrument listing did not publish one.
+        """
+        listed_at = await SymbolsRepository.get_listed_at(
+            session, [es_id for es_id, _ in exchange_symbols]
+        )
+        missing = [(i, name) for i, name in exchange_symbols if i not in listed_at]
+        if not missing:
+            return listed_at
+
+        async with httpx.AsyncClient(timeout=30) as http_client:
+            client = EXCHANGE_CLIENTS[exchange](http_client=http_client)
+            probed = await asyncio.gather(
+                *(
+                    client.get_first_candle_time(name, market_type)
+                    for _, name in missing
+                ),
+                return_exceptions=True,
+            )
+        found = {}
+        for (es_id, name), result in zip(missing, probed):
+            if isinstance(result, Exception):
+                logger.warning(
+                    "Listing time of %s %s %s unknown: %s",
+                    exchange.value,
+                    market_type.value,
+                    name,
+                    result,
+                )
+            elif result is not None:
+                found[es_id] = result
+        if found:
+            await SymbolsRepository.set_listed_at(session, found)
+        logger.info(
+            "Probed listing times of %d %s %s symbols",
+            len(missing),
+            exchange.value,
+            market_type.value,
+        )
+        return {**listed_at, **found}
+
+    @staticmethod
+    async def _series_gaps(
+        session: AsyncSession,
+        cold_store: ColdStore,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        timeframe: TimeframeEnum,
+        gapped: list[dict],
+    ) -> dict[int, list[tuple[datetime, datetime]]]:
+        """Interior gaps of series (coverage rows) that have any, by id."""
+        if not gapped:
+            return {}
+
+        step = TIMEFRAME_DELTA[timeframe]
+        gaps: dict[int, list[tuple[datetime, datetime]]] = defaultdict(list)
+        for row in gapped:
+            if row["cold_until"] is None:
+                continue
+            es_id = row["exchange_symbol_id"]
+            cold_ts = cold_store.read_timestamps(
+                exchange, market_type, row["symbol"], timeframe
+            )
+            first_hot = await KlinesRepository.get_first_timestamp(
+                session, es_id, timeframe
+            )
+            gaps[es_id] += cold_gaps(cold_ts, first_hot, step)
+
+        for es_id, prev_ts, next_ts in await QualityRepository.find_gaps(
+            session, [row["exchange_symbol_id"] for row in gapped], timeframe
+        ):
+            gaps[es_id].append((prev_ts, next_ts))
+        return gaps
+
+    @staticmethod
+    async def run(
+        windows: list[FetchWindow], max_concurrent: int
+    ) -> list[tuple[int, int] | BaseException]:
+        """
+        Fetch and store every window, one exchange alongside the other.
+
+        Each exchange gets its own client, so its own rate limiter, and up to
+        max_concurrent windows in flight.
+
+        Returns:
+            (fetched, inserted) or the exception raised, per window in order
+        """
+        by_exchange: dict[ExchangeEnum, list[int]] = defaultdict(list)
+        for idx, window in enumerate(windows):
+            by_exchange[window.exchange].append(idx)
+
+        results: list[tuple[int, int] | BaseException] = [(0, 0)] * len(windows)
+
+        async def run_exchange(exchange: ExchangeEnum, indices: list[int]) -> None:
+            semaphore = asyncio.Semaphore(max_concurrent)
+            async with httpx.AsyncClient(timeout=30) as http_client:
+                client = EXCHANGE_CLIENTS[exchange](http_client=http_client)
+                outcomes = await asyncio.gather(
+                    *(
+                        BackfillService._fetch_window(client, windows[i], semaphore)
+                        for i in indices
+                    ),
+                    return_exceptions=True,
+                )
+            for i, outcome in zip(indices, outcomes):
+                results[i] = outcome
+
+        await asyncio.gather(
+            *(run_exchange(exchange, idx) for exchange, idx in by_exchange.items())
+        )
+        return results
+
+    @staticmethod
+    async def _fetch_window(
+        client, window: FetchWindow, semaphore: asyncio.Semaphore
+    ) -> tuple[int, int]:
+        async with semaphore, AsyncSessionLocal() as session:
+            fetched = 0
+            inserted = 0
+            with tracer.start_as_current_span(
+                "backfill_window",
+                attributes={
+                    "exchange": window.exchange.value,
+                    "symbol": window.symbol,
+                    "timeframe": window.timeframe.value,
+                },
+            ):
+                # Exchanges treat the end time as inclusive
+                async for batch in client.get_klines(
+                    symbol=window.symbol,
+                    timeframe=window.timeframe,
+                    start_time=window.start_time,
+                    end_time=window.end_time - timedelta(milliseconds=1),
+                    market_type=window.market_type,
+                ):
+                    inserted += await KlinesRepository.save_klines(
+                        session, window.exchange_symbol_id, window.timeframe, batch
+                    )
+                    fetched += len(batch)
+
+        logger.info(
+            "%s %s %s %s %s..%s: fetched %d, inserted %d",
+            window.exchange.value,
+            window.market_type.value,
+            window.symbol,
+            window.timeframe.value,
+            window.start_time.isoformat(),
+            window.end_time.isoformat(),
+            fetched,
+            inserted,
+        )
+        return fetched, inserted
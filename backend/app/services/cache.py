@@ -0,0 +1,392 @@
+import asyncio
+import hashlib
+import json
+import logging
+import shutil
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from pathlib import Path
+
+import asyncpg
+from fastapi import Response, status
+
+from app.config import settings
+from app.enums import TIMEFRAME_DELTA, TimeframeEnum
+from app.repositories.klines import CANDLES_WRITTEN_CHANNEL
+from app.repositories.symbols import SYMBOLS_UPDATED_CHANNEL
+from app.services.timeframes import EPOCH
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    """
+    Cached response body plus what it depends on.
+
+    series is (exchange_symbol_id, timeframe) for candle reads and
+    (exchange, market_type) for symbol reads; related lists further series
+    of responses built from several. start/end bound the candle window
+    (None = unbounded). expires_at is a wall-clock timestamp, None for
+    windows made only of closed candles.
+    """
+
+    body: bytes
+    media_type: str
+    etag: str
+    series: tuple
+    start: datetime | None = None
+    end: datetime | None = None
+    expires_at: float | None = None
+    related: tuple[tuple, ...] = ()
+    size: int = field(init=False)
+
+    def __post_init__(self):
+        self.size = len(self.body)
+
+    @property
+    def all_series(self) -> tuple[tuple, ...]:
+        return (self.series, *self.related)
+
+    def is_expired(self) -> bool:
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+    def overlaps(self, first_ts: datetime, last_ts: datetime) -> bool:
+        return (self.start is None or self.start <= last_ts) and (
+            self.end is None or self.end > first_ts
+        )
+
+    def to_response(self, if_none_match: str | None = None) -> Response:
+        headers = {"ETag": self.etag}
+        if if_none_match is not None and self.etag in if_none_match:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=self.body, media_type=self.media_type, headers=headers)
+
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def make_key(scope: str, params: dict) -> str:
+    """Build a cache key from the endpoint scope and its query parameters."""
+    return f"{scope}:{json.dumps(params, sort_keys=True, default=str)}"
+
+
+def window_expires_at(
+    window_end: datetime | None,
+    forming_open: datetime,
+    timeframe: TimeframeEnum,
+) -> float | None:
+    """
+    None for windows made only of closed candles, otherwise the close time
+    of the forming candle as a Unix timestamp.
+    """
+    if window_end is not None and window_end <= forming_open:
+        return None
+    return (forming_open + TIMEFRAME_DELTA[timeframe] - EPOCH).total_seconds()
+
+
+class ResponseCache:
+    """
+    Bounded-memory LRU of read responses with optional on-disk spillover.
+
+    Entries evicted from memory are written to spill_dir (if set) and
+    promoted back on the next hit. Entries are dropped only when they expire,
+    are evicted from both tiers, or are invalidated by a write to the series
+    and window they cover.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        max_entry_bytes: int,
+        spill_dir: Path | None = None,
+        spill_max_bytes: int = 0,
+    ):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+
+        self._memory: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._memory_bytes = 0
+        # Spilled entries keep metadata here and the body on disk
+        self._disk: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._disk_bytes = 0
+        self._keys_by_series: dict[tuple, set[str]] = {}
+        self._generations: dict[tuple, int] = {}
+        # Bumped by clear(), which invalidates every series
+        self._epoch = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        if self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> CacheEntry | None:
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+        elif key in self._disk:
+            entry = self._load_spilled(key)
+
+        if entry is not None and entry.is_expired():
+            self._discard(key)
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def generation(self, *series: tuple) -> int:
+        """
+        Invalidation counter of one or more series; read it before building
+        a response.
+        """
+        return self._epoch + sum(self._generations.get(s, 0) for s in series)
+
+    def put(self, key: str, entry: CacheEntry, generation: int | None = None) -> None:
+        """
+        Store an entry. With a generation, the entry is dropped if the series
+        was invalidated while the response was being built.
+        """
+        if entry.size > self.max_entry_bytes:
+            return
+        if generation is not None and generation != self.generation(*entry.all_series):
+            return
+        self._discard(key)
+        self._memory[key] = entry
+        self._memory_bytes += entry.size
+        for series in entry.all_series:
+            self._keys_by_series.setdefault(series, set()).add(key)
+        self._evict()
+
+    def invalidate_series(
+        self,
+        series: tuple,
+        first_ts: datetime | None = None,
+        last_ts: datetime | None = None,
+    ) -> int:
+        """
+        Drop entries of a series whose window overlaps [first_ts, last_ts].
+
+        Without bounds, every entry of the series is dropped.
+        """
+        self._generations[series] = self.generation(series) + 1
+        dropped = 0
+        for key in list(self._keys_by_series.get(series, ())):
+            entry = self._memory.get(key) or self._disk.get(key)
+            if entry is None:
+                continue
+            if first_ts is None or last_ts is None or entry.overlaps(first_ts, last_ts):
+                self._discard(key)
+                dropped += 1
+        return dropped
+
+    def clear(self) -> None:
+        """Drop every entry, including responses being built."""
+        self._epoch += 1
+        for key in list(self._memory) + list(self._disk):
+            self._discard(key)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._memory),
+            "bytes": self._memory_bytes,
+            "spilled_entries": len(self._disk),
+            "spilled_bytes": self._disk_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _evict(self) -> None:
+        while self._memory_bytes > self.max_bytes and self._memory:
+            key, entry = self._memory.popitem(last=False)
+            self._memory_bytes -= entry.size
+            if self.spill_dir is not None and entry.size <= self.spill_max_bytes:
+                self._spill(key, entry)
+            else:
+                self._forget(key, entry)
+
+        while self._disk_bytes > self.spill_max_bytes and self._disk:
+            key, entry = self._disk.popitem(last=False)
+            self._disk_bytes -= entry.size
+            self._spill_path(key).unlink(missing_ok=True)
+            self._forget(key, entry)
+
+    def _spill(self, key: str, entry: CacheEntry) -> None:
+        self._spill_path(key).write_bytes(entry.body)
+        self._disk[key] = replace(entry, body=b"")
+        self._disk[key].size = entry.size
+        self._disk_bytes += entry.size
+
+    def _load_spilled(self, key: str) -> CacheEntry | None:
+        meta = self._disk.pop(key)
+        self._disk_bytes -= meta.size
+        path = self._spill_path(key)
+        try:
+            body = path.read_bytes()
+        except FileNotFoundError:
+            self._forget(key, meta)
+            return None
+        path.unlink(missing_ok=True)
+
+        entry = replace(meta, body=body)
+        self._memory[key] = entry
+        self._memory_bytes += entry.size
+        self._evict()
+        return entry
+
+    def _discard(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry.size
+        else:
+            entry = self._disk.pop(key, None)
+            if entry is None:
+                return
+            self._disk_bytes -= entry.size
+            self._spill_path(key).unlink(missing_ok=True)
+        self._forget(key, entry)
+
+    def _forget(self, key: str, entry: CacheEntry) -> None:
+        for series in entry.all_series:
+            keys = self._keys_by_series.get(series)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_series[series]
+
+    def _spill_path(self, key: str) -> Path:
+        name = hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+        return self.spill_dir / f"{name}.bin"
+
+
+response_cache = ResponseCache(
+    max_bytes=settings.CACHE_MAX_BYTES,
+    max_entry_bytes=settings.CACHE_MAX_ENTRY_BYTES,
+    spill_dir=settings.CACHE_SPILL_DIR,
+    spill_max_bytes=settings.CACHE_SPILL_MAX_BYTES,
+)
+
+
+async def cache_stream(
+    chunks: AsyncIterator[bytes],
+    key: str,
+    entry: CacheEntry,
+    generation: int,
+) -> AsyncIterator[bytes]:
+    """
+    Pass a streamed body through while collecting it for the cache.
+
+    Collection stops once the body outgrows CACHE_MAX_ENTRY_BYTES, and
+    nothing is cached if the client disconnects before the end.
+    """
+    collected: list[bytes] | None = []
+    size = 0
+    async for chunk in chunks:
+        if collected is not None:
+            size += len(chunk)
+            if size > response_cache.max_entry_bytes:
+                collected = None
+            else:
+                collected.append(chunk)
+        yield chunk
+
+    if collected is not None:
+        body = b"".join(collected)
+        response_cache.put(
+            key, replace(entry, body=body, etag=make_etag(body)), generation
+        )
+
+
+# Other in-process caches keyed by candle series, called as
+# callback((exchange_symbol_id, timeframe), first_ts, last_ts)
+_candles_written_callbacks: list[Callable[[tuple, datetime, datetime], None]] = []
+
+
+def on_candles_written(callback: Callable[[tuple, datetime, datetime], None]) -> None:
+    """Register a callback for committed candle inserts from any process."""
+    _candles_written_callbacks.append(callback)
+
+
+# Called with no arguments to drop everything when write notifications may
+# have been missed
+_invalidations_missed_callbacks: list[Callable[[], None]] = []
+
+
+def on_invalidations_missed(callback: Callable[[], None]) -> None:
+    """Register a callback for (re)connections of the invalidation listener."""
+    _invalidations_missed_callbacks.append(callback)
+
+
+def _on_candles_written(connection, pid, channel, payload: str) -> None:
+    exchange_symbol_id, timeframe, first_ts, last_ts = payload.split(",")
+    series = (int(exchange_symbol_id), timeframe)
+    first_ts = datetime.fromisoformat(first_ts)
+    last_ts = datetime.fromisoformat(last_ts)
+
+    response_cache.invalidate_series(series, first_ts, last_ts)
+    for callback in _candles_written_callbacks:
+        callback(series, first_ts, last_ts)
+
+
+def _on_symbols_updated(connection, pid, channel, payload: str) -> None:
+    exchange, market_type = payload.split(",")
+    response_cache.invalidate_series((exchange, market_type))
+
+
+def _flush_caches() -> None:
+    response_cache.clear()
+    for callback in _invalidations_missed_callbacks:
+        callback()
+
+
+async def listen_for_invalidations(
+    retry_delay: float = 5.0, ping_interval: float = 30.0
+) -> None:
+    """
+    Subscribe to write notifications so that writes from any process (API,
+    backfill scripts) invalidate this process' cache. Runs until cancelled.
+
+    A lost connection (closed, or not answering a ping every ping_interval
+    seconds) is reopened, retrying every retry_delay seconds while the
+    database is down. The caches are flushed on every (re)connection, as
+    writes meanwhile went unnoticed.
+    """
+    dsn = settings.async_database_url.replace("postgresql+asyncpg://", "postgresql://")
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _: lost.set())
+            await connection.add_listener(CANDLES_WRITTEN_CHANNEL, _on_candles_written)
+            await connection.add_listener(SYMBOLS_UPDATED_CHANNEL, _on_symbols_updated)
+            _flush_caches()
+            logger.info("Listening for cache invalidations")
+
+            while not lost.is_set():
+                try:
+                    await asyncio.wait_for(lost.wait(), ping_interval)
+                except TimeoutError:
+                    await connection.fetchval("SELECT 1", timeout=ping_interval)
+            logger.warning("Cache invalidation connection closed, reconnecting")
+        except Exception as e:
+            logger.warning(
+                "Cache invalidation connection failed, retrying in %.0fs: %s",
+                retry_delay,
+                e,
+            )
+            await asyncio.sleep(retry_delay)
+        finally:
+            if connection is not None and not connection.is_closed():
+                connection.terminate()
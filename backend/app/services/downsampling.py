@@ -0,0 +1,82 @@
+import numpy as np
+import pyarrow as pa
+
+from app.enums import DownsampleEnum
+
+
+def _bucket_edges(n: int, n_buckets: int) -> np.ndarray:
+    """Split range(n) into n_buckets contiguous buckets of near-equal size."""
+    return np.linspace(0, n, n_buckets + 1).astype(np.int64)
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of n_out points that preserve the
+    visual shape of the y(x) line.
+
+    The first and last points are always kept; every bucket in between
+    contributes the point forming the largest triangle with the previously
+    selected point and the mean of the next bucket. Per-bucket work is
+    vectorized, only the walk over buckets is a Python loop.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = 1 + _bucket_edges(n - 2, n_out - 2)
+    # Bucket means via prefix sums; the last point is the "next bucket" of the
+    # final bucket.
+    x_sum = np.concatenate([[0.0], np.cumsum(x)])
+    y_sum = np.concatenate([[0.0], np.cumsum(y)])
+    next_starts = np.append(edges[1:-1], n - 1)
+    next_ends = np.append(edges[2:], n)
+    counts = next_ends - next_starts
+    avg_x = (x_sum[next_ends] - x_sum[next_starts]) / counts
+    avg_y = (y_sum[next_ends] - y_sum[next_starts]) / counts
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        area = np.abs(
+            (x[prev] - avg_x[bucket]) * (y[start:end] - y[prev])
+            - (x[prev] - x[start:end]) * (avg_y[bucket] - y[prev])
+        )
+        prev = start + int(np.argmax(area))
+        selected[bucket + 1] = prev
+    return selected
+
+
+def ohlc_buckets(table: pa.Table, n_out: int) -> pa.Table:
+    """
+    Merge consecutive candles into n_out candles: first open, max high,
+    min low, last close, summed volume, stamped with the first open time.
+    """
+    n = table.num_rows
+    if n_out >= n:
+        return table
+
+    starts = _bucket_edges(n, n_out)[:-1]
+    ends = np.append(starts[1:], n) - 1
+    columns = {
+        "timestamp": table["timestamp"].to_numpy()[starts],
+        "open": table["open"].to_numpy()[starts],
+        "high": np.maximum.reduceat(table["high"].to_numpy(), starts),
+        "low": np.minimum.reduceat(table["low"].to_numpy(), starts),
+        "close": table["close"].to_numpy()[ends],
+        "volume": np.add.reduceat(table["volume"].to_numpy(), starts),
+    }
+    return pa.Table.from_pydict(columns, schema=table.schema)
+
+
+def downsample(table: pa.Table, max_points: int, method: DownsampleEnum) -> pa.Table:
+    """Reduce a candle table to at most max_points rows."""
+    if table.num_rows <= max_points:
+        return table
+    if method == DownsampleEnum.LTTB:
+        x = table["timestamp"].cast(pa.int64()).to_numpy().astype(np.float64)
+        y = table["close"].to_numpy()
+        return table.take(lttb_indices(x, y, max_points))
+    return ohlc_buckets(table, max_points)
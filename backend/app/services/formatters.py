@@ -0,0 +1,159 @@
+import io
+import json
+from collections.abc import AsyncIterator
+
+import msgpack
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+
+from app.enums import KlinesFormatEnum
+
+
+MEDIA_TYPES: dict[KlinesFormatEnum, str] = {
+    KlinesFormatEnum.JSON: "application/json",
+    KlinesFormatEnum.NDJSON: "application/x-ndjson",
+    KlinesFormatEnum.CSV: "text/csv",
+    KlinesFormatEnum.ARROW: "application/vnd.apache.arrow.stream",
+    KlinesFormatEnum.PARQUET: "application/vnd.apache.parquet",
+    KlinesFormatEnum.MSGPACK: "application/msgpack",
+}
+
+_FORMATS_BY_MEDIA_TYPE = {media: fmt for fmt, media in MEDIA_TYPES.items()}
+
+
+def negotiate_format(
+    requested: KlinesFormatEnum | None, accept: str | None
+) -> KlinesFormatEnum:
+    """
+    Pick the response format: explicit format param, then the first supported
+    media type in the Accept header, then JSON.
+    """
+    if requested is not None:
+        return requested
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        if media_type in _FORMATS_BY_MEDIA_TYPE:
+            return _FORMATS_BY_MEDIA_TYPE[media_type]
+    return KlinesFormatEnum.JSON
+
+
+def encode_sse(event: str, data: str) -> bytes:
+    """One Server-Sent Events message; data must not contain newlines."""
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands out what was written since last drain."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _with_iso_timestamps(table: pa.Table) -> pa.Table:
+    """Replace the timestamp column with ISO 8601 strings (second precision)."""
+    timestamps = pc.strftime(
+        table["timestamp"].cast(pa.timestamp("s")), format="%Y-%m-%dT%H:%M:%S"
+    )
+    index = table.schema.get_field_index("timestamp")
+    return table.set_column(index, "timestamp", timestamps)
+
+
+def csv_header(table_schema: pa.Schema) -> bytes:
+    return (",".join(table_schema.names) + "\n").encode()
+
+
+def table_to_csv(table: pa.Table) -> bytes:
+    """Encode a candle table as CSV rows without a header."""
+    buffer = io.BytesIO()
+    pcsv.write_csv(
+        _with_iso_timestamps(table),
+        buffer,
+        write_options=pcsv.WriteOptions(include_header=False, quoting_style="none"),
+    )
+    return buffer.getvalue()
+
+
+def table_to_ndjson(table: pa.Table) -> bytes:
+    """Encode a candle table as newline-delimited JSON objects."""
+    rows = _with_iso_timestamps(table).to_pylist()
+    return "".join(json.dumps(row) + "\n" for row in rows).encode()
+
+
+def table_to_msgpack(table: pa.Table) -> bytes:
+    """
+    Encode a candle table as one msgpack map of column arrays.
+
+    Timestamps are epoch milliseconds. A streamed response is a sequence of
+    such maps, readable with msgpack.Unpacker.
+    """
+    columns = {}
+    for name in table.column_names:
+        column = table[name]
+        if pa.types.is_timestamp(column.type):
+            column = column.cast(pa.timestamp("ms")).cast(pa.int64())
+        columns[name] = column.to_numpy().tolist()
+    return msgpack.packb(columns)
+
+
+async def single_table(table: pa.Table) -> AsyncIterator[pa.Table]:
+    """A table as a stream of one, for encode_tables."""
+    yield table
+
+
+async def encode_tables(
+    tables: AsyncIterator[pa.Table],
+    table_schema: pa.Schema,
+    fmt: KlinesFormatEnum,
+) -> AsyncIterator[bytes]:
+    """Encode a stream of tables chunk by chunk in the given format."""
+    if fmt == KlinesFormatEnum.CSV:
+        yield csv_header(table_schema)
+        async for table in tables:
+            yield table_to_csv(table)
+
+    elif fmt in (KlinesFormatEnum.JSON, KlinesFormatEnum.NDJSON):
+        async for table in tables:
+            yield table_to_ndjson(table)
+
+    elif fmt == KlinesFormatEnum.MSGPACK:
+        async for table in tables:
+            yield table_to_msgpack(table)
+
+    elif fmt == KlinesFormatEnum.ARROW:
+        sink = _ChunkSink()
+        with pa.ipc.new_stream(sink, table_schema) as writer:
+            async for table in tables:
+                writer.write_table(table)
+                yield sink.drain()
+        yield sink.drain()
+
+    elif fmt == KlinesFormatEnum.PARQUET:
+        # Each chunk becomes a row group; the footer is sent last.
+        sink = _ChunkSink()
+        with pq.ParquetWriter(sink, table_schema, compression="zstd") as writer:
+            async for table in tables:
+                writer.write_table(table)
+                yield sink.drain()
+        yield sink.drain()
+
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
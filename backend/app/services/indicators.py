@@ -0,0 +1,249 @@
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+import pyarrow as pa
+from fastapi import HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.enums import (
+    ExchangeEnum,
+    IndicatorEnum,
+    KlinesFormatEnum,
+    MarketTypeEnum,
+    TimeframeEnum,
+)
+from app.indicators import IndicatorState, compute
+from app.repositories.klines import KlinesRepository
+from app.schemas.klines import IndicatorRequest, IndicatorResponse
+from app.services.cache import on_candles_written, on_invalidations_missed
+from app.services.formatters import (
+    MEDIA_TYPES,
+    encode_tables,
+    negotiate_format,
+    single_table,
+)
+from app.services.tiering import TieringService
+from app.services.timeframes import current_candle_open
+from app.storage.cold import ColdStore
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedIndicator:
+    """Indicator output over a series' closed candles, plus state to extend it."""
+
+    timestamps: np.ndarray
+    outputs: dict[str, np.ndarray]
+    state: IndicatorState
+    last_ts: datetime | None
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + sum(v.nbytes for v in self.outputs.values())
+
+
+class IndicatorCache:
+    """Byte-bounded LRU of indicator results keyed by (series, indicator, params)."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, CachedIndicator] = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: tuple) -> CachedIndicator | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, entry: CachedIndicator) -> None:
+        self.discard(key)
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def discard(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def invalidate(self, series: tuple, first_ts: datetime, last_ts: datetime) -> None:
+        """
+        Drop results whose history changed. Inserts after a result's last
+        candle are picked up incrementally and need no invalidation.
+        """
+        for key, entry in list(self._entries.items()):
+            if key[:2] == series and entry.last_ts is not None:
+                if first_ts <= entry.last_ts:
+                    self.discard(key)
+
+
+indicator_cache = IndicatorCache(settings.INDICATOR_CACHE_MAX_BYTES)
+on_candles_written(indicator_cache.invalidate)
+on_invalidations_missed(indicator_cache.clear)
+
+
+class IndicatorsService:
+
+    @staticmethod
+    async def compute_series(
+        session: AsyncSession,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol: str,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        indicator: IndicatorEnum,
+        period: int,
+        std_dev: float = 2.0,
+    ) -> CachedIndicator:
+        """
+        Indicator over all closed candles of a series.
+
+        A cached result is extended with the candles stored after its last
+        timestamp, starting from the saved state; only a cache miss reads and
+        computes the full history.
+        """
+        key = (exchange_symbol_id, timeframe.value, indicator.value, period, std_dev)
+        closed_until = current_candle_open(timeframe)
+        cached = indicator_cache.get(key)
+
+        start_time = None
+        if cached is not None and cached.last_ts is not None:
+            # Stored timestamps have at most microsecond precision
+            start_time = cached.last_ts + timedelta(microseconds=1)
+            if start_time >= closed_until:
+                return cached
+
+        table = await TieringService.read_range(
+            session=session,
+            cold_store=ColdStore(),
+            exchange=exchange,
+            market_type=market_type,
+            symbol=symbol,
+            exchange_symbol_id=exchange_symbol_id,
+            timeframe=timeframe,
+            start_time=start_time,
+            end_time=closed_until,
+        )
+        if cached is not None and table.num_rows == 0:
+            return cached
+
+        arrays = {name: table[name].to_numpy() for name in ("high", "low", "close")}
+        timestamps = table["timestamp"].to_numpy()
+        outputs, state = compute(
+            indicator,
+            arrays,
+            period,
+            std_dev,
+            state=cached.state if cached is not None else None,
+        )
+
+        if cached is not None:
+            timestamps = np.concatenate([cached.timestamps, timestamps])
+            outputs = {
+                name: np.concatenate([cached.outputs[name], values])
+                for name, values in outputs.items()
+            }
+
+        last_ts = table["timestamp"][-1].as_py() if table.num_rows else None
+        if last_ts is None and cached is not None:
+            last_ts = cached.last_ts
+        result = CachedIndicator(timestamps, outputs, state, last_ts)
+        indicator_cache.put(key, result)
+        return result
+
+    @staticmethod
+    async def get_indicator(
+        session: AsyncSession,
+        indicator_request: IndicatorRequest,
+        accept: str | None = None,
+    ) -> Response:
+        fmt = negotiate_format(indicator_request.format, accept)
+
+        exchange_symbol_id = await KlinesRepository.resolve_exchange_symbol_id(
+            session=session,
+            exchange=indicator_request.exchange,
+            market_type=indicator_request.market_type,
+            symbol_name=indicator_request.symbol,
+            active_only=False,
+        )
+        if exchange_symbol_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Symbol '{indicator_request.symbol}' not found for "
+                f"{indicator_request.exchange}/{indicator_request.market_type}",
+            )
+
+        try:
+            result = await IndicatorsService.compute_series(
+                session=session,
+                exchange=indicator_request.exchange,
+                market_type=indicator_request.market_type,
+                symbol=indicator_request.symbol,
+                exchange_symbol_id=exchange_symbol_id,
+                timeframe=indicator_request.timeframe,
+                indicator=indicator_request.indicator,
+                period=indicator_request.period,
+                std_dev=indicator_request.std_dev,
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to compute indicator: {e}",
+            )
+
+        lo, hi = 0, len(result.timestamps)
+        if indicator_request.start_time is not None:
+            lo = np.searchsorted(
+                result.timestamps, np.datetime64(indicator_request.start_time)
+            )
+        if indicator_request.end_time is not None:
+            hi = np.searchsorted(
+                result.timestamps, np.datetime64(indicator_request.end_time)
+            )
+
+        table = pa.table(
+            {
+                "timestamp": pa.array(
+                    result.timestamps[lo:hi], type=pa.timestamp("ms")
+                ),
+                **{
+                    name: pa.array(values[lo:hi], from_pandas=True)
+                    for name, values in result.outputs.items()
+                },
+            }
+        )
+
+        if fmt != KlinesFormatEnum.JSON:
+            return StreamingResponse(
+                encode_tables(single_table(table), table.schema, fmt),
+                media_type=MEDIA_TYPES[fmt],
+            )
+
+        return Response(
+            content=IndicatorResponse(
+                exchange=indicator_request.exchange,
+                market_type=indicator_request.market_type,
+                symbol=indicator_request.symbol,
+                timeframe=indicator_request.timeframe,
+                indicator=indicator_request.indicator,
+                period=indicator_request.period,
+                timestamps=table["timestamp"].to_pylist(),
+                values={name: table[name].to_pylist() for name in result.outputs},
+            ).model_dump_json(),
+            media_type=MEDIA_TYPES[fmt],
+        )
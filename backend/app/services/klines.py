@@ -1,18 +1,471 @@
-from fastapi import HTTPException, status
+import asyncio
+import json
+import logging
+import time
+from collections.abc import AsyncGenerator
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
+
+import pyarrow as pa
+from fastapi import HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.types import Receive
 
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+from app.enums import TIMEFRAME_DELTA, KlinesFormatEnum, TimeframeEnum
+from app.repositories.coverage import CoverageRepository
 from app.repositories.klines import KlinesRepository
-from app.schemas.klines import CollectKlinesRequest, CollectKlinesResponse
+from app.repositories.symbols import SymbolsRepository
+from app.schemas.klines import (
+    CollectKlinesRequest,
+    CollectKlinesResponse,
+    CollectProgress,
+    CoverageRequest,
+    CoverageResponse,
+    FreshnessRequest,
+    FreshnessResponse,
+    KlinesRequest,
+    KlinesResponse,
+    RecentKlinesRequest,
+    SeriesFreshnessItem,
+    TieringStatsResponse,
+)
+from app.services.cache import (
+    CacheEntry,
+    cache_stream,
+    make_etag,
+    make_key,
+    response_cache,
+    window_expires_at,
+)
+from app.services.downsampling import downsample
+from app.services.formatters import (
+    MEDIA_TYPES,
+    encode_sse,
+    encode_tables,
+    negotiate_format,
+    single_table,
+)
 from app.services.mappers import EXCHANGE_CLIENTS
+from app.services.recent import SeriesRef, recent_candles
+from app.services.tiering import TieringService, tiering_stats
+from app.services.timeframes import (
+    current_candle_open,
+    floor_timestamp,
+    freshness_lag,
+)
+from app.storage.cold import CANDLE_SCHEMA, ColdStore
+from app.tracing import tracer
+
+
+logger = logging.getLogger(__name__)
+
+
+async def _wait_for_disconnect(receive: Receive) -> None:
+    """Return once the client of a request whose body was read disconnects."""
+    while (await receive())["type"] != "http.disconnect":
+        pass
 
 
 class KlinesService:
 
+    @staticmethod
+    async def get_klines(
+        session: AsyncSession,
+        klines_request: KlinesRequest,
+        accept: str | None = None,
+        if_none_match: str | None = None,
+    ) -> Response:
+        """
+        Read stored candles from both tiers.
+
+        json returns one keyset page (timestamp > cursor, never OFFSET); other
+        formats stream the whole range in chunks from a server-side cursor.
+        Responses are cached; windows that end before the forming candle never
+        expire and are only dropped when a write lands inside them.
+        """
+        fmt = negotiate_format(klines_request.format, accept)
+        key = make_key(
+            "klines", {**klines_request.model_dump(mode="json"), "format": fmt.value}
+        )
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached.to_response(if_none_match)
+
+        exchange_symbol_id = await KlinesRepository.resolve_exchange_symbol_id(
+            session=session,
+            exchange=klines_request.exchange,
+            market_type=klines_request.market_type,
+            symbol_name=klines_request.symbol,
+            active_only=False,
+        )
+        if exchange_symbol_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Symbol '{klines_request.symbol}' not found for "
+                f"{klines_request.exchange}/{klines_request.market_type}",
+            )
+
+        series = (exchange_symbol_id, klines_request.timeframe.value)
+        generation = response_cache.generation(series)
+        forming_open = current_candle_open(klines_request.timeframe)
+
+        start_time = klines_request.start_time
+        if klines_request.cursor is not None:
+            # Stored timestamps have at most microsecond precision
+            after_cursor = klines_request.cursor + timedelta(microseconds=1)
+            start_time = max(start_time, after_cursor) if start_time else after_cursor
+
+        entry = CacheEntry(
+            body=b"",
+            media_type=MEDIA_TYPES[fmt],
+            etag="",
+            series=series,
+            start=start_time,
+            end=klines_request.end_time,
+        )
+
+        if klines_request.max_points is not None:
+            return await KlinesService._get_downsampled(
+                session,
+                klines_request,
+                exchange_symbol_id,
+                fmt,
+                key,
+                entry,
+                generation,
+                if_none_match,
+            )
+
+        if fmt != KlinesFormatEnum.JSON:
+            # Streams ignore the cursor and hold the whole requested window
+            entry.start = klines_request.start_time
+            entry.expires_at = window_expires_at(
+                klines_request.end_time, forming_open, klines_request.timeframe
+            )
+            chunks = KlinesService._stream_klines(
+                klines_request, exchange_symbol_id, fmt
+            )
+            return StreamingResponse(
+                cache_stream(chunks, key, entry, generation),
+                media_type=MEDIA_TYPES[fmt],
+            )
+
+        ref = SeriesRef(
+            exchange=klines_request.exchange,
+            market_type=klines_request.market_type,
+            symbol=klines_request.symbol,
+            exchange_symbol_id=exchange_symbol_id,
+            timeframe=klines_request.timeframe,
+        )
+        try:
+            # Recent windows are served from the ring buffer when it has them
+            ring = await recent_candles.peek(session, ref)
+            if ring is not None and ring.covers(start_time):
+                table = ring.window(
+                    start_time, klines_request.end_time, klines_request.limit
+                )
+            else:
+                table = await TieringService.read_range(
+                    session=session,
+                    cold_store=ColdStore(),
+                    exchange=klines_request.exchange,
+                    market_type=klines_request.market_type,
+                    symbol=klines_request.symbol,
+                    exchange_symbol_id=exchange_symbol_id,
+                    timeframe=klines_request.timeframe,
+                    start_time=start_time,
+                    end_time=klines_request.end_time,
+                    limit=klines_request.limit,
+                )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch klines: {e}",
+            )
+
+        candles = table.to_pylist()
+        next_cursor = None
+        if len(candles) == klines_request.limit:
+            next_cursor = candles[-1]["timestamp"]
+            # A full page cannot change past its last candle
+            entry.end = next_cursor + timedelta(microseconds=1)
+
+        body = KlinesResponse(
+            exchange=klines_request.exchange,
+            market_type=klines_request.market_type,
+            symbol=klines_request.symbol,
+            timeframe=klines_request.timeframe,
+            candles=candles,
+            count=len(candles),
+            next_cursor=next_cursor,
+        ).model_dump_json()
+
+        entry = replace(entry, body=body.encode(), etag=make_etag(body.encode()))
+        entry.expires_at = window_expires_at(
+            entry.end, forming_open, klines_request.timeframe
+        )
+        response_cache.put(key, entry, generation)
+        return entry.to_response(if_none_match)
+
+    @staticmethod
+    async def get_recent(
+        session: AsyncSession,
+        recent_request: RecentKlinesRequest,
+        accept: str | None = None,
+    ) -> Response:
+        """
+        Read the newest candles of a series, oldest first, from the recent
+        candle ring buffers (loaded on first use); limits above
+        RECENT_CACHE_CANDLES are read from the database instead.
+        """
+        fmt = negotiate_format(recent_request.format, accept)
+        exchange_symbol_id = recent_candles.exchange_symbol_id(
+            recent_request.exchange, recent_request.market_type, recent_request.symbol
+        )
+        if exchange_symbol_id is None:
+            exchange_symbol_id = await KlinesRepository.resolve_exchange_symbol_id(
+                session=session,
+                exchange=recent_request.exchange,
+                market_type=recent_request.market_type,
+                symbol_name=recent_request.symbol,
+                active_only=False,
+            )
+        if exchange_symbol_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Symbol '{recent_request.symbol}' not found for "
+                f"{recent_request.exchange}/{recent_request.market_type}",
+            )
+
+        ref = SeriesRef(
+            exchange=recent_request.exchange,
+            market_type=recent_request.market_type,
+            symbol=recent_request.symbol,
+            exchange_symbol_id=exchange_symbol_id,
+            timeframe=recent_request.timeframe,
+        )
+        try:
+            if recent_request.limit <= recent_candles.capacity:
+                ring = await recent_candles.get(session, ref)
+                table = ring.tail(recent_request.limit)
+            else:
+                table = await recent_candles.read_tail(
+                    session, ref, recent_request.limit
+                )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch klines: {e}",
+            )
+
+        if fmt == KlinesFormatEnum.JSON:
+            candles = table.to_pylist()
+            body = (
+                KlinesResponse(
+                    exchange=recent_request.exchange,
+                    market_type=recent_request.market_type,
+                    symbol=recent_request.symbol,
+                    timeframe=recent_request.timeframe,
+                    candles=candles,
+                    count=len(candles),
+                    next_cursor=None,
+                )
+                .model_dump_json()
+                .encode()
+            )
+        else:
+            body = b"".join(
+                [
+                    chunk
+                    async for chunk in encode_tables(
+                        single_table(table), CANDLE_SCHEMA, fmt
+                    )
+                ]
+            )
+        return Response(content=body, media_type=MEDIA_TYPES[fmt])
+
+    @staticmethod
+    async def _get_downsampled(
+        session: AsyncSession,
+        klines_request: KlinesRequest,
+        exchange_symbol_id: int,
+        fmt: KlinesFormatEnum,
+        key: str,
+        entry: CacheEntry,
+        generation: int,
+        if_none_match: str | None,
+    ) -> Response:
+        """
+        Whole range reduced to max_points candles, in any format, in one body;
+        the cursor does not apply.
+        """
+        try:
+            table = await TieringService.read_range(
+                session=session,
+                cold_store=ColdStore(),
+                exchange=klines_request.exchange,
+                market_type=klines_request.market_type,
+                symbol=klines_request.symbol,
+                exchange_symbol_id=exchange_symbol_id,
+                timeframe=klines_request.timeframe,
+                start_time=klines_request.start_time,
+                end_time=klines_request.end_time,
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch klines: {e}",
+            )
+
+        table = downsample(table, klines_request.max_points, klines_request.downsample)
+
+        if fmt == KlinesFormatEnum.JSON:
+            candles = table.to_pylist()
+            body = (
+                KlinesResponse(
+                    exchange=klines_request.exchange,
+                    market_type=klines_request.market_type,
+                    symbol=klines_request.symbol,
+                    timeframe=klines_request.timeframe,
+                    candles=candles,
+                    count=len(candles),
+                    next_cursor=None,
+                )
+                .model_dump_json()
+                .encode()
+            )
+        else:
+            body = b"".join(
+                [
+                    chunk
+                    async for chunk in encode_tables(
+                        single_table(table), CANDLE_SCHEMA, fmt
+                    )
+                ]
+            )
+
+        entry = replace(
+            entry,
+            body=body,
+            etag=make_etag(body),
+            start=klines_request.start_time,
+        )
+        entry.expires_at = window_expires_at(
+            klines_request.end_time,
+            current_candle_open(klines_request.timeframe),
+            klines_request.timeframe,
+        )
+        response_cache.put(key, entry, generation)
+        return entry.to_response(if_none_match)
+
+    @staticmethod
+    async def _stream_klines(
+        klines_request: KlinesRequest,
+        exchange_symbol_id: int,
+        fmt: KlinesFormatEnum,
+    ) -> AsyncGenerator[bytes, None]:
+        """Encode streamed candle chunks; owns its session for the response lifetime."""
+        async with AsyncSessionLocal() as session:
+            tables = TieringService.stream_range(
+                session=session,
+                cold_store=ColdStore(),
+                exchange=klines_request.exchange,
+                market_type=klines_request.market_type,
+                symbol=klines_request.symbol,
+                exchange_symbol_id=exchange_symbol_id,
+                timeframe=klines_request.timeframe,
+                start_time=klines_request.start_time,
+                end_time=klines_request.end_time,
+            )
+            async for chunk in encode_tables(tables, CANDLE_SCHEMA, fmt):
+                yield chunk
+
     @staticmethod
     async def collect(
         session: AsyncSession,
         collect_klines_request: CollectKlinesRequest,
     ) -> CollectKlinesResponse:
+        exchange_symbol_id, start_time = await KlinesService._collection_start(
+            session, collect_klines_request
+        )
+        client = EXCHANGE_CLIENTS[collect_klines_request.exchange]()
+
+        total_fetched = 0
+        total_inserted = 0
+
+        try:
+            with tracer.start_as_current_span(
+                "collect",
+                attributes={
+                    "exchange": collect_klines_request.exchange.value,
+                    "symbol": collect_klines_request.symbol,
+                    "timeframe": collect_klines_request.timeframe.value,
+                },
+            ):
+                async for batch in client.get_klines(
+                    symbol=collect_klines_request.symbol,
+                    timeframe=collect_klines_request.timeframe,
+                    start_time=start_time,
+                    end_time=collect_klines_request.end_time,
+                    market_type=collect_klines_request.market_type,
+                ):
+                    inserted = await KlinesRepository.save_klines(
+                        session=session,
+                        exchange_symbol_id=exchange_symbol_id,
+                        timeframe=collect_klines_request.timeframe,
+                        klines=batch,
+                    )
+                    total_fetched += len(batch)
+                    total_inserted += inserted
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"Failed to fetch klines from exchange: {e}",
+            )
+
+        return CollectKlinesResponse(
+            exchange=collect_klines_request.exchange,
+            market_type=collect_klines_request.market_type,
+            symbol=collect_klines_request.symbol,
+            timeframe=collect_klines_request.timeframe,
+            fetched=total_fetched,
+            inserted=total_inserted,
+        )
+
+    @staticmethod
+    async def collect_stream(
+        session: AsyncSession,
+        collect_klines_request: CollectKlinesRequest,
+        receive: Receive,
+    ) -> StreamingResponse:
+        """
+        Collect like collect(), streaming progress as Server-Sent Events.
+
+        A `progress` event follows every saved page, then `done` with the
+        totals, or `error` if the exchange fails mid-way. The fetch stops as
+        soon as the client disconnects (watched on the ASGI receive channel).
+        """
+        exchange_symbol_id, start_time = await KlinesService._collection_start(
+            session, collect_klines_request
+        )
+        events = KlinesService._collect_events(
+            collect_klines_request, exchange_symbol_id, start_time, receive
+        )
+        return StreamingResponse(
+            events,
+            media_type="text/event-stream",
+            # Keep proxies from buffering the events
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @staticmethod
+    async def _collection_start(
+        session: AsyncSession, collect_klines_request: CollectKlinesRequest
+    ) -> tuple[int, datetime]:
+        """The series to collect and the start time, clamped to its listing."""
         exchange_symbol_id = await KlinesRepository.resolve_exchange_symbol_id(
             session=session,
             exchange=collect_klines_request.exchange,
@@ -26,38 +479,212 @@ class KlinesService:
                 f"{collect_klines_request.exchange}/{collect_klines_request.market_type}",
             )
 
+        # Nothing to fetch before the symbol was listed
+        start_time = collect_klines_request.start_time
+        listed_at = await SymbolsRepository.get_listed_at(session, [exchange_symbol_id])
+        if exchange_symbol_id in listed_at:
+            start_time = max(
+                start_time,
+                floor_timestamp(
+                    listed_at[exchange_symbol_id], collect_klines_request.timeframe
+                ),
+            )
+        return exchange_symbol_id, start_time
+
+    @staticmethod
+    async def _collect_events(
+        collect_klines_request: CollectKlinesRequest,
+        exchange_symbol_id: int,
+        start_time: datetime,
+        receive: Receive,
+    ) -> AsyncGenerator[bytes, None]:
+        """Run a collection, yielding SSE messages; owns its session."""
+        timeframe = collect_klines_request.timeframe
         client = EXCHANGE_CLIENTS[collect_klines_request.exchange]()
+        end_time = collect_klines_request.end_time or current_candle_open(timeframe)
+        expected = max(0, -(-(end_time - start_time) // TIMEFRAME_DELTA[timeframe]))
 
+        pages = client.get_klines(
+            symbol=collect_klines_request.symbol,
+            timeframe=timeframe,
+            start_time=start_time,
+            end_time=collect_klines_request.end_time,
+            market_type=collect_klines_request.market_type,
+        )
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        next_page = None
+        started = time.perf_counter()
+        n_pages = 0
         total_fetched = 0
         total_inserted = 0
 
         try:
-            async for batch in client.get_klines(
-                symbol=collect_klines_request.symbol,
-                timeframe=collect_klines_request.timeframe,
-                start_time=collect_klines_request.start_time,
-                end_time=collect_klines_request.end_time,
-                market_type=collect_klines_request.market_type,
-            ):
-                inserted = await KlinesRepository.save_klines(
-                    session=session,
-                    exchange_symbol_id=exchange_symbol_id,
-                    timeframe=collect_klines_request.timeframe,
-                    klines=batch,
-                )
-                total_fetched += len(batch)
-                total_inserted += inserted
+            async with AsyncSessionLocal() as session:
+                while True:
+                    # Race each page against the client going away, so an
+                    # abandoned collection stops mid-request
+                    next_page = asyncio.ensure_future(anext(pages))
+                    await asyncio.wait(
+                        (next_page, disconnected),
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                    if not next_page.done():
+                        logger.info(
+                            "Client disconnected, stopping collection of %s %s",
+                            collect_klines_request.symbol,
+                            timeframe.value,
+                        )
+                        return
+                    try:
+                        batch = next_page.result()
+                    except StopAsyncIteration:
+                        break
+
+                    total_inserted += await KlinesRepository.save_klines(
+                        session=session,
+                        exchange_symbol_id=exchange_symbol_id,
+                        timeframe=timeframe,
+                        klines=batch,
+                    )
+                    total_fetched += len(batch)
+                    n_pages += 1
+
+                    elapsed = time.perf_counter() - started
+                    rate = total_fetched / elapsed if elapsed > 0 else 0.0
+                    remaining = max(expected - total_fetched, 0)
+                    progress = CollectProgress(
+                        pages=n_pages,
+                        fetched=total_fetched,
+                        inserted=total_inserted,
+                        cursor=(
+                            batch[0].timestamp
+                            if client.DESCENDING_PAGES
+                            else batch[-1].timestamp
+                        ),
+                        candles_per_second=round(rate, 1),
+                        retries=client.retries,
+                        expected=expected,
+                        eta_seconds=round(remaining / rate, 1) if rate else None,
+                    )
+                    yield encode_sse("progress", progress.model_dump_json())
         except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_502_BAD_GATEWAY,
-                detail=f"Failed to fetch klines from exchange: {e}",
+            logger.warning("Streamed collection failed: %s", e)
+            detail = json.dumps(
+                {"detail": f"Failed to fetch klines from exchange: {e}"}
             )
+            yield encode_sse("error", detail)
+            return
+        finally:
+            disconnected.cancel()
+            if next_page is not None and not next_page.done():
+                # The generator cannot be closed while a page is in flight
+                next_page.cancel()
+                await asyncio.wait([next_page])
+            await pages.aclose()
 
-        return CollectKlinesResponse(
+        result = CollectKlinesResponse(
             exchange=collect_klines_request.exchange,
             market_type=collect_klines_request.market_type,
             symbol=collect_klines_request.symbol,
-            timeframe=collect_klines_request.timeframe,
+            timeframe=timeframe,
             fetched=total_fetched,
             inserted=total_inserted,
         )
+        yield encode_sse("done", result.model_dump_json())
+
+    @staticmethod
+    async def get_coverage(
+        session: AsyncSession,
+        coverage_request: CoverageRequest,
+    ) -> CoverageResponse:
+        try:
+            series = await CoverageRepository.get_coverage(
+                session=session,
+                exchange=coverage_request.exchange,
+                market_type=coverage_request.market_type,
+                symbol_name=coverage_request.symbol,
+                timeframe=coverage_request.timeframe,
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch coverage: {e}",
+            )
+
+        return CoverageResponse(
+            exchange=coverage_request.exchange,
+            market_type=coverage_request.market_type,
+            series=series,
+            count=len(series),
+        )
+
+    @staticmethod
+    async def get_freshness(
+        session: AsyncSession,
+        freshness_request: FreshnessRequest,
+    ) -> FreshnessResponse:
+        try:
+            coverage = await CoverageRepository.get_coverage(
+                session=session,
+                exchange=freshness_request.exchange,
+                market_type=freshness_request.market_type,
+                timeframe=freshness_request.timeframe,
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch coverage: {e}",
+            )
+
+        target = freshness_request.target_seconds
+        if target is None:
+            target = settings.FRESHNESS_TARGET_SECONDS
+        now = datetime.now(UTC).replace(tzinfo=None)
+        series = []
+        for row in coverage:
+            timeframe = TimeframeEnum(row["timeframe"])
+            lag = freshness_lag(row["last_ts"], timeframe, now).total_seconds()
+            series.append(
+                SeriesFreshnessItem(
+                    symbol=row["symbol"],
+                    timeframe=timeframe,
+                    last_ts=row["last_ts"],
+                    lag_seconds=lag,
+                    within_target=lag <= target,
+                )
+            )
+        series.sort(key=lambda item: item.lag_seconds, reverse=True)
+
+        return FreshnessResponse(
+            exchange=freshness_request.exchange,
+            market_type=freshness_request.market_type,
+            target_seconds=target,
+            series=series,
+            count=len(series),
+            over_target=sum(not item.within_target for item in series),
+        )
+
+    @staticmethod
+    async def get_tiering_stats(session: AsyncSession) -> TieringStatsResponse:
+        try:
+            cold_count, total_count = await CoverageRepository.get_tier_totals(session)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch tiering stats: {e}",
+            )
+
+        return TieringStatsResponse(
+            cold_candles=cold_count,
+            total_candles=total_count,
+            cold_fraction=cold_count / total_count if total_count else 0.0,
+            cold_reads=tiering_stats.cold_reads,
+            cold_rows_read=tiering_stats.cold_rows,
+            cold_read_seconds=tiering_stats.cold_seconds,
+            hot_reads=tiering_stats.hot_reads,
+            hot_rows_read=tiering_stats.hot_rows,
+            hot_read_seconds=tiering_stats.hot_seconds,
+            columnar_reads=tiering_stats.columnar_reads,
+            columnar_rows_read=tiering_stats.columnar_rows,
+            columnar_read_seconds=tiering_stats.columnar_seconds,
+        )
@@ -0,0 +1,343 @@
+"""Live kline ingestion from exchange WebSocket streams.
+
+LiveIngestionService subscribes to the kline streams of every active symbol
+of an exchange and market type, many streams per connection, and hands the
+closed candles to a shared CandleWriter, which saves them in batches.
+Connections are reopened with backoff when they drop; after each (re)connect
+the candles that closed while no stream was listening are fetched over REST.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import timedelta
+
+from websockets.asyncio.client import ClientConnection, connect
+from websockets.exceptions import ConnectionClosed
+
+from app.db.session import AsyncSessionLocal
+from app.enums import TIMEFRAME_DELTA, ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.exchanges.base import BaseExchangeClient, Kline
+from app.metrics import STREAM_CANDLES, STREAM_RECONNECTS
+from app.repositories.coverage import CoverageRepository
+from app.repositories.klines import KlinesRepository
+from app.services.mappers import EXCHANGE_CLIENTS
+from app.services.timeframes import current_candle_open
+
+
+logger = logging.getLogger(__name__)
+
+# Series caught up over REST at once after a (re)connect
+BACKFILL_CONCURRENCY = 5
+# Attempts at catching up after a (re)connect, with doubling delays
+CATCH_UP_ATTEMPTS = 5
+CATCH_UP_RETRY_DELAY = 5.0
+
+
+@dataclass(frozen=True)
+class LiveSeries:
+    exchange_symbol_id: int
+    symbol: str
+    timeframe: TimeframeEnum
+
+
+class CandleWriter:
+    """
+    Buffers closed candles and saves them with save_klines, one call per
+    series, every flush_interval seconds or once max_pending are buffered.
+
+    Candles of a failed flush are kept and retried with the next one, up to
+    max_attempts flushes in a row per series; then the series' candles are
+    dropped and logged (a deleted symbol fails forever), and left to the
+    next catch-up or scheduled sync.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = 2.0,
+        max_pending: int = 5000,
+        max_attempts: int = 5,
+    ):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self._pending: dict[tuple[int, TimeframeEnum], dict] = defaultdict(dict)
+        # Failed flushes in a row per series
+        self._failures: dict[tuple[int, TimeframeEnum], int] = {}
+        self._count = 0
+        self._full = asyncio.Event()
+
+    def add(self, exchange_symbol_id: int, timeframe: TimeframeEnum, kline: Kline):
+        self._buffer(exchange_symbol_id, timeframe, kline)
+        if self._count >= self.max_pending:
+            self._full.set()
+
+    def _buffer(self, exchange_symbol_id: int, timeframe: TimeframeEnum, kline: Kline):
+        series = self._pending[(exchange_symbol_id, timeframe)]
+        if kline.timestamp not in series:
+            self._count += 1
+        # Repeated updates of a candle keep the latest
+        series[kline.timestamp] = kline
+
+    async def run(self) -> None:
+        """Flush periodically until cancelled, then flush what is left."""
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except TimeoutError:
+                    pass
+                await self.flush()
+        finally:
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Save the buffered candles; returns how many were inserted."""
+        self._full.clear()
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, defaultdict(dict)
+        self._count = 0
+
+        inserted = 0
+        async with AsyncSessionLocal() as session:
+            for (exchange_symbol_id, timeframe), series in pending.items():
+                klines = [series[ts] for ts in sorted(series)]
+                key = (exchange_symbol_id, timeframe)
+                try:
+                    inserted += await KlinesRepository.save_klines(
+                        session, exchange_symbol_id, timeframe, klines
+                    )
+                except Exception as e:
+                    await session.rollback()
+                    failures = self._failures.get(key, 0) + 1
+                    if failures >= self.max_attempts:
+                        self._failures.pop(key, None)
+                        logger.error(
+                            "Saving %d candles of series %d %s (%s to %s) failed "
+                            "%d times, dropping them: %s",
+                            len(klines),
+                            exchange_symbol_id,
+                            timeframe.value,
+                            klines[0].timestamp,
+                            klines[-1].timestamp,
+                            failures,
+                            e,
+                        )
+                        continue
+                    self._failures[key] = failures
+                    logger.warning(
+                        "Saving %d candles of series %d %s failed, will retry: %s",
+                        len(klines),
+                        exchange_symbol_id,
+                        timeframe.value,
+                        e,
+                    )
+                    # Retried on the next interval, not right away
+                    for kline in klines:
+                        self._buffer(exchange_symbol_id, timeframe, kline)
+                else:
+                    self._failures.pop(key, None)
+        return inserted
+
+
+class LiveIngestionService:
+    """Streams the closed candles of one exchange and market type into a writer."""
+
+    def __init__(
+        self,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        timeframes: list[TimeframeEnum],
+        writer: CandleWriter,
+        client: BaseExchangeClient | None = None,
+        ws_url: str | None = None,
+    ):
+        """
+        Args:
+            client: REST client for catching up, default a new one.
+            ws_url: WebSocket endpoint, default the exchange's (override it
+                to run against a local stand-in server).
+        """
+        self.exchange = exchange
+        self.market_type = market_type
+        self.timeframes = timeframes
+        self.writer = writer
+        self.client = client or EXCHANGE_CLIENTS[exchange]()
+        self.ws_url = ws_url or self.client.WS_URLS[market_type]
+        self._backfill_semaphore = asyncio.Semaphore(BACKFILL_CONCURRENCY)
+
+    async def load_series(self) -> dict[str, LiveSeries]:
+        """Active series by stream name."""
+        async with AsyncSessionLocal() as session:
+            symbols = await KlinesRepository.resolve_exchange_symbols(
+                session, self.exchange, self.market_type
+            )
+        return {
+            self.client.stream_name(symbol, timeframe): LiveSeries(
+                es_id, symbol, timeframe
+            )
+            for es_id, symbol in symbols
+            for timeframe in self.timeframes
+        }
+
+    async def run(self) -> None:
+        """Stream until cancelled, one connection per WS_MAX_STREAMS streams."""
+        series = await self.load_series()
+        if not series:
+            logger.warning(
+                "No active %s %s symbols to stream",
+                self.exchange.value,
+                self.market_type.value,
+            )
+            return
+
+        names = list(series)
+        size = self.client.WS_MAX_STREAMS
+        chunks = [
+            {name: series[name] for name in names[i : i + size]}
+            for i in range(0, len(names), size)
+        ]
+        logger.info(
+            "Streaming %d %s %s series over %d connections",
+            len(series),
+            self.exchange.value,
+            self.market_type.value,
+            len(chunks),
+        )
+        await asyncio.gather(*(self._run_connection(chunk) for chunk in chunks))
+
+    async def _run_connection(self, streams: dict[str, LiveSeries]) -> None:
+        labels = (self.exchange.value, self.market_type.value)
+        connected_before = False
+        # Iterating connect() reconnects with exponential backoff
+        async for ws in connect(self.ws_url, open_timeout=30, max_queue=1024):
+            if connected_before:
+                STREAM_RECONNECTS.labels(*labels).inc()
+            connected_before = True
+
+            tasks = []
+            try:
+                for message in self.client.subscribe_messages(list(streams)):
+                    await ws.send(message)
+                # Subscribed first, so the REST catch-up leaves no hole
+                tasks.append(asyncio.create_task(self._catch_up(streams.values())))
+                if self.client.WS_PING_INTERVAL:
+                    tasks.append(asyncio.create_task(self._ping(ws)))
+
+                async for message in ws:
+                    try:
+                        updates = self.client.parse_stream_message(message)
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.warning("Unexpected %s message: %s", labels[0], e)
+                        continue
+                    for update in updates:
+                        live = streams.get(update.stream)
+                        if live is None or not update.closed:
+                            continue
+                        STREAM_CANDLES.labels(*labels).inc()
+                        self.writer.add(
+                            live.exchange_symbol_id, live.timeframe, update.kline
+                        )
+            except ConnectionClosed:
+                pass
+            finally:
+                for task in tasks:
+                    task.cancel()
+            # Closed with an error or cleanly by the server (Binance does daily)
+            logger.warning(
+                "%s %s stream closed (code %s), reconnecting", *labels, ws.close_code
+            )
+
+    async def _ping(self, ws: ClientConnection) -> None:
+        while True:
+            await asyncio.sleep(self.client.WS_PING_INTERVAL)
+            await ws.send(self.client.ping_message())
+
+    async def _catch_up(self, streams) -> None:
+        """
+        Fetch over REST the closed candles newer than each series' last
+        stored, and those stored while still forming.
+
+        Runs unawaited beside its connection, so failures are logged here:
+        the series that failed (all of them if reading coverage did) are
+        retried with backoff, up to CATCH_UP_ATTEMPTS times.
+        """
+        streams = list(streams)
+        delay = CATCH_UP_RETRY_DELAY
+        for attempt in range(1, CATCH_UP_ATTEMPTS + 1):
+            try:
+                streams = await self._catch_up_once(streams)
+            except Exception as e:
+                logger.warning(
+                    "%s %s: catching up failed: %s",
+                    self.exchange.value,
+                    self.market_type.value,
+                    e,
+                )
+            if not streams:
+                return
+            if attempt < CATCH_UP_ATTEMPTS:
+                await asyncio.sleep(delay)
+                delay *= 2
+        logger.error(
+            "%s %s: gave up catching up %d series until the next reconnect",
+            self.exchange.value,
+            self.market_type.value,
+            len(streams),
+        )
+
+    async def _catch_up_once(self, streams: list[LiveSeries]) -> list[LiveSeries]:
+        """One catch-up of the streams; returns the series that failed."""
+        async with AsyncSessionLocal() as session:
+            coverage = await CoverageRepository.get_coverage(
+                session, self.exchange, self.market_type
+            )
+            unclosed = await KlinesRepository.get_unclosed_starts(
+                session, list({live.exchange_symbol_id for live in streams})
+            )
+        last_ts = {
+            (row["exchange_symbol_id"], row["timeframe"]): row["last_ts"]
+            for row in coverage
+        }
+
+        async def catch_up_series(live: LiveSeries) -> None:
+            # Series without history are left to the backfill scripts
+            series = (live.exchange_symbol_id, live.timeframe.value)
+            if series not in last_ts:
+                return
+            start_time = last_ts[series] + TIMEFRAME_DELTA[live.timeframe]
+            # Candles stored while still forming are fetched again
+            if series in unclosed:
+                start_time = min(start_time, unclosed[series])
+            forming_open = current_candle_open(live.timeframe)
+            if start_time >= forming_open:
+                return
+            async with self._backfill_semaphore:
+                async for batch in self.client.get_klines(
+                    symbol=live.symbol,
+                    timeframe=live.timeframe,
+                    start_time=start_time,
+                    # Closed candles only (the end time is inclusive)
+                    end_time=forming_open - timedelta(milliseconds=1),
+                    market_type=self.market_type,
+                ):
+                    for kline in batch:
+                        self.writer.add(live.exchange_symbol_id, live.timeframe, kline)
+
+        results = await asyncio.gather(
+            *(catch_up_series(live) for live in streams), return_exceptions=True
+        )
+        failed = [
+            (live, r) for live, r in zip(streams, results) if isinstance(r, Exception)
+        ]
+        if failed:
+            logger.warning(
+                "%s %s: catching up %d series failed, first error: %s",
+                self.exchange.value,
+                self.market_type.value,
+                len(failed),
+                failed[0][1],
+            )
+        return [live for live, _ in failed]
@@ -0,0 +1,224 @@
+from collections.abc import AsyncGenerator
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+from app.enums import TIMEFRAME_DELTA, CandleFieldEnum, KlinesFormatEnum
+from app.repositories.coverage import CoverageRepository
+from app.repositories.klines import KlinesRepository
+from app.schemas.klines import PanelRequest
+from app.services.formatters import MEDIA_TYPES, encode_tables, negotiate_format
+from app.services.timeframes import current_candle_open, floor_timestamp
+from app.storage.cold import ColdStore
+from app.storage.columnar import columnar_store
+
+
+# Upper bound of matrix cells (timestamps x columns) built per chunk
+PANEL_CHUNK_CELLS = 2_000_000
+
+
+def panel_schema(symbols: list[str], fields: list[CandleFieldEnum]) -> pa.Schema:
+    """timestamp, then one float column per symbol (per symbol and field if several)."""
+    columns = [pa.field("timestamp", pa.timestamp("ms"))]
+    for symbol in symbols:
+        for field in fields:
+            name = symbol if len(fields) == 1 else f"{symbol}_{field.value}"
+            columns.append(pa.field(name, pa.float64()))
+    return pa.schema(columns)
+
+
+def pivot_panel(
+    grid_start: datetime,
+    n_rows: int,
+    step_ms: int,
+    series_ids: np.ndarray,
+    series_id: np.ndarray,
+    timestamps: np.ndarray,
+    values: list[np.ndarray],
+    table_schema: pa.Schema,
+) -> pa.Table:
+    """
+    Scatter long-format candles into a dense timestamp x series matrix.
+
+    Args:
+        grid_start: First timestamp of the grid
+        n_rows: Number of grid timestamps
+        step_ms: Grid step in milliseconds
+        series_ids: exchange_symbol_ids in column order
+        series_id: exchange_symbol_id of every candle
+        timestamps: datetime64[ms] open time of every candle
+        values: One array per field with the value of every candle
+
+    Missing candles become explicit nulls.
+    """
+    n_series = len(series_ids)
+    offsets = (timestamps - np.datetime64(grid_start, "ms")).astype(np.int64)
+    on_grid = (offsets >= 0) & (offsets % step_ms == 0) & (offsets < n_rows * step_ms)
+    rows = offsets[on_grid] // step_ms
+    sorter = np.argsort(series_ids)
+    cols = sorter[np.searchsorted(series_ids, series_id[on_grid], sorter=sorter)]
+
+    filled = np.zeros((n_rows, n_series), dtype=bool)
+    filled[rows, cols] = True
+    matrices = []
+    for field_values in values:
+        matrix = np.full((n_rows, n_series), np.nan)
+        matrix[rows, cols] = field_values[on_grid]
+        matrices.append(matrix)
+
+    grid = np.datetime64(grid_start, "ms") + np.arange(n_rows) * np.timedelta64(
+        step_ms, "ms"
+    )
+    arrays = [pa.array(grid, type=pa.timestamp("ms"))]
+    for col in range(n_series):
+        missing = ~filled[:, col]
+        for matrix in matrices:
+            arrays.append(pa.array(matrix[:, col], mask=missing))
+    return pa.Table.from_arrays(arrays, schema=table_schema)
+
+
+class PanelService:
+
+    @staticmethod
+    async def get_panel(
+        session: AsyncSession,
+        panel_request: PanelRequest,
+        accept: str | None = None,
+    ) -> StreamingResponse:
+        """
+        Stream an aligned timestamp x symbol matrix in a columnar format.
+
+        The range is processed in time chunks of at most PANEL_CHUNK_CELLS
+        cells, each read with one query for all symbols and pivoted with
+        NumPy, so memory stays bounded for any range and universe size.
+        """
+        fmt = negotiate_format(panel_request.format, accept)
+        if fmt == KlinesFormatEnum.JSON:
+            fmt = KlinesFormatEnum.ARROW
+
+        series = await KlinesRepository.resolve_exchange_symbols(
+            session=session,
+            exchange=panel_request.exchange,
+            market_type=panel_request.market_type,
+            symbol_names=panel_request.symbols or None,
+        )
+        if not series:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No symbols found for "
+                f"{panel_request.exchange}/{panel_request.market_type}",
+            )
+
+        table_schema = panel_schema([name for _, name in series], panel_request.fields)
+        chunks = PanelService._iter_chunks(panel_request, series, table_schema)
+        return StreamingResponse(
+            encode_tables(chunks, table_schema, fmt),
+            media_type=MEDIA_TYPES[fmt],
+        )
+
+    @staticmethod
+    async def _iter_chunks(
+        panel_request: PanelRequest,
+        series: list[tuple[int, str]],
+        table_schema: pa.Schema,
+    ) -> AsyncGenerator[pa.Table, None]:
+        timeframe = panel_request.timeframe
+        fields = panel_request.fields
+        step = TIMEFRAME_DELTA[timeframe]
+        step_ms = int(step.total_seconds() * 1000)
+
+        series_ids = np.array([es_id for es_id, _ in series], dtype=np.int64)
+        names_by_id = dict(series)
+
+        grid_start = floor_timestamp(panel_request.start_time, timeframe)
+        if grid_start < panel_request.start_time:
+            grid_start += step
+        end_time = panel_request.end_time or current_candle_open(timeframe)
+        rows_per_chunk = max(1, PANEL_CHUNK_CELLS // (len(series) * len(fields)))
+        cold_store = ColdStore()
+
+        async with AsyncSessionLocal() as session:
+            cold_until = await CoverageRepository.get_cold_until_many(
+                session, list(names_by_id), timeframe
+            )
+
+            chunk_start = grid_start
+            while chunk_start < end_time:
+                chunk_end = min(chunk_start + step * rows_per_chunk, end_time)
+                n_rows = -(-(chunk_end - chunk_start) // step)
+
+                ids_parts, ts_parts = [], []
+                value_parts = [[] for _ in fields]
+
+                def add_table(es_id: int, table: pa.Table) -> None:
+                    ids_parts.append(np.full(table.num_rows, es_id, dtype=np.int64))
+                    ts_parts.append(table["timestamp"].to_numpy())
+                    for part, field in zip(value_parts, fields):
+                        part.append(table[field.value].to_numpy())
+
+                # Series in the columnar store are read from it, the rest
+                # from the hot table and cold tier
+                db_ids = list(names_by_id)
+                if columnar_store is not None:
+                    db_ids = []
+                    for es_id in names_by_id:
+                        table = columnar_store.read_range(
+                            es_id, timeframe, chunk_start, chunk_end
+                        )
+                        if table is None:
+                            db_ids.append(es_id)
+                        elif table.num_rows:
+                            add_table(es_id, table)
+
+                rows = []
+                if db_ids:
+                    rows = await KlinesRepository.get_panel_rows(
+                        session, db_ids, timeframe, fields, chunk_start, chunk_end
+                    )
+                if rows:
+                    columns = list(zip(*rows))
+                    ids_parts.append(np.array(columns[0], dtype=np.int64))
+                    ts_parts.append(np.array(columns[1], dtype="datetime64[ms]"))
+                    for part, column in zip(value_parts, columns[2:]):
+                        part.append(np.array(column, dtype=np.float64))
+
+                for es_id, boundary in cold_until.items():
+                    if boundary <= chunk_start or es_id not in db_ids:
+                        continue
+                    cold = cold_store.read_range(
+                        panel_request.exchange,
+                        panel_request.market_type,
+                        names_by_id[es_id],
+                        timeframe,
+                        chunk_start,
+                        min(chunk_end, boundary),
+                    )
+                    if cold.num_rows:
+                        add_table(es_id, cold)
+
+                if ids_parts:
+                    series_id = np.concatenate(ids_parts)
+                    timestamps = np.concatenate(ts_parts).astype("datetime64[ms]")
+                    values = [np.concatenate(part) for part in value_parts]
+                else:
+                    series_id = np.empty(0, dtype=np.int64)
+                    timestamps = np.empty(0, dtype="datetime64[ms]")
+                    values = [np.empty(0) for _ in fields]
+
+                yield pivot_panel(
+                    chunk_start,
+                    n_rows,
+                    step_ms,
+                    series_ids,
+                    series_id,
+                    timestamps,
+                    values,
+                    table_schema,
+                )
+
+                chunk_start = chunk_end
@@ -0,0 +1,369 @@
+import logging
+from datetime import datetime, timedelta
+
+import numpy as np
+import pyarrow as pa
+from fastapi import HTTPException, status
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.enums import (
+    TIMEFRAME_DELTA,
+    AnomalyRuleEnum,
+    CandleFieldEnum,
+    ExchangeEnum,
+    MarketTypeEnum,
+    TimeframeEnum,
+)
+from app.repositories.klines import KlinesRepository
+from app.repositories.quality import QualityRepository
+from app.schemas.klines import AnomaliesRequest, AnomaliesResponse
+from app.services.tiering import TieringService
+from app.storage.cold import ColdStore
+
+
+logger = logging.getLogger(__name__)
+
+# Shortest run of zero-volume candles that is flagged
+ZERO_VOLUME_MIN_RUN = 3
+# A spike is a move into and back out of a candle, each this many times the
+# median absolute return of the preceding SPIKE_WINDOW candles
+SPIKE_WINDOW = 48
+SPIKE_MULTIPLE = 15.0
+# Floor for that median, so flat series do not flag every tick
+SPIKE_MIN_SCALE = 1e-4
+# Largest accepted |log(close / other exchange close)|
+CROSS_EXCHANGE_MAX_DEVIATION = 0.05
+# Candles per rule evaluation; context candles are carried between chunks
+QUALITY_CHUNK_ROWS = 50_000
+QUALITY_CONTEXT_ROWS = SPIKE_WINDOW + 2
+
+
+Anomalies = dict[AnomalyRuleEnum, tuple[np.ndarray, np.ndarray]]
+
+
+def _zero_volume_runs(volume: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Indices of candles in zero-volume runs of ZERO_VOLUME_MIN_RUN or more."""
+    zero = np.concatenate([[0], (volume == 0).astype(np.int8), [0]])
+    edges = np.diff(zero)
+    starts = np.flatnonzero(edges == 1)
+    lengths = np.flatnonzero(edges == -1) - starts
+    long_runs = lengths >= ZERO_VOLUME_MIN_RUN
+    starts, lengths = starts[long_runs], lengths[long_runs]
+    if not len(starts):
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    # Position of every run candle: run start + offset within the run
+    offsets = np.arange(lengths.sum()) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+    indices = np.repeat(starts, lengths) + offsets
+    return indices, np.repeat(lengths, lengths).astype(np.float64)
+
+
+def _price_spikes(close: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Candles whose close jumps away from and back to its neighbours."""
+    n = len(close)
+    if n < SPIKE_WINDOW + 3:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.diff(np.log(np.where(close > 0, close, np.nan)))
+    # scale[j] is the median |return| of returns[j : j + SPIKE_WINDOW]
+    scale = np.median(sliding_window_view(np.abs(returns), SPIKE_WINDOW), axis=1)
+    scale = np.maximum(scale, SPIKE_MIN_SCALE)
+
+    # Candle t (SPIKE_WINDOW + 1 <= t <= n - 2): move in is returns[t - 1],
+    # move out is returns[t], scale from the window just before the move in
+    t = np.arange(SPIKE_WINDOW + 1, n - 1)
+    move_in, move_out = returns[t - 1], returns[t]
+    ref = scale[t - 1 - SPIKE_WINDOW]
+    with np.errstate(invalid="ignore"):
+        spike = (
+            (np.abs(move_in) > SPIKE_MULTIPLE * ref)
+            & (np.abs(move_out) > SPIKE_MULTIPLE * ref)
+            & (np.sign(move_in) != np.sign(move_out))
+        )
+    return t[spike], (move_in / ref)[spike]
+
+
+def find_anomalies(table: pa.Table) -> Anomalies:
+    """
+    Run the per-series rules over a candle table.
+
+    Returns:
+        (row indices, values) per rule; values are NaN where a rule has no
+        measurement
+    """
+    open_ = table["open"].to_numpy()
+    high = table["high"].to_numpy()
+    low = table["low"].to_numpy()
+    close = table["close"].to_numpy()
+    volume = table["volume"].to_numpy()
+
+    inconsistent = np.flatnonzero(
+        (high < np.maximum(open_, close))
+        | (low > np.minimum(open_, close))
+        | (high < low)
+    )
+    nonpositive = np.flatnonzero((open_ <= 0) | (high <= 0) | (low <= 0) | (close <= 0))
+    negative_volume = np.flatnonzero(volume < 0)
+
+    return {
+        AnomalyRuleEnum.OHLC_INCONSISTENT: (
+            inconsistent,
+            np.full(len(inconsistent), np.nan),
+        ),
+        AnomalyRuleEnum.NONPOSITIVE_PRICE: (
+            nonpositive,
+            np.minimum.reduce([open_, high, low, close])[nonpositive],
+        ),
+        AnomalyRuleEnum.NEGATIVE_VOLUME: (negative_volume, volume[negative_volume]),
+        AnomalyRuleEnum.ZERO_VOLUME_RUN: _zero_volume_runs(volume),
+        AnomalyRuleEnum.PRICE_SPIKE: _price_spikes(close),
+    }
+
+
+def cross_exchange_outliers(
+    close: np.ndarray, other_close: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Aligned candles whose close deviates from the other exchange's."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        deviation = np.abs(np.log(close / other_close))
+        flagged = np.flatnonzero(deviation > CROSS_EXCHANGE_MAX_DEVIATION)
+    return flagged, deviation[flagged]
+
+
+def plan_ranges(
+    coverage: dict, checkpoint: tuple[datetime, datetime, int] | None
+) -> list[tuple[datetime | None, datetime | None]] | None:
+    """
+    Ranges of candles added since the last check: history before the
+    checked range and candles after it. None means check everything.
+    """
+    if checkpoint is None:
+        return None
+    checked_from, checked_until, _ = checkpoint
+    ranges = []
+    if coverage["first_ts"] < checked_from:
+        ranges.append((None, checked_from))
+    if coverage["last_ts"] > checked_until:
+        ranges.append((checked_until + timedelta(microseconds=1), None))
+    return ranges
+
+
+class QualityService:
+
+    @staticmethod
+    async def check_series(
+        session: AsyncSession,
+        cold_store: ColdStore,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol: str,
+        timeframe: TimeframeEnum,
+        coverage: dict,
+        checkpoint: tuple[datetime, datetime, int] | None,
+        other_exchange_symbol_id: int | None = None,
+    ) -> int:
+        """
+        Check the candles of a series added since its checkpoint and store
+        what the rules flag.
+
+        If the candle count grew by more than the candles found before and
+        after the checked range (history filled inside it), the whole series
+        is checked again. Anomalies and the new checkpoint are committed
+        together.
+
+        Returns:
+            Number of anomalies flagged
+        """
+        if checkpoint is not None and checkpoint == (
+            coverage["first_ts"],
+            coverage["last_ts"],
+            coverage["candle_count"],
+        ):
+            return 0
+
+        ranges = plan_ranges(coverage, checkpoint)
+        anomalies, checked = [], 0
+        if ranges is not None:
+            for start_time, end_time in ranges:
+                found, n = await QualityService._check_range(
+                    session,
+                    cold_store,
+                    exchange,
+                    market_type,
+                    symbol,
+                    coverage["exchange_symbol_id"],
+                    timeframe,
+                    start_time,
+                    end_time,
+                    other_exchange_symbol_id,
+                )
+                anomalies += found
+                checked += n
+
+        if ranges is None or checked != coverage["candle_count"] - checkpoint[2]:
+            anomalies, _ = await QualityService._check_range(
+                session,
+                cold_store,
+                exchange,
+                market_type,
+                symbol,
+                coverage["exchange_symbol_id"],
+                timeframe,
+                None,
+                None,
+                other_exchange_symbol_id,
+            )
+
+        await QualityRepository.save_anomalies(
+            session, coverage["exchange_symbol_id"], timeframe, anomalies
+        )
+        await QualityRepository.save_checkpoint(
+            session,
+            coverage["exchange_symbol_id"],
+            timeframe,
+            coverage["first_ts"],
+            coverage["last_ts"],
+            coverage["candle_count"],
+        )
+        await session.commit()
+        return len(anomalies)
+
+    @staticmethod
+    async def _check_range(
+        session: AsyncSession,
+        cold_store: ColdStore,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol: str,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        start_time: datetime | None,
+        end_time: datetime | None,
+        other_exchange_symbol_id: int | None,
+    ) -> tuple[list[tuple[datetime, AnomalyRuleEnum, float | None]], int]:
+        """
+        Stream [start_time, end_time) plus context candles on both sides and
+        run the rules chunk by chunk.
+
+        Returns:
+            (flagged candles inside the range, candles inside the range)
+        """
+        context = TIMEFRAME_DELTA[timeframe] * QUALITY_CONTEXT_ROWS
+        read_start = start_time - context if start_time else None
+        read_end = end_time + context if end_time else None
+        lo = np.datetime64(start_time or datetime.min, "ms")
+        hi = np.datetime64(end_time or datetime.max, "ms")
+
+        anomalies: dict[tuple, float | None] = {}
+        checked = 0
+        carry = None
+        async for chunk in TieringService.stream_range(
+            session=session,
+            cold_store=cold_store,
+            exchange=exchange,
+            market_type=market_type,
+            symbol=symbol,
+            exchange_symbol_id=exchange_symbol_id,
+            timeframe=timeframe,
+            start_time=read_start,
+            end_time=read_end,
+            chunk_size=QUALITY_CHUNK_ROWS,
+        ):
+            timestamps = chunk["timestamp"].to_numpy()
+            checked += int(np.count_nonzero((timestamps >= lo) & (timestamps < hi)))
+
+            window = pa.concat_tables([carry, chunk]) if carry is not None else chunk
+            timestamps = window["timestamp"].to_numpy()
+            inside = (timestamps >= lo) & (timestamps < hi)
+
+            found = find_anomalies(window)
+            if other_exchange_symbol_id is not None:
+                found[AnomalyRuleEnum.CROSS_EXCHANGE] = (
+                    await QualityService._cross_exchange(
+                        session,
+                        exchange_symbol_id,
+                        other_exchange_symbol_id,
+                        timeframe,
+                        timestamps,
+                    )
+                )
+
+            for rule, (indices, values) in found.items():
+                for i, value in zip(indices[inside[indices]], values[inside[indices]]):
+                    key = (timestamps[i].astype(datetime), rule)
+                    value = None if np.isnan(value) else float(value)
+                    previous = anomalies.get(key)
+                    if previous is None or (value is not None and value > previous):
+                        anomalies[key] = value
+
+            carry = window.slice(max(0, window.num_rows - QUALITY_CONTEXT_ROWS))
+
+        return [(ts, rule, value) for (ts, rule), value in anomalies.items()], checked
+
+    @staticmethod
+    async def _cross_exchange(
+        session: AsyncSession,
+        exchange_symbol_id: int,
+        other_exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        timestamps: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Compare closes with the other exchange over the chunk, mapped back to
+        chunk row indices. Only hot candles are joined; cold ones were
+        checked while they were hot.
+        """
+        if not len(timestamps):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        rows = await KlinesRepository.get_aligned_rows(
+            session,
+            [[exchange_symbol_id, other_exchange_symbol_id]],
+            [timestamps[0].astype(datetime)],
+            timeframe,
+            CandleFieldEnum.CLOSE,
+            timestamps[-1].astype(datetime) + timedelta(microseconds=1),
+        )
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        _, aligned_ts, close, other_close = (np.array(col) for col in zip(*rows))
+        flagged, deviation = cross_exchange_outliers(
+            close.astype(np.float64), other_close.astype(np.float64)
+        )
+        indices = np.searchsorted(
+            timestamps, aligned_ts[flagged].astype("datetime64[ms]")
+        )
+        return indices, deviation
+
+    @staticmethod
+    async def get_anomalies(
+        session: AsyncSession,
+        anomalies_request: AnomaliesRequest,
+    ) -> AnomaliesResponse:
+        try:
+            anomalies = await QualityRepository.get_anomalies(
+                session=session,
+                exchange=anomalies_request.exchange,
+                market_type=anomalies_request.market_type,
+                symbol_name=anomalies_request.symbol,
+                timeframe=anomalies_request.timeframe,
+                rule=anomalies_request.rule,
+                start_time=anomalies_request.start_time,
+                end_time=anomalies_request.end_time,
+                limit=anomalies_request.limit,
+            )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to fetch anomalies: {e}",
+            )
+
+        return AnomaliesResponse(
+            exchange=anomalies_request.exchange,
+            market_type=anomalies_request.market_type,
+            anomalies=anomalies,
+            count=len(anomalies),
+        )
@@ -0,0 +1,310 @@
+"""In-memory ring buffers of the newest candles of each series.
+
+recent_candles keeps the last RECENT_CACHE_CANDLES candles of every series it
+has loaded in fixed-size column arrays, within RECENT_CACHE_MAX_BYTES (the
+least recently read series are evicted). The API warms it with all active
+series at startup, and it follows writes from any process through the
+candles-written notifications: inserts after a ring's newest candle are
+appended on its next read, writes inside its window make it reload.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+from app.enums import TIMEFRAME_DELTA, ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.repositories.coverage import CoverageRepository
+from app.repositories.klines import KlinesRepository
+from app.services.cache import on_candles_written, on_invalidations_missed
+from app.services.tiering import rows_to_table
+from app.storage.cold import CANDLE_SCHEMA, ColdStore
+
+
+logger = logging.getLogger(__name__)
+
+VALUE_FIELDS = CANDLE_SCHEMA.names[1:]
+
+
+@dataclass(frozen=True)
+class SeriesRef:
+    exchange: ExchangeEnum
+    market_type: MarketTypeEnum
+    symbol: str
+    exchange_symbol_id: int
+    timeframe: TimeframeEnum
+
+    @property
+    def series(self) -> tuple[int, str]:
+        return self.exchange_symbol_id, self.timeframe.value
+
+
+class CandleRing:
+    """
+    The newest `capacity` candles of a series, oldest first, in preallocated
+    timestamp and value arrays written round-robin.
+
+    complete means the ring holds the series' whole history.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamps = np.empty(capacity, dtype="datetime64[ms]")
+        self.values = np.empty((len(VALUE_FIELDS), capacity), dtype=np.float64)
+        self.start = 0  # physical index of the oldest candle
+        self.count = 0
+        self.complete = False
+
+    @property
+    def nbytes(self) -> int:
+        return self.timestamps.nbytes + self.values.nbytes
+
+    @property
+    def first_ts(self) -> datetime | None:
+        return self._ts_at(0) if self.count else None
+
+    @property
+    def last_ts(self) -> datetime | None:
+        return self._ts_at(self.count - 1) if self.count else None
+
+    def _ts_at(self, position: int) -> datetime:
+        return self.timestamps[(self.start + position) % self.capacity].item()
+
+    def append(self, table: pa.Table) -> None:
+        """Add candles newer than last_ts, oldest first, dropping the oldest."""
+        n = table.num_rows
+        if n == 0:
+            return
+        if n >= self.capacity:
+            table = table.slice(n - self.capacity)
+            n = self.capacity
+        positions = (self.start + self.count + np.arange(n)) % self.capacity
+        self.timestamps[positions] = table["timestamp"].to_numpy()
+        for i, name in enumerate(VALUE_FIELDS):
+            self.values[i, positions] = table[name].to_numpy()
+        overflow = max(0, self.count + n - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.count = min(self.capacity, self.count + n)
+        if overflow:
+            self.complete = False
+
+    def slice(self, lo: int, hi: int) -> pa.Table:
+        """Candles at positions [lo, hi) counted from the oldest, as a table."""
+        positions = (self.start + np.arange(lo, hi)) % self.capacity
+        return pa.Table.from_arrays(
+            [
+                pa.array(self.timestamps[positions], type=CANDLE_SCHEMA.field(0).type),
+                *(
+                    pa.array(self.values[i, positions])
+                    for i in range(len(VALUE_FIELDS))
+                ),
+            ],
+            schema=CANDLE_SCHEMA,
+        )
+
+    def tail(self, n: int) -> pa.Table:
+        return self.slice(max(0, self.count - n), self.count)
+
+    def covers(self, start_time: datetime | None) -> bool:
+        """Whether every stored candle from start_time on is in the ring."""
+        if self.complete:
+            return True
+        return start_time is not None and self.count > 0 and start_time >= self.first_ts
+
+    def window(
+        self,
+        start_time: datetime | None,
+        end_time: datetime | None,
+        limit: int | None = None,
+    ) -> pa.Table:
+        """Candles in [start_time, end_time), oldest first; check covers() first."""
+        ordered = np.roll(self.timestamps, -self.start)[: self.count]
+        # Compared at microsecond precision, as cursors are advanced by 1us
+        lo = 0
+        if start_time is not None:
+            lo = int(np.searchsorted(ordered, np.datetime64(start_time, "us")))
+        hi = self.count
+        if end_time is not None:
+            hi = int(np.searchsorted(ordered, np.datetime64(end_time, "us")))
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return self.slice(lo, max(lo, hi))
+
+
+class RecentCandlesCache:
+    """Byte-bounded LRU of CandleRings keyed by (exchange_symbol_id, timeframe)."""
+
+    def __init__(self, capacity: int, max_bytes: int):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self._rings: OrderedDict[tuple, CandleRing] = OrderedDict()
+        self._bytes = 0
+        # Rings with inserts after their newest candle, appended on next read
+        self._stale: set[tuple] = set()
+        # Bumped by every write, so a load racing a write is not kept
+        self._generations: dict[tuple, int] = {}
+        # Bumped by clear(), so no load racing it is kept either
+        self._epoch = 0
+        self._ids: dict[tuple[ExchangeEnum, MarketTypeEnum, str], int] = {}
+
+    @property
+    def ring_bytes(self) -> int:
+        # datetime64[ms] timestamps and float64 values
+        return 8 * (len(VALUE_FIELDS) + 1) * self.capacity
+
+    def exchange_symbol_id(
+        self, exchange: ExchangeEnum, market_type: MarketTypeEnum, symbol: str
+    ) -> int | None:
+        """The id of a symbol seen by the cache, saving a lookup query."""
+        return self._ids.get((exchange, market_type, symbol))
+
+    def invalidate(self, series: tuple, first_ts: datetime, last_ts: datetime) -> None:
+        self._generations[series] = self._generations.get(series, 0) + 1
+        ring = self._rings.get(series)
+        if ring is None:
+            return
+        if ring.count and first_ts > ring.last_ts:
+            self._stale.add(series)
+        else:
+            self._discard(series)
+
+    def clear(self) -> None:
+        self._epoch += 1
+        for series in list(self._rings):
+            self._discard(series)
+
+    async def get(self, session, ref: SeriesRef) -> CandleRing:
+        """The series' ring, loaded or brought up to date as needed."""
+        ring = await self.peek(session, ref)
+        if ring is None:
+            ring = await self._load(session, ref)
+        return ring
+
+    async def peek(self, session, ref: SeriesRef) -> CandleRing | None:
+        """The series' ring if cached, brought up to date, else None."""
+        series = ref.series
+        ring = self._rings.get(series)
+        if ring is None:
+            return None
+        self._rings.move_to_end(series)
+        if series in self._stale:
+            self._stale.discard(series)
+            rows = await KlinesRepository.get_recent_klines(
+                session,
+                ref.exchange_symbol_id,
+                ref.timeframe,
+                self.capacity,
+                after=ring.last_ts,
+            )
+            ring.append(rows_to_table(rows))
+        return ring
+
+    async def read_tail(self, session, ref: SeriesRef, n: int) -> pa.Table:
+        """
+        The newest n candles from the database, oldest first, topped up from
+        the cold tier when the hot table has fewer.
+        """
+        rows = await KlinesRepository.get_recent_klines(
+            session, ref.exchange_symbol_id, ref.timeframe, n
+        )
+        hot = rows_to_table(rows)
+        missing = n - hot.num_rows
+        if missing <= 0:
+            return hot
+        cold_until = await CoverageRepository.get_cold_until(
+            session, ref.exchange_symbol_id, ref.timeframe
+        )
+        if cold_until is None:
+            return hot
+        end_time = hot["timestamp"][0].as_py() if hot.num_rows else cold_until
+        # Enough for a gapless series; months with gaps yield fewer candles
+        start_time = end_time - missing * TIMEFRAME_DELTA[ref.timeframe]
+        cold = ColdStore().read_range(
+            ref.exchange,
+            ref.market_type,
+            ref.symbol,
+            ref.timeframe,
+            start_time,
+            end_time,
+        )
+        cold = cold.slice(max(0, cold.num_rows - missing))
+        return pa.concat_tables([cold, hot])
+
+    async def _load(self, session, ref: SeriesRef) -> CandleRing:
+        series = ref.series
+        generation = (self._epoch, self._generations.get(series, 0))
+        table = await self.read_tail(session, ref, self.capacity)
+        ring = CandleRing(self.capacity)
+        ring.append(table)
+        if table.num_rows < self.capacity:
+            # Fewer candles than fit and no cold tier: the whole history
+            cold_until = await CoverageRepository.get_cold_until(
+                session, ref.exchange_symbol_id, ref.timeframe
+            )
+            ring.complete = cold_until is None
+
+        self._ids[(ref.exchange, ref.market_type, ref.symbol)] = ref.exchange_symbol_id
+        # Served once but not kept if a write landed while loading
+        if (self._epoch, self._generations.get(series, 0)) == generation:
+            self._put(series, ring)
+        return ring
+
+    def _put(self, series: tuple, ring: CandleRing) -> None:
+        self._discard(series)
+        if ring.nbytes > self.max_bytes:
+            return
+        self._rings[series] = ring
+        self._bytes += ring.nbytes
+        while self._bytes > self.max_bytes:
+            evicted, _ = next(iter(self._rings.items()))
+            self._discard(evicted)
+
+    def _discard(self, series: tuple) -> None:
+        ring = self._rings.pop(series, None)
+        if ring is not None:
+            self._bytes -= ring.nbytes
+        self._stale.discard(series)
+
+    async def warm(self) -> None:
+        """Load the rings of active series until the memory bound is reached."""
+        started = time.perf_counter()
+        loaded = 0
+        refs = []
+        try:
+            async with AsyncSessionLocal() as session:
+                refs = [
+                    SeriesRef(**row)
+                    for row in await CoverageRepository.get_active_series(session)
+                ]
+                for ref in refs:
+                    if self._bytes + self.ring_bytes > self.max_bytes:
+                        break
+                    if ref.series not in self._rings:
+                        await self._load(session, ref)
+                        loaded += 1
+                    # Let requests through between series
+                    await asyncio.sleep(0)
+        except Exception as e:
+            logger.warning("Warming recent candle rings failed: %s", e)
+        logger.info(
+            "Warmed %d of %d recent candle rings (%.1f MB) in %.1fs",
+            loaded,
+            len(refs),
+            self._bytes / 1024 / 1024,
+            time.perf_counter() - started,
+        )
+
+
+recent_candles = RecentCandlesCache(
+    capacity=settings.RECENT_CACHE_CANDLES,
+    max_bytes=settings.RECENT_CACHE_MAX_BYTES,
+)
+on_candles_written(recent_candles.invalidate)
+on_invalidations_missed(recent_candles.clear)
@@ -0,0 +1,392 @@
+"""Scheduled incremental collection of every active series.
+
+CollectionScheduler wakes settle_delay seconds after each candle close of
+its timeframes and queues an incremental sync (the closed candles after the
+last stored one, or from the oldest stored while still forming) for every
+active symbol. Each exchange has a queue and a
+few workers sharing its client's rate limit. A round's syncs are started
+over `spread` seconds in priority order: configured symbol priorities
+first, then recent traded volume. Syncs that are overdue, when the rate
+budget falls behind, run highest priority first. A series is queued at most
+once; a close arriving while it waits is coalesced into the queued sync.
+
+Freshness, the time the oldest missing closed candle of a series has been
+closed, is reported against freshness_target every report_interval seconds.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from app.config import settings
+from app.db.session import AsyncSessionLocal
+from app.enums import TIMEFRAME_DELTA, ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.exchanges.base import BaseExchangeClient
+from app.metrics import (
+    FRESHNESS_LAG_SECONDS,
+    SERIES_OVER_FRESHNESS_TARGET,
+    SYNC_CLOSE_DELAY_SECONDS,
+    SYNC_JOBS,
+    SYNC_QUEUE_JOBS,
+)
+from app.repositories.coverage import CoverageRepository
+from app.repositories.klines import KlinesRepository
+from app.repositories.symbols import SymbolsRepository
+from app.services.mappers import EXCHANGE_CLIENTS
+from app.services.recent import SeriesRef
+from app.services.timeframes import current_candle_open, floor_timestamp, freshness_lag
+from app.tracing import tracer
+
+
+logger = logging.getLogger(__name__)
+
+# Window of candles summed to rank symbols by traded volume
+LIQUIDITY_WINDOW = timedelta(days=1)
+
+
+def utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+@dataclass
+class SyncJob:
+    ref: SeriesRef
+    close: datetime  # the candle close that queued it
+    start_time: datetime
+    sort_key: tuple  # lowest first
+    not_before: float = 0.0  # time.monotonic() before which it is not started
+
+
+class SyncQueue:
+    """Jobs held until their not_before, then served lowest sort_key first."""
+
+    def __init__(self):
+        self._waiting: list[tuple[float, int, SyncJob]] = []
+        self._ready: list[tuple[tuple, int, SyncJob]] = []
+        self._changed = asyncio.Event()
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._waiting) + len(self._ready)
+
+    def put(self, job: SyncJob) -> None:
+        heapq.heappush(self._waiting, (job.not_before, next(self._seq), job))
+        self._changed.set()
+
+    async def get(self) -> SyncJob:
+        while True:
+            now = time.monotonic()
+            while self._waiting and self._waiting[0][0] <= now:
+                _, seq, job = heapq.heappop(self._waiting)
+                heapq.heappush(self._ready, (job.sort_key, seq, job))
+            if self._ready:
+                return heapq.heappop(self._ready)[2]
+
+            timeout = self._waiting[0][0] - now if self._waiting else None
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except TimeoutError:
+                pass
+
+
+class CollectionScheduler:
+    """Keeps every active series of some exchanges and timeframes fresh."""
+
+    def __init__(
+        self,
+        exchanges: list[ExchangeEnum],
+        market_types: list[MarketTypeEnum],
+        timeframes: list[TimeframeEnum],
+        priorities: dict[str, int] | None = None,
+        workers: int = 4,
+        settle_delay: float = 5.0,
+        spread: float = 120.0,
+        new_series_candles: int = 1000,
+        freshness_target: timedelta | None = None,
+        report_interval: float = 60.0,
+        clients: dict[ExchangeEnum, BaseExchangeClient] | None = None,
+    ):
+        """
+        Args:
+            priorities: Symbols synced before others, higher first; the rest
+                follow by traded volume over LIQUIDITY_WINDOW.
+            workers: Syncs run at once per exchange.
+            settle_delay: Seconds after a close before its round starts, so
+                the exchange has finalized the candle.
+            spread: Seconds over which a round's syncs are started.
+            new_series_candles: Candles fetched for series without history
+                (older history is left to the backfill scripts).
+            freshness_target: Default FRESHNESS_TARGET_SECONDS.
+            clients: REST clients by exchange, default new ones.
+        """
+        self.exchanges = exchanges
+        self.market_types = market_types
+        self.timeframes = timeframes
+        self.priorities = priorities or {}
+        self.workers = workers
+        self.settle_delay = settle_delay
+        self.spread = spread
+        self.new_series_candles = new_series_candles
+        self.freshness_target = freshness_target or timedelta(
+            seconds=settings.FRESHNESS_TARGET_SECONDS
+        )
+        self.report_interval = report_interval
+        self.clients = clients or {
+            exchange: EXCHANGE_CLIENTS[exchange]() for exchange in exchanges
+        }
+        self.queues = {exchange: SyncQueue() for exchange in exchanges}
+        # Series queued or syncing
+        self._queued: set[tuple] = set()
+        self._random = random.Random()
+
+    async def run(self) -> None:
+        """Schedule, sync and report until cancelled."""
+        await asyncio.gather(
+            *(self._schedule(timeframe) for timeframe in self.timeframes),
+            *(
+                self._worker(exchange)
+                for exchange in self.exchanges
+                for _ in range(self.workers)
+            ),
+            self._report(),
+        )
+
+    async def _schedule(self, timeframe: TimeframeEnum) -> None:
+        """Queue a round now, for the latest close, then after every close."""
+        while True:
+            close = current_candle_open(timeframe)
+            try:
+                await self.enqueue(timeframe, close)
+            except Exception as e:
+                logger.error("Queueing %s syncs failed: %s", timeframe.value, e)
+            next_close = close + TIMEFRAME_DELTA[timeframe]
+            wait = (next_close - utcnow()).total_seconds()
+            await asyncio.sleep(max(0.0, wait) + self.settle_delay)
+
+    async def enqueue(self, timeframe: TimeframeEnum, close: datetime) -> int:
+        """Queue the syncs of every active series after a close; returns how many."""
+        step = TIMEFRAME_DELTA[timeframe]
+        # Closed candles after the newest stored one; this much for new series
+        default_start = close - step * self.new_series_candles
+
+        queued = 0
+        async with AsyncSessionLocal() as session:
+            for exchange in self.exchanges:
+                jobs = []
+                for market_type in self.market_types:
+                    symbols = await KlinesRepository.resolve_exchange_symbols(
+                        session, exchange, market_type
+                    )
+                    if not symbols:
+                        continue
+                    es_ids = [es_id for es_id, _ in symbols]
+                    coverage = await CoverageRepository.get_coverage(
+                        session, exchange, market_type, timeframe=timeframe
+                    )
+                    last_ts = {
+                        row["exchange_symbol_id"]: row["last_ts"] for row in coverage
+                    }
+                    listed_at = await SymbolsRepository.get_listed_at(session, es_ids)
+                    volumes = await KlinesRepository.get_quote_volumes(
+                        session, es_ids, timeframe, close - max(LIQUIDITY_WINDOW, step)
+                    )
+                    unclosed = await KlinesRepository.get_unclosed_starts(
+                        session, es_ids, timeframe
+                    )
+
+                    for es_id, symbol in symbols:
+                        if es_id in last_ts:
+                            start_time = last_ts[es_id] + step
+                            # Refetch candles stored while still forming
+                            if (es_id, timeframe.value) in unclosed:
+                                start_time = min(
+                                    start_time, unclosed[(es_id, timeframe.value)]
+                                )
+                        else:
+                            start_time = default_start
+                            if es_id in listed_at:
+                                start_time = max(
+                                    start_time,
+                                    floor_timestamp(listed_at[es_id], timeframe),
+                                )
+                        if start_time >= close:
+                            continue  # up to date, e.g. written by ingest_live
+                        ref = SeriesRef(exchange, market_type, symbol, es_id, timeframe)
+                        sort_key = (
+                            -self.priorities.get(symbol, 0),
+                            -volumes.get(es_id, 0.0),
+                            # Longer timeframes wait on ties, their lag matters less
+                            step,
+                        )
+                        jobs.append(SyncJob(ref, close, start_time, sort_key))
+
+                queued += self._put_round(exchange, timeframe, jobs)
+        return queued
+
+    def _put_round(
+        self, exchange: ExchangeEnum, timeframe: TimeframeEnum, jobs: list[SyncJob]
+    ) -> int:
+        """Queue jobs with start times spread evenly over `spread` seconds."""
+        jobs = sorted(jobs, key=lambda job: job.sort_key)
+        slot = self.spread / len(jobs) if jobs else 0.0
+        now = time.monotonic()
+        queued = 0
+        for i, job in enumerate(jobs):
+            if job.ref.series in self._queued:
+                SYNC_JOBS.labels(exchange.value, timeframe.value, "coalesced").inc()
+                continue
+            # Jittered within the slot, so rounds of several processes interleave
+            job.not_before = now + slot * (i + self._random.random())
+            self._queued.add(job.ref.series)
+            self.queues[exchange].put(job)
+            queued += 1
+        SYNC_QUEUE_JOBS.labels(exchange.value).set(len(self.queues[exchange]))
+        return queued
+
+    async def _worker(self, exchange: ExchangeEnum) -> None:
+        queue = self.queues[exchange]
+        while True:
+            job = await queue.get()
+            SYNC_QUEUE_JOBS.labels(exchange.value).set(len(queue))
+            try:
+                await self.sync(job)
+            finally:
+                self._queued.discard(job.ref.series)
+
+    async def sync(self, job: SyncJob) -> int:
+        """Fetch and save the series' closed candles from job.start_time on."""
+        ref = job.ref
+        labels = (ref.exchange.value, ref.timeframe.value)
+        client = self.clients[ref.exchange]
+        # Closed candles only, up to now (the end time is inclusive)
+        end_time = current_candle_open(ref.timeframe) - timedelta(milliseconds=1)
+        inserted = 0
+        try:
+            with tracer.start_as_current_span(
+                "scheduled_sync",
+                attributes={
+                    "exchange": ref.exchange.value,
+                    "symbol": ref.symbol,
+                    "timeframe": ref.timeframe.value,
+                },
+            ):
+                async with AsyncSessionLocal() as session:
+                    async for batch in client.get_klines(
+                        symbol=ref.symbol,
+                        timeframe=ref.timeframe,
+                        start_time=job.start_time,
+                        end_time=end_time,
+                        market_type=ref.market_type,
+                    ):
+                        inserted += await KlinesRepository.save_klines(
+                            session, ref.exchange_symbol_id, ref.timeframe, batch
+                        )
+        except Exception as e:
+            SYNC_JOBS.labels(*labels, "error").inc()
+            logger.warning(
+                "Sync of %s %s/%s %s failed: %s",
+                ref.symbol,
+                ref.exchange.value,
+                ref.market_type.value,
+                ref.timeframe.value,
+                e,
+            )
+            return inserted
+
+        SYNC_JOBS.labels(*labels, "ok").inc()
+        SYNC_CLOSE_DELAY_SECONDS.labels(*labels).observe(
+            (utcnow() - job.close).total_seconds()
+        )
+        return inserted
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            try:
+                await self.report()
+            except Exception as e:
+                logger.warning("Freshness report failed: %s", e)
+
+    async def report(self) -> list[dict]:
+        """
+        Freshness of every active series, also set as gauges and logged per
+        exchange, market type and timeframe.
+
+        Returns:
+            List of dicts with exchange, market_type, symbol, timeframe,
+            last_ts and lag_seconds (None for series without candles)
+        """
+        now = utcnow()
+        target = self.freshness_target.total_seconds()
+        series = []
+        async with AsyncSessionLocal() as session:
+            for exchange in self.exchanges:
+                for market_type in self.market_types:
+                    symbols = await KlinesRepository.resolve_exchange_symbols(
+                        session, exchange, market_type
+                    )
+                    coverage = await CoverageRepository.get_coverage(
+                        session, exchange, market_type
+                    )
+                    last_ts = {
+                        (row["exchange_symbol_id"], row["timeframe"]): row["last_ts"]
+                        for row in coverage
+                    }
+                    for timeframe in self.timeframes:
+                        for es_id, symbol in symbols:
+                            last = last_ts.get((es_id, timeframe.value))
+                            lag = None
+                            if last is not None:
+                                lag = freshness_lag(
+                                    last, timeframe, now
+                                ).total_seconds()
+                            series.append(
+                                {
+                                    "exchange": exchange,
+                                    "market_type": market_type,
+                                    "symbol": symbol,
+                                    "timeframe": timeframe,
+                                    "last_ts": last,
+                                    "lag_seconds": lag,
+                                }
+                            )
+
+        FRESHNESS_LAG_SECONDS.clear()
+        groups: dict[tuple, list[dict]] = {}
+        for item in series:
+            key = (item["exchange"], item["market_type"], item["timeframe"])
+            groups.setdefault(key, []).append(item)
+            if item["lag_seconds"] is not None:
+                FRESHNESS_LAG_SECONDS.labels(
+                    *(value.value for value in key), item["symbol"]
+                ).set(item["lag_seconds"])
+
+        for (exchange, market_type, timeframe), items in groups.items():
+            # Series without candles count as over target
+            over = [
+                item
+                for item in items
+                if item["lag_seconds"] is None or item["lag_seconds"] > target
+            ]
+            SERIES_OVER_FRESHNESS_TARGET.labels(
+                exchange.value, market_type.value, timeframe.value
+            ).set(len(over))
+            worst = max(items, key=lambda item: item["lag_seconds"] or 0.0)
+            logger.info(
+                "%s %s %s: %d/%d series within %ds of close, worst %s %.0fs",
+                exchange.value,
+                market_type.value,
+                timeframe.value,
+                len(items) - len(over),
+                len(items),
+                target,
+                worst["symbol"],
+                worst["lag_seconds"] or 0.0,
+            )
+        return series
@@ -0,0 +1,351 @@
+from collections.abc import AsyncGenerator
+from dataclasses import replace
+from datetime import datetime
+from functools import reduce
+
+import numpy as np
+import pyarrow as pa
+from fastapi import HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.session import AsyncSessionLocal
+from app.enums import KlinesFormatEnum
+from app.repositories.coverage import CoverageRepository
+from app.repositories.klines import KlinesRepository
+from app.schemas.klines import SpreadItem, SpreadRequest, SpreadResponse, SpreadStats
+from app.services.cache import (
+    CacheEntry,
+    cache_stream,
+    make_etag,
+    make_key,
+    response_cache,
+    window_expires_at,
+)
+from app.services.formatters import MEDIA_TYPES, encode_tables, negotiate_format
+from app.services.tiering import TieringService
+from app.services.timeframes import EPOCH, current_candle_open
+from app.storage.cold import ColdStore
+
+
+# Symbols aligned per database query
+SPREAD_BATCH_SYMBOLS = 50
+
+SPREAD_METRICS = ("spread", "basis", "ratio")
+
+
+def spread_metrics(base: np.ndarray, other: np.ndarray) -> dict[str, np.ndarray]:
+    """leg - base, leg / base - 1 and leg / base; NaN where base is zero."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = other / base
+    ratio[base == 0] = np.nan
+    return {"spread": other - base, "basis": ratio - 1.0, "ratio": ratio}
+
+
+def summarize(values: np.ndarray) -> SpreadStats:
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return SpreadStats(mean=None, std=None, min=None, max=None, last=None)
+    return SpreadStats(
+        mean=float(finite.mean()),
+        std=float(finite.std()),
+        min=float(finite.min()),
+        max=float(finite.max()),
+        last=float(finite[-1]),
+    )
+
+
+def spread_schema(legs: list[str]) -> pa.Schema:
+    """symbol, timestamp, the price of every leg, then metrics per non-base leg."""
+    columns = [
+        pa.field("symbol", pa.string()),
+        pa.field("timestamp", pa.timestamp("ms")),
+    ]
+    names = [leg.replace(":", "_") for leg in legs]
+    columns += [pa.field(name, pa.float64()) for name in names]
+    for name in names[1:]:
+        columns += [
+            pa.field(f"{name}_{metric}", pa.float64()) for metric in SPREAD_METRICS
+        ]
+    return pa.schema(columns)
+
+
+def spread_table(
+    symbol: str,
+    timestamps: np.ndarray,
+    prices: np.ndarray,
+    table_schema: pa.Schema,
+) -> pa.Table:
+    arrays = [
+        pa.array(np.full(len(timestamps), symbol, dtype=object), type=pa.string()),
+        pa.array(timestamps, type=pa.timestamp("ms")),
+    ]
+    arrays += [pa.array(prices[:, leg]) for leg in range(prices.shape[1])]
+    for leg in range(1, prices.shape[1]):
+        metrics = spread_metrics(prices[:, 0], prices[:, leg])
+        arrays += [
+            pa.array(metrics[metric], from_pandas=True) for metric in SPREAD_METRICS
+        ]
+    return pa.Table.from_arrays(arrays, schema=table_schema)
+
+
+class SpreadService:
+
+    @staticmethod
+    async def get_spread(
+        session: AsyncSession,
+        spread_request: SpreadRequest,
+        accept: str | None = None,
+        if_none_match: str | None = None,
+    ) -> Response:
+        """
+        Align the same symbols across exchanges and market types and compare
+        every leg with the first.
+
+        Hot candles are joined on timestamp in the database, a batch of
+        symbols per query; ranges in the cold tier are aligned in NumPy.
+        Responses are cached and invalidated by writes to any leg.
+        """
+        fmt = negotiate_format(spread_request.format, accept)
+        key = make_key(
+            "spread", {**spread_request.model_dump(mode="json"), "format": fmt.value}
+        )
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached.to_response(if_none_match)
+
+        groups = await SpreadService._resolve_groups(session, spread_request)
+        if not groups:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"No symbols found on every leg of {', '.join(spread_request.legs)}",
+            )
+
+        timeframe = spread_request.timeframe.value
+        series = [(es_id, timeframe) for _, ids in groups for es_id in ids]
+        generation = response_cache.generation(*series)
+        entry = CacheEntry(
+            body=b"",
+            media_type=MEDIA_TYPES[fmt],
+            etag="",
+            series=series[0],
+            related=tuple(series[1:]),
+            start=spread_request.start_time,
+            end=spread_request.end_time,
+            expires_at=window_expires_at(
+                spread_request.end_time,
+                current_candle_open(spread_request.timeframe),
+                spread_request.timeframe,
+            ),
+        )
+
+        if fmt != KlinesFormatEnum.JSON:
+            table_schema = spread_schema(spread_request.legs)
+            chunks = SpreadService._stream_spread(
+                spread_request, groups, table_schema, fmt
+            )
+            return StreamingResponse(
+                cache_stream(chunks, key, entry, generation),
+                media_type=MEDIA_TYPES[fmt],
+            )
+
+        items = []
+        try:
+            async for symbol, timestamps, prices in SpreadService._iter_aligned(
+                session, spread_request, groups
+            ):
+                for leg in range(1, prices.shape[1]):
+                    items.append(
+                        SpreadService._build_item(
+                            spread_request, symbol, leg, timestamps, prices
+                        )
+                    )
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to compute spread: {e}",
+            )
+
+        body = (
+            SpreadResponse(
+                base_leg=spread_request.legs[0],
+                timeframe=spread_request.timeframe,
+                field=spread_request.field,
+                items=items,
+                count=len(items),
+            )
+            .model_dump_json()
+            .encode()
+        )
+        entry = replace(entry, body=body, etag=make_etag(body))
+        response_cache.put(key, entry, generation)
+        return entry.to_response(if_none_match)
+
+    @staticmethod
+    def _build_item(
+        spread_request: SpreadRequest,
+        symbol: str,
+        leg: int,
+        timestamps: np.ndarray,
+        prices: np.ndarray,
+    ) -> SpreadItem:
+        metrics = spread_metrics(prices[:, 0], prices[:, leg])
+        item = SpreadItem(
+            symbol=symbol,
+            leg=spread_request.legs[leg],
+            count=len(timestamps),
+            **{metric: summarize(values) for metric, values in metrics.items()},
+        )
+        if not spread_request.summary_only:
+            item.timestamps = timestamps.astype("datetime64[us]").tolist()
+            item.values = {
+                metric: pa.array(values, from_pandas=True).to_pylist()
+                for metric, values in metrics.items()
+            }
+        return item
+
+    @staticmethod
+    async def _resolve_groups(
+        session: AsyncSession,
+        spread_request: SpreadRequest,
+    ) -> list[tuple[str, list[int]]]:
+        """(symbol, exchange_symbol_id per leg) for symbols present on every leg."""
+        ids_by_leg = []
+        for exchange, market_type in spread_request.parsed_legs:
+            resolved = await KlinesRepository.resolve_exchange_symbols(
+                session=session,
+                exchange=exchange,
+                market_type=market_type,
+                symbol_names=spread_request.symbols or None,
+            )
+            ids_by_leg.append(dict((name, es_id) for es_id, name in resolved))
+
+        common = sorted(
+            reduce(lambda a, b: a & b.keys(), ids_by_leg, ids_by_leg[0].keys())
+        )
+        return [(symbol, [ids[symbol] for ids in ids_by_leg]) for symbol in common]
+
+    @staticmethod
+    async def _iter_aligned(
+        session: AsyncSession,
+        spread_request: SpreadRequest,
+        groups: list[tuple[str, list[int]]],
+    ) -> AsyncGenerator[tuple[str, np.ndarray, np.ndarray], None]:
+        """
+        Yield (symbol, timestamps, prices) per symbol, where prices holds one
+        column per leg and only timestamps present on every leg are kept.
+        """
+        timeframe = spread_request.timeframe
+        start_time = spread_request.start_time
+        end_time = spread_request.end_time
+        cold_until = await CoverageRepository.get_cold_until_many(
+            session, [es_id for _, ids in groups for es_id in ids], timeframe
+        )
+
+        for offset in range(0, len(groups), SPREAD_BATCH_SYMBOLS):
+            batch = groups[offset : offset + SPREAD_BATCH_SYMBOLS]
+            # Past the latest cold boundary of its legs a symbol is hot everywhere
+            boundaries = [
+                max(
+                    (cold_until[es_id] for es_id in ids if es_id in cold_until),
+                    default=None,
+                )
+                for _, ids in batch
+            ]
+            hot_starts = [
+                max(filter(None, (boundary, start_time)), default=EPOCH)
+                for boundary in boundaries
+            ]
+
+            rows = await KlinesRepository.get_aligned_rows(
+                session,
+                [ids for _, ids in batch],
+                hot_starts,
+                timeframe,
+                spread_request.field,
+                end_time,
+            )
+            if rows:
+                columns = list(zip(*rows))
+                idx = np.array(columns[0], dtype=np.int64)
+                hot_ts = np.array(columns[1], dtype="datetime64[ms]")
+                hot_prices = np.column_stack(
+                    [np.array(column, dtype=np.float64) for column in columns[2:]]
+                )
+            else:
+                idx = np.empty(0, dtype=np.int64)
+                hot_ts = np.empty(0, dtype="datetime64[ms]")
+                hot_prices = np.empty((0, len(spread_request.legs)))
+            bounds = np.searchsorted(idx, np.arange(len(batch) + 1))
+
+            for n, ((symbol, ids), boundary) in enumerate(zip(batch, boundaries)):
+                hot = slice(bounds[n], bounds[n + 1])
+                timestamps, prices = hot_ts[hot], hot_prices[hot]
+                if boundary is not None and (
+                    start_time is None or start_time < boundary
+                ):
+                    cold_end = min(end_time, boundary) if end_time else boundary
+                    cold_ts, cold_prices = await SpreadService._align_tiered(
+                        session, spread_request, symbol, ids, start_time, cold_end
+                    )
+                    timestamps = np.concatenate([cold_ts, timestamps])
+                    prices = np.concatenate([cold_prices, prices])
+                yield symbol, timestamps, prices
+
+    @staticmethod
+    async def _align_tiered(
+        session: AsyncSession,
+        spread_request: SpreadRequest,
+        symbol: str,
+        ids: list[int],
+        start_time: datetime | None,
+        end_time: datetime,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Read every leg through the tiers and keep the common timestamps."""
+        cold_store = ColdStore()
+        tables = []
+        for (exchange, market_type), es_id in zip(spread_request.parsed_legs, ids):
+            tables.append(
+                await TieringService.read_range(
+                    session=session,
+                    cold_store=cold_store,
+                    exchange=exchange,
+                    market_type=market_type,
+                    symbol=symbol,
+                    exchange_symbol_id=es_id,
+                    timeframe=spread_request.timeframe,
+                    start_time=start_time,
+                    end_time=end_time,
+                )
+            )
+
+        leg_ts = [table["timestamp"].to_numpy() for table in tables]
+        common = reduce(np.intersect1d, leg_ts)
+        prices = np.column_stack(
+            [
+                table[spread_request.field.value].to_numpy()[
+                    np.searchsorted(ts, common)
+                ]
+                for table, ts in zip(tables, leg_ts)
+            ]
+        ).reshape(len(common), len(tables))
+        return common.astype("datetime64[ms]"), prices
+
+    @staticmethod
+    async def _stream_spread(
+        spread_request: SpreadRequest,
+        groups: list[tuple[str, list[int]]],
+        table_schema: pa.Schema,
+        fmt: KlinesFormatEnum,
+    ) -> AsyncGenerator[bytes, None]:
+        """Encode one table per symbol; owns its session for the response lifetime."""
+        async with AsyncSessionLocal() as session:
+
+            async def tables():
+                async for symbol, timestamps, prices in SpreadService._iter_aligned(
+                    session, spread_request, groups
+                ):
+                    yield spread_table(symbol, timestamps, prices, table_schema)
+
+            async for chunk in encode_tables(tables(), table_schema, fmt):
+                yield chunk
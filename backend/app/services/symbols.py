@@ -1,8 +1,9 @@
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.repositories.symbols import SymbolsRepository
 from app.schemas.symbols import SymbolsRequest, SymbolsResponse, UpdateSymbolsResponse
+from app.services.cache import CacheEntry, make_etag, make_key, response_cache
 from app.services.mappers import EXCHANGE_CLIENTS
 
 
@@ -12,7 +13,17 @@ class SymbolsService:
     async def get_active(
         session: AsyncSession,
         symbols_request: SymbolsRequest,
-    ) -> SymbolsResponse:
+        if_none_match: str | None = None,
+    ) -> Response:
+        """Active symbols, cached until update_symbols changes the universe."""
+        key = make_key("symbols", symbols_request.model_dump(mode="json"))
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached.to_response(if_none_match)
+
+        series = (symbols_request.exchange.value, symbols_request.market_type.value)
+        generation = response_cache.generation(series)
+
         try:
             symbols = await SymbolsRepository.get_active_symbols(
                 session=session,
@@ -26,13 +37,26 @@ class SymbolsService:
                 detail=f"Failed to fetch symbols: {e}",
             )
 
-        return SymbolsResponse(
-            exchange=symbols_request.exchange,
-            market_type=symbols_request.market_type,
-            quote_asset=symbols_request.quote_asset,
-            symbols=symbols,
-            count=len(symbols),
+        body = (
+            SymbolsResponse(
+                exchange=symbols_request.exchange,
+                market_type=symbols_request.market_type,
+                quote_asset=symbols_request.quote_asset,
+                symbols=symbols,
+                count=len(symbols),
+            )
+            .model_dump_json()
+            .encode()
+        )
+
+        entry = CacheEntry(
+            body=body,
+            media_type="application/json",
+            etag=make_etag(body),
+            series=series,
         )
+        response_cache.put(key, entry, generation)
+        return entry.to_response(if_none_match)
 
     @staticmethod
     async def update(
@@ -42,7 +66,7 @@ class SymbolsService:
         client_class = EXCHANGE_CLIENTS[symbols_request.exchange]
 
         try:
-            current_symbols = await client_class.get_active_symbols(
+            instruments = await client_class.get_active_symbols(
                 market_type=symbols_request.market_type,
                 quote_asset=symbols_request.quote_asset,
             )
@@ -57,7 +81,7 @@ class SymbolsService:
                 session=session,
                 exchange=symbols_request.exchange,
                 market_type=symbols_request.market_type,
-                current_symbols=current_symbols,
+                instruments=instruments,
             )
         except Exception as e:
             raise HTTPException(
@@ -0,0 +1,278 @@
+import logging
+import time
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+import pyarrow as pa
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.repositories.coverage import CoverageRepository
+from app.repositories.klines import KlinesRepository
+from app.storage.cold import CANDLE_SCHEMA, ColdStore, month_start, next_month
+from app.storage.columnar import columnar_store
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TieringStats:
+    """Process-wide counters for reads served by each tier."""
+
+    cold_reads: int = 0
+    cold_rows: int = 0
+    cold_seconds: float = 0.0
+    hot_reads: int = 0
+    hot_rows: int = 0
+    hot_seconds: float = 0.0
+    columnar_reads: int = 0
+    columnar_rows: int = 0
+    columnar_seconds: float = 0.0
+
+
+tiering_stats = TieringStats()
+
+
+def rows_to_table(rows: list) -> pa.Table:
+    """Build a candle table from (timestamp, open, high, low, close, volume) rows."""
+    columns = list(zip(*rows)) if rows else [[] for _ in CANDLE_SCHEMA.names]
+    return pa.Table.from_arrays(
+        [pa.array(col, type=field.type) for col, field in zip(columns, CANDLE_SCHEMA)],
+        schema=CANDLE_SCHEMA,
+    )
+
+
+def split_range(
+    start_time: datetime | None,
+    end_time: datetime | None,
+    cold_until: datetime | None,
+) -> tuple[tuple | None, tuple | None]:
+    """
+    Split [start_time, end_time) at the cold boundary.
+
+    Returns:
+        (cold_range, hot_range), each a (start, end) tuple or None when the
+        requested range does not touch that tier
+    """
+    if cold_until is None:
+        return None, (start_time, end_time)
+
+    cold_range = None
+    if start_time is None or start_time < cold_until:
+        cold_end = min(end_time, cold_until) if end_time else cold_until
+        cold_range = (start_time, cold_end)
+
+    hot_range = None
+    if end_time is None or end_time > cold_until:
+        hot_start = max(start_time, cold_until) if start_time else cold_until
+        hot_range = (hot_start, end_time)
+
+    return cold_range, hot_range
+
+
+class TieringService:
+
+    @staticmethod
+    async def read_range(
+        session: AsyncSession,
+        cold_store: ColdStore,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol: str,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+        limit: int | None = None,
+    ) -> pa.Table:
+        """
+        Read candles in [start_time, end_time) from both tiers, oldest first.
+
+        Parquet files are only opened for the part of the range before the
+        series' cold boundary; the hot table serves the rest. With a limit,
+        the hot table is not queried once the cold tier fills it.
+
+        Series in the columnar store are served from it instead.
+        """
+        if columnar_store is not None:
+            started = time.perf_counter()
+            table = columnar_store.read_range(
+                exchange_symbol_id, timeframe, start_time, end_time, limit
+            )
+            if table is not None:
+                tiering_stats.columnar_reads += 1
+                tiering_stats.columnar_rows += table.num_rows
+                tiering_stats.columnar_seconds += time.perf_counter() - started
+                return table
+
+        cold_until = await CoverageRepository.get_cold_until(
+            session, exchange_symbol_id, timeframe
+        )
+
+        cold_range, hot_range = split_range(start_time, end_time, cold_until)
+
+        tables = []
+        remaining = limit
+        if cold_range is not None:
+            started = time.perf_counter()
+            cold_table = cold_store.read_range(
+                exchange, market_type, symbol, timeframe, *cold_range
+            )
+            if limit is not None:
+                cold_table = cold_table.slice(0, limit)
+                remaining = limit - cold_table.num_rows
+            tiering_stats.cold_reads += 1
+            tiering_stats.cold_rows += cold_table.num_rows
+            tiering_stats.cold_seconds += time.perf_counter() - started
+            tables.append(cold_table)
+
+        if hot_range is not None and remaining != 0:
+            started = time.perf_counter()
+            rows = await KlinesRepository.get_klines(
+                session, exchange_symbol_id, timeframe, *hot_range, remaining
+            )
+            tiering_stats.hot_reads += 1
+            tiering_stats.hot_rows += len(rows)
+            tiering_stats.hot_seconds += time.perf_counter() - started
+            tables.append(rows_to_table(rows))
+
+        if not tables:
+            return CANDLE_SCHEMA.empty_table()
+        return pa.concat_tables(tables)
+
+    @staticmethod
+    async def stream_range(
+        session: AsyncSession,
+        cold_store: ColdStore,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol: str,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+        chunk_size: int = 5000,
+        use_columnar: bool = True,
+    ) -> AsyncGenerator[pa.Table, None]:
+        """
+        Stream candles in [start_time, end_time) from both tiers as tables.
+
+        Cold data is yielded one month file at a time and hot data one
+        server-side cursor partition at a time, so memory stays bounded.
+        Series in the columnar store are streamed from it in chunk_size
+        slices instead, unless use_columnar is False.
+        """
+        if use_columnar and columnar_store is not None:
+            chunks = columnar_store.iter_range(
+                exchange_symbol_id, timeframe, start_time, end_time, chunk_size
+            )
+            if chunks is not None:
+                tiering_stats.columnar_reads += 1
+                for table in chunks:
+                    tiering_stats.columnar_rows += table.num_rows
+                    yield table
+                return
+
+        cold_until = await CoverageRepository.get_cold_until(
+            session, exchange_symbol_id, timeframe
+        )
+
+        cold_range, hot_range = split_range(start_time, end_time, cold_until)
+
+        if cold_range is not None:
+            tiering_stats.cold_reads += 1
+            for table in cold_store.iter_months(
+                exchange, market_type, symbol, timeframe, *cold_range
+            ):
+                tiering_stats.cold_rows += table.num_rows
+                yield table
+
+        if hot_range is not None:
+            tiering_stats.hot_reads += 1
+            async for rows in KlinesRepository.stream_klines(
+                session, exchange_symbol_id, timeframe, *hot_range, chunk_size
+            ):
+                tiering_stats.hot_rows += len(rows)
+                yield rows_to_table(rows)
+
+    @staticmethod
+    async def tier_series(
+        session: AsyncSession,
+        cold_store: ColdStore,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol: str,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        now: datetime,
+    ) -> int:
+        """
+        Move whole months older than COLD_TIER_AFTER_DAYS to Parquet.
+
+        Each month is written to disk before its rows are deleted and the
+        boundary advanced in one transaction, so a crash at any point leaves
+        the candles readable from at least one tier. Months from the oldest
+        candle stored while still forming on stay hot until a sync closes it,
+        so the cold tier only holds closed candles.
+
+        Returns:
+            Number of candles moved
+        """
+        cutoff = month_start(now - timedelta(days=settings.COLD_TIER_AFTER_DAYS))
+        unclosed = await KlinesRepository.get_unclosed_starts(
+            session, [exchange_symbol_id], timeframe
+        )
+        first_unclosed = unclosed.get((exchange_symbol_id, timeframe.value))
+        if first_unclosed is not None:
+            cutoff = min(cutoff, month_start(first_unclosed))
+        cold_until = await CoverageRepository.get_cold_until(
+            session, exchange_symbol_id, timeframe
+        )
+
+        first_hot = await KlinesRepository.get_first_timestamp(
+            session, exchange_symbol_id, timeframe, cold_until
+        )
+        if first_hot is None:
+            return 0
+
+        moved_total = 0
+        month = month_start(first_hot)
+        while month < cutoff:
+            month_end = next_month(month)
+            rows = await KlinesRepository.get_klines(
+                session, exchange_symbol_id, timeframe, month, month_end
+            )
+            if rows:
+                cold_store.write_month(
+                    exchange,
+                    market_type,
+                    symbol,
+                    timeframe,
+                    month,
+                    rows_to_table(rows),
+                )
+            moved = await KlinesRepository.delete_klines(
+                session, exchange_symbol_id, timeframe, month, month_end
+            )
+            await CoverageRepository.mark_cold(
+                session, exchange_symbol_id, timeframe, month_end, moved
+            )
+            await session.commit()
+
+            moved_total += moved
+            month = month_end
+
+        if moved_total:
+            logger.info(
+                "%s %s/%s %s: moved %d candles to cold tier (cold until %s)",
+                symbol,
+                exchange.value,
+                market_type.value,
+                timeframe.value,
+                moved_total,
+                cutoff,
+            )
+        return moved_total
@@ -0,0 +1,45 @@
+from datetime import UTC, datetime, timedelta
+
+from app.enums import TIMEFRAME_DELTA, TimeframeEnum
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def floor_timestamp(ts: datetime, timeframe: TimeframeEnum) -> datetime:
+    """Round a naive UTC timestamp down to the open time of its candle."""
+    step = TIMEFRAME_DELTA[timeframe]
+    return ts - (ts - EPOCH) % step
+
+
+def ceil_timestamp(ts: datetime, timeframe: TimeframeEnum) -> datetime:
+    """Round a naive UTC timestamp up to the next candle open (unchanged if on one)."""
+    floored = floor_timestamp(ts, timeframe)
+    return floored if floored == ts else floored + TIMEFRAME_DELTA[timeframe]
+
+
+def current_candle_open(
+    timeframe: TimeframeEnum, now: datetime | None = None
+) -> datetime:
+    """
+    Open time of the still-forming candle.
+
+    Every candle that opened before it is closed.
+    """
+    if now is None:
+        now = datetime.now(UTC).replace(tzinfo=None)
+    return floor_timestamp(now, timeframe)
+
+
+def freshness_lag(
+    last_ts: datetime, timeframe: TimeframeEnum, now: datetime | None = None
+) -> timedelta:
+    """
+    How long the oldest closed candle after last_ts has been closed.
+
+    Zero while every closed candle up to now is stored.
+    """
+    if now is None:
+        now = datetime.now(UTC).replace(tzinfo=None)
+    first_missing_close = last_ts + 2 * TIMEFRAME_DELTA[timeframe]
+    return max(timedelta(0), now - first_missing_close)
@@ -0,0 +1,203 @@
+import os
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from app.config import settings
+from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+
+
+CANDLE_SCHEMA = pa.schema(
+    [
+        ("timestamp", pa.timestamp("ms")),
+        ("open", pa.float64()),
+        ("high", pa.float64()),
+        ("low", pa.float64()),
+        ("close", pa.float64()),
+        ("volume", pa.float64()),
+    ]
+)
+
+
+def month_start(ts: datetime) -> datetime:
+    return datetime(ts.year, ts.month, 1)
+
+
+def next_month(ts: datetime) -> datetime:
+    if ts.month == 12:
+        return datetime(ts.year + 1, 1, 1)
+    return datetime(ts.year, ts.month + 1, 1)
+
+
+def cold_gaps(
+    cold_ts: np.ndarray, first_hot: datetime | None, step: timedelta
+) -> list[tuple[datetime, datetime]]:
+    """Gaps inside the cold tier and across its boundary with the hot tier."""
+    if first_hot is not None:
+        cold_ts = np.append(cold_ts, np.datetime64(first_hot, "ms"))
+    positions = np.flatnonzero(np.diff(cold_ts) != np.timedelta64(step))
+    return [
+        (cold_ts[i].astype(datetime), cold_ts[i + 1].astype(datetime))
+        for i in positions
+    ]
+
+
+class ColdStore:
+    """
+    Compressed Parquet storage for closed candles moved out of Postgres.
+
+    Layout (one file per series and month):
+        {root}/exchange={e}/market={m}/symbol={s}/timeframe={tf}/{YYYY-MM}.parquet
+    """
+
+    COMPRESSION = "zstd"
+
+    def __init__(self, root: Path | None = None):
+        self.root = Path(root or settings.COLD_STORAGE_DIR)
+
+    def series_dir(
+        self,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol: str,
+        timeframe: TimeframeEnum,
+    ) -> Path:
+        return (
+            self.root
+            / f"exchange={exchange.value}"
+            / f"market={market_type.value}"
+            / f"symbol={symbol}"
+            / f"timeframe={timeframe.value}"
+        )
+
+    def month_path(
+        self,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol: str,
+        timeframe: TimeframeEnum,
+        month: datetime,
+    ) -> Path:
+        series_dir = self.series_dir(exchange, market_type, symbol, timeframe)
+        return series_dir / f"{month:%Y-%m}.parquet"
+
+    def write_month(
+        self,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol: str,
+        timeframe: TimeframeEnum,
+        month: datetime,
+        table: pa.Table,
+    ) -> Path:
+        """
+        Write one month of candles, merging with an existing file if present.
+
+        The file is written to a temporary path and renamed, so readers never
+        see a partial file.
+        """
+        path = self.month_path(exchange, market_type, symbol, timeframe, month)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        table = table.cast(CANDLE_SCHEMA)
+        if path.exists():
+            existing = pq.read_table(path, schema=CANDLE_SCHEMA)
+            kept = pc.invert(
+                pc.is_in(existing["timestamp"], value_set=table["timestamp"])
+            )
+            table = pa.concat_tables([existing.filter(kept), table])
+        table = table.sort_by("timestamp")
+
+        tmp_path = path.with_suffix(".parquet.tmp")
+        pq.write_table(table, tmp_path, compression=self.COMPRESSION)
+        os.replace(tmp_path, path)
+        return path
+
+    def iter_months(
+        self,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol: str,
+        timeframe: TimeframeEnum,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+    ) -> Iterator[pa.Table]:
+        """Yield candles in [start_time, end_time), one month file at a time."""
+        series_dir = self.series_dir(exchange, market_type, symbol, timeframe)
+        if not series_dir.exists():
+            return
+
+        first_month = f"{start_time:%Y-%m}" if start_time else None
+        last_month = f"{end_time:%Y-%m}" if end_time else None
+
+        for path in sorted(series_dir.glob("*.parquet")):
+            month = path.stem
+            if first_month and month < first_month:
+                continue
+            if last_month and month > last_month:
+                break
+
+            table = pq.read_table(path, schema=CANDLE_SCHEMA)
+            if start_time is not None:
+                table = table.filter(pc.field("timestamp") >= start_time)
+            if end_time is not None:
+                table = table.filter(pc.field("timestamp") < end_time)
+            if table.num_rows:
+                yield table
+
+    def month_counts(
+        self,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol: str,
+        timeframe: TimeframeEnum,
+    ) -> dict[str, int]:
+        """Candles per month file (YYYY-MM), from Parquet footers only."""
+        series_dir = self.series_dir(exchange, market_type, symbol, timeframe)
+        if not series_dir.exists():
+            return {}
+        return {
+            path.stem: pq.ParquetFile(path).metadata.num_rows
+            for path in sorted(series_dir.glob("*.parquet"))
+        }
+
+    def read_range(
+        self,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol: str,
+        timeframe: TimeframeEnum,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+    ) -> pa.Table:
+        """Read candles in [start_time, end_time) from the month files."""
+        tables = list(
+            self.iter_months(
+                exchange, market_type, symbol, timeframe, start_time, end_time
+            )
+        )
+        if not tables:
+            return CANDLE_SCHEMA.empty_table()
+        return pa.concat_tables(tables)
+
+    def read_timestamps(
+        self,
+        exchange: ExchangeEnum,
+        market_type: MarketTypeEnum,
+        symbol: str,
+        timeframe: TimeframeEnum,
+    ) -> np.ndarray:
+        """All cold candle open times as sorted datetime64[ms], reading one column."""
+        series_dir = self.series_dir(exchange, market_type, symbol, timeframe)
+        parts = [
+            pq.read_table(path, columns=["timestamp"])["timestamp"].to_numpy()
+            for path in sorted(series_dir.glob("*.parquet"))
+        ]
+        if not parts:
+            return np.empty(0, dtype="datetime64[ms]")
+        return np.concatenate(parts).astype("datetime64[ms]")
@@ -0,0 +1,395 @@
+"""Memory-mapped, append-only column files of candles, one set per series.
+
+An optional copy of both tiers for scans of long histories: reads map the
+column files and wrap slices of them in Arrow arrays without copying, so a
+range read costs two binary searches and page-cache reads.
+
+Series are built by app.scripts.sync_columnar. From then on save_klines
+appends every committed insert newer than the series' last candle. An insert
+inside the stored range (a filled gap) or a revised candle removes the
+series, and reads fall back to the database until the next sync rebuilds it.
+Writes while a series is being built are recorded in the build, which is
+discarded instead of published if it may have missed them.
+
+Layout:
+    {root}/{exchange_symbol_id}/{timeframe}/{column}.bin
+        timestamp as int64 milliseconds, the others as float64, little-endian
+    {root}/{exchange_symbol_id}/{timeframe}/rows
+        number of valid rows, replaced atomically after each append
+    {root}/{exchange_symbol_id}/{timeframe}.lock
+        held by writers of the series
+    {root}/{exchange_symbol_id}/{timeframe}.building/dirty
+        earliest timestamp (ms) of each write while the series is being built
+"""
+
+import asyncio
+import fcntl
+import logging
+import os
+import shutil
+from collections.abc import Iterator
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+
+from app.config import settings
+from app.enums import TimeframeEnum
+from app.storage.cold import CANDLE_SCHEMA
+
+
+logger = logging.getLogger(__name__)
+
+COLUMN_DTYPES = {
+    field.name: np.dtype("<i8") if field.name == "timestamp" else np.dtype("<f8")
+    for field in CANDLE_SCHEMA
+}
+ROWS_FILE = "rows"
+DIRTY_FILE = "dirty"
+
+
+def to_ms(ts: datetime) -> int:
+    """Milliseconds since the epoch of a naive UTC time, rounded up."""
+    return -(-(ts - datetime(1970, 1, 1)) // timedelta(milliseconds=1))
+
+
+class ColumnarStore:
+    """Fixed-width column files per (exchange_symbol_id, timeframe)."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def series_dir(self, exchange_symbol_id: int, timeframe: TimeframeEnum) -> Path:
+        return self.root / str(exchange_symbol_id) / timeframe.value
+
+    def building_dir(self, exchange_symbol_id: int, timeframe: TimeframeEnum) -> Path:
+        return self.root / str(exchange_symbol_id) / f"{timeframe.value}.building"
+
+    def _lock_path(self, exchange_symbol_id: int, timeframe: TimeframeEnum) -> Path:
+        path = self.series_dir(exchange_symbol_id, timeframe).with_suffix(".lock")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    @contextmanager
+    def lock(self, exchange_symbol_id: int, timeframe: TimeframeEnum):
+        """
+        Exclusive lock of a series across processes, for writers.
+
+        Blocks until the lock is free: call it from a thread in async code,
+        or use lock_async.
+        """
+        with open(self._lock_path(exchange_symbol_id, timeframe), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    @asynccontextmanager
+    async def lock_async(self, exchange_symbol_id: int, timeframe: TimeframeEnum):
+        """lock() that waits in a thread, leaving the event loop running."""
+        with open(self._lock_path(exchange_symbol_id, timeframe), "a") as f:
+            await asyncio.to_thread(fcntl.flock, f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def row_count(
+        self, exchange_symbol_id: int, timeframe: TimeframeEnum
+    ) -> int | None:
+        """Number of stored candles, None if the series is not stored."""
+        try:
+            text = (
+                self.series_dir(exchange_symbol_id, timeframe) / ROWS_FILE
+            ).read_text()
+        except FileNotFoundError:
+            return None
+        return int(text)
+
+    def _map(self, series_dir: Path, column: str, rows: int) -> np.ndarray:
+        return np.memmap(
+            series_dir / f"{column}.bin",
+            dtype=COLUMN_DTYPES[column],
+            mode="r",
+            shape=(rows,),
+        )
+
+    def read_range(
+        self,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+        limit: int | None = None,
+    ) -> pa.Table | None:
+        """
+        Candles in [start_time, end_time), oldest first, or None if the series
+        is not stored.
+
+        The table's buffers are views of the mapped files; they stay valid
+        when the series is appended to, rebuilt or removed meanwhile.
+        """
+        series_dir = self.series_dir(exchange_symbol_id, timeframe)
+        try:
+            rows = int((series_dir / ROWS_FILE).read_text())
+            if rows == 0:
+                return CANDLE_SCHEMA.empty_table()
+            columns = {
+                name: self._map(series_dir, name, rows) for name in COLUMN_DTYPES
+            }
+        except FileNotFoundError:
+            # Not stored, or removed between reading the row count and mapping
+            return None
+
+        timestamps = columns["timestamp"]
+        lo = 0
+        if start_time is not None:
+            lo = int(np.searchsorted(timestamps, to_ms(start_time)))
+        hi = rows
+        if end_time is not None:
+            hi = int(np.searchsorted(timestamps, to_ms(end_time)))
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        hi = max(lo, hi)
+
+        return pa.Table.from_arrays(
+            [
+                pa.Array.from_buffers(
+                    field.type,
+                    hi - lo,
+                    [None, pa.py_buffer(columns[field.name][lo:hi])],
+                )
+                for field in CANDLE_SCHEMA
+            ],
+            schema=CANDLE_SCHEMA,
+        )
+
+    def iter_range(
+        self,
+        exchange_symbol_id: int,
+        timeframe: TimeframeEnum,
+        start_time: datetime | None = None,
+        end_time: datetime | None = None,
+        chunk_size: int = 5000,
+    ) -> Iterator[pa.Table] | None:
+        """Candles in [start_time, end_time) in chunks, or None if not stored."""
+        table = self.read_range(exchange_symbol_id, timeframe, start_time, end_time)
+        if table is None:
+            return None
+        return (
+            table.slice(offset, chunk_size)
+            for offset in range(0, table.num_rows, chunk_size)
+        )
+
+    def append(
+        self, exchange_symbol_id: int, timeframe: TimeframeEnum, rows: list[tuple]
+    ) -> int:
+        """
+        Append committed (timestamp, open, high, low, close, volume) rows to a
+        stored series; a no-op for series that are not stored. A build of the
+        series in progress is marked with them.
+
+        Rows not after the last stored candle must already be stored (they
+        are skipped), otherwise the series is removed. Never raises: the
+        database stays the source of truth. Waits for the series lock, so
+        async callers run it in a thread.
+
+        Returns:
+            Number of rows appended
+        """
+        if not rows or (
+            self.row_count(exchange_symbol_id, timeframe) is None
+            and not self.building_dir(exchange_symbol_id, timeframe).exists()
+        ):
+            return 0
+        try:
+            with self.lock(exchange_symbol_id, timeframe):
+                self._mark_building(
+                    exchange_symbol_id, timeframe, to_ms(min(row[0] for row in rows))
+                )
+                return self._append(exchange_symbol_id, timeframe, rows)
+        except Exception as e:
+            logger.warning(
+                "Appending to columnar series %d %s failed, removing it: %s",
+                exchange_symbol_id,
+                timeframe.value,
+                e,
+            )
+            self.remove(exchange_symbol_id, timeframe)
+            return 0
+
+    def _append(
+        self, exchange_symbol_id: int, timeframe: TimeframeEnum, rows: list[tuple]
+    ) -> int:
+        series_dir = self.series_dir(exchange_symbol_id, timeframe)
+        count = self.row_count(exchange_symbol_id, timeframe)
+        if count is None:
+            # Removed or being rebuilt, which catches up from the database
+            return 0
+
+        rows = sorted(rows)
+        timestamps = np.array([row[0] for row in rows], dtype="datetime64[ms]").view(
+            np.int64
+        )
+        if count:
+            stored = self._map(series_dir, "timestamp", count)
+            new = timestamps > stored[-1]
+            old = timestamps[~new]
+            positions = np.minimum(np.searchsorted(stored, old), count - 1)
+            if not np.array_equal(stored[positions], old):
+                logger.info(
+                    "Columnar series %d %s got candles inside its range, removing it",
+                    exchange_symbol_id,
+                    timeframe.value,
+                )
+                self._remove(exchange_symbol_id, timeframe)
+                return 0
+            rows = [row for row, keep in zip(rows, new) if keep]
+            timestamps = timestamps[new]
+        if not rows:
+            return 0
+
+        values = np.array([row[1:] for row in rows], dtype=np.float64)
+        columns = {"timestamp": timestamps}
+        for i, name in enumerate(CANDLE_SCHEMA.names[1:]):
+            columns[name] = values[:, i]
+        _append_columns(series_dir, columns, count)
+        _write_rows(series_dir, count + len(rows))
+        return len(rows)
+
+    def builder(
+        self, exchange_symbol_id: int, timeframe: TimeframeEnum
+    ) -> "SeriesBuilder":
+        return SeriesBuilder(self, exchange_symbol_id, timeframe)
+
+    def remove(self, exchange_symbol_id: int, timeframe: TimeframeEnum) -> None:
+        """
+        Remove a stored series and spoil a build of it in progress, e.g.
+        after revising candles. Waits for the series lock.
+        """
+        with self.lock(exchange_symbol_id, timeframe):
+            # Any build may have streamed the candles before the revision
+            self._mark_building(exchange_symbol_id, timeframe, 0)
+            self._remove(exchange_symbol_id, timeframe)
+
+    def _remove(self, exchange_symbol_id: int, timeframe: TimeframeEnum) -> None:
+        series_dir = self.series_dir(exchange_symbol_id, timeframe)
+        # The row count first, so readers stop mapping the files
+        (series_dir / ROWS_FILE).unlink(missing_ok=True)
+        shutil.rmtree(series_dir, ignore_errors=True)
+
+    def _mark_building(
+        self, exchange_symbol_id: int, timeframe: TimeframeEnum, first_ms: int
+    ) -> None:
+        """Record a write in a build of the series in progress; call locked."""
+        building_dir = self.building_dir(exchange_symbol_id, timeframe)
+        if building_dir.exists():
+            with open(building_dir / DIRTY_FILE, "a") as f:
+                f.write(f"{first_ms}\n")
+
+
+class SeriesBuilder:
+    """
+    Writes a series from scratch next to the stored one.
+
+    Feed it the series oldest first with write(), then take the series lock,
+    read the candles committed since and publish() them to replace the
+    stored series.
+    """
+
+    def __init__(
+        self, store: ColumnarStore, exchange_symbol_id: int, timeframe: TimeframeEnum
+    ):
+        self.store = store
+        self.exchange_symbol_id = exchange_symbol_id
+        self.timeframe = timeframe
+        self.target = store.series_dir(exchange_symbol_id, timeframe)
+        self.path = store.building_dir(exchange_symbol_id, timeframe)
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.path.mkdir(parents=True)
+        self.rows = 0
+        self.last_ms: int | None = None
+
+    @property
+    def last_ts(self) -> datetime | None:
+        if self.last_ms is None:
+            return None
+        return datetime(1970, 1, 1) + timedelta(milliseconds=self.last_ms)
+
+    def write(self, table: pa.Table) -> int:
+        """Append the table's candles newer than the last written."""
+        timestamps = (
+            table["timestamp"].to_numpy().astype("datetime64[ms]").view(np.int64)
+        )
+        if self.last_ms is not None:
+            start = int(np.searchsorted(timestamps, self.last_ms, side="right"))
+            table, timestamps = table.slice(start), timestamps[start:]
+        if not table.num_rows:
+            return 0
+        columns = {"timestamp": timestamps}
+        for name in CANDLE_SCHEMA.names[1:]:
+            columns[name] = table[name].to_numpy()
+        _append_columns(self.path, columns, self.rows)
+        self.rows += table.num_rows
+        self.last_ms = int(timestamps[-1])
+        return table.num_rows
+
+    def publish(self, top_up: pa.Table) -> bool:
+        """
+        Write top_up, the candles committed after the last one written, and
+        replace the stored series; call with the series lock held, having
+        read top_up under it.
+
+        Writes of candles at or before the last one written since the build
+        started (gap fills, revisions) may have been missed by the stream:
+        then the build is discarded instead, leaving the series as it is.
+
+        Returns:
+            Whether the series was replaced
+        """
+        try:
+            marks = (self.path / DIRTY_FILE).read_text().split()
+        except FileNotFoundError:
+            marks = []
+        if marks and self.last_ms is not None and min(map(int, marks)) <= self.last_ms:
+            self.discard()
+            return False
+
+        self.write(top_up)
+        _write_rows(self.path, self.rows)
+        old = self.target.with_name(f"{self.timeframe.value}.old")
+        shutil.rmtree(old, ignore_errors=True)
+        if self.target.exists():
+            (self.target / ROWS_FILE).unlink(missing_ok=True)
+            os.rename(self.target, old)
+        (self.path / DIRTY_FILE).unlink(missing_ok=True)
+        os.rename(self.path, self.target)
+        shutil.rmtree(old, ignore_errors=True)
+        return True
+
+    def discard(self) -> None:
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def _append_columns(
+    series_dir: Path, columns: dict[str, np.ndarray], rows: int
+) -> None:
+    """Write columns after the first `rows` values, dropping any torn tail."""
+    for name, dtype in COLUMN_DTYPES.items():
+        with open(series_dir / f"{name}.bin", "ab") as f:
+            f.truncate(rows * dtype.itemsize)
+            f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+
+
+def _write_rows(series_dir: Path, rows: int) -> None:
+    tmp_path = series_dir / f"{ROWS_FILE}.tmp"
+    tmp_path.write_text(str(rows))
+    os.replace(tmp_path, series_dir / ROWS_FILE)
+
+
+columnar_store = (
+    ColumnarStore(settings.COLUMNAR_STORE_DIR) if settings.COLUMNAR_STORE_DIR else None
+)
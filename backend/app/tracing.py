@@ -0,0 +1,146 @@
+"""Tracing spans (OpenTelemetry) and on-demand sampling profiles.
+
+Spans are created through the OpenTelemetry API. Unless TRACING_OTLP_ENDPOINT
+is set, setup_tracing() installs nothing and every span is the API's no-op
+span; with it, spans are batched and exported over OTLP/HTTP to a collector
+(Jaeger, Tempo, the OpenTelemetry Collector, ...).
+
+Profiles are opt-in per run: profile() samples the wrapped code with
+pyinstrument and writes a speedscope flamegraph (open it at
+https://www.speedscope.app). The API profiles a request carrying an
+X-Profile header when PROFILING_ENABLED is set; scripts take a flag.
+"""
+
+import logging
+import re
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+
+from opentelemetry import trace
+from opentelemetry.trace import SpanKind
+from pyinstrument import Profiler
+from pyinstrument.renderers import SpeedscopeRenderer
+
+from app.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer("crypto_history_collector")
+
+PROFILE_HEADER = b"x-profile"
+
+
+def setup_tracing(service_name: str) -> None:
+    """Export spans to TRACING_OTLP_ENDPOINT, if set, as service_name."""
+    if not settings.TRACING_OTLP_ENDPOINT:
+        return
+
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+        OTLPSpanExporter,
+    )
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    # Flushed and shut down at interpreter exit
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    endpoint = settings.TRACING_OTLP_ENDPOINT.rstrip("/")
+    provider.add_span_processor(
+        BatchSpanProcessor(OTLPSpanExporter(endpoint=f"{endpoint}/v1/traces"))
+    )
+    trace.set_tracer_provider(provider)
+    logger.info("Exporting traces to %s", endpoint)
+
+
+@contextmanager
+def profile(path: Path | None, async_mode: str = "disabled") -> Iterator[None]:
+    """
+    Sample the enclosed code into a speedscope flamegraph at path.
+
+    async_mode "enabled" follows only the current task (one request among
+    many); "disabled" samples the whole thread, showing time awaiting I/O
+    as the event loop's select. Does nothing for path None.
+    """
+    if path is None:
+        yield
+        return
+
+    profiler = Profiler(async_mode=async_mode)
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(profiler.output(renderer=SpeedscopeRenderer()))
+        logger.info("Wrote profile to %s", path)
+
+
+@contextmanager
+def script_tracing(job: str, profile_path: Path | None = None) -> Iterator[None]:
+    """Trace a script run under one root span, profiling it into profile_path if given."""
+    setup_tracing(job)
+    with tracer.start_as_current_span(job), profile(profile_path):
+        yield
+
+
+def profile_path(name: str) -> Path:
+    """A new file in PROFILE_DIR for a profile of `name`."""
+    now = datetime.now(UTC).replace(tzinfo=None)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")
+    return settings.PROFILE_DIR / f"{now:%Y%m%dT%H%M%S%f}-{slug}.speedscope.json"
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening a server span per HTTP request and, when
+    PROFILING_ENABLED, profiling requests sent with an X-Profile header.
+
+    The profile's file name is returned in an X-Profile-File header; the file
+    is written once the response body has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = None
+        if settings.PROFILING_ENABLED and any(
+            name == PROFILE_HEADER for name, _ in scope["headers"]
+        ):
+            path = profile_path(f"{scope['method']} {scope['path']}")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.response.status_code", message["status"])
+                if path is not None:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-profile-file", path.name.encode()),
+                    ]
+            await send(message)
+
+        with (
+            tracer.start_as_current_span(
+                f"{scope['method']} {scope['path']}",
+                kind=SpanKind.SERVER,
+                attributes={
+                    "http.request.method": scope["method"],
+                    "url.path": scope["path"],
+                },
+            ) as span,
+            profile(path, async_mode="enabled"),
+        ):
+            await self.app(scope, receive, send_wrapper)
+            # Named by the route template, like the request metrics
+            route = scope.get("route")
+            if route is not None:
+                span.set_attribute("http.route", route.path)
+                span.update_name(f"{scope['method']} {route.path}")
@@ -0,0 +1,132 @@
+"""Helpers shared by the database-backed benchmarks: synthetic series and results."""
+
+import json
+import subprocess
+from datetime import UTC, datetime
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import Candle, Exchange, ExchangeSymbol, MarketType, SeriesCoverage, Symbol
+from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.repositories.klines import KlinesRepository
+
+
+RESULTS_DIR = Path("benchmarks/results")
+
+
+async def create_bench_symbols(
+    session: AsyncSession,
+    exchange: ExchangeEnum,
+    market_type: MarketTypeEnum,
+    names: list[str],
+) -> list[tuple[int, str]]:
+    """
+    Get or create benchmark symbols, returning (exchange_symbol_id, name).
+
+    They are created inactive, so they never join the collected universe.
+    """
+    exchange_id = await session.scalar(
+        select(Exchange.id).where(Exchange.name == exchange.value)
+    )
+    market_type_id = await session.scalar(
+        select(MarketType.id).where(MarketType.name == market_type.value)
+    )
+    await session.execute(
+        insert(Symbol)
+        .values([{"name": name} for name in names])
+        .on_conflict_do_nothing(index_elements=["name"])
+    )
+    result = await session.execute(
+        select(Symbol.name, Symbol.id).where(Symbol.name.in_(names))
+    )
+    symbol_ids = dict(result.all())
+    await session.execute(
+        insert(ExchangeSymbol)
+        .values(
+            [
+                {
+                    "exchange_id": exchange_id,
+                    "market_type_id": market_type_id,
+                    "symbol_id": symbol_ids[name],
+                    "exchange_symbol_name": name,
+                    "is_active": False,
+                    "base_asset": name.removesuffix("USDT"),
+                    "quote_asset": "USDT",
+                }
+                for name in names
+            ]
+        )
+        .on_conflict_do_nothing(constraint="uq_exchange_symbol")
+    )
+    series = await KlinesRepository.resolve_exchange_symbols(
+        session, exchange, market_type, names
+    )
+    await session.commit()
+    return series
+
+
+async def clear_series(
+    session: AsyncSession, exchange_symbol_ids: list[int], timeframe: TimeframeEnum
+) -> None:
+    """Delete the candles and coverage of benchmark series."""
+    await session.execute(
+        delete(Candle).where(
+            Candle.exchange_symbol_id.in_(exchange_symbol_ids),
+            Candle.timeframe == timeframe.value,
+        )
+    )
+    await session.execute(
+        delete(SeriesCoverage).where(
+            SeriesCoverage.exchange_symbol_id.in_(exchange_symbol_ids),
+            SeriesCoverage.timeframe == timeframe.value,
+        )
+    )
+    await session.commit()
+
+
+def percentiles(samples: list[float]) -> dict:
+    """p50 and p99 of durations in seconds, in milliseconds."""
+    if not samples:
+        return {"p50_ms": None, "p99_ms": None}
+    p50, p99 = np.percentile(samples, [50, 99]) * 1000
+    return {"p50_ms": round(float(p50), 2), "p99_ms": round(float(p99), 2)}
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_results(benchmark: str, results_dir: Path = RESULTS_DIR) -> dict | None:
+    """The latest saved report of a benchmark, None before the first run."""
+    paths = sorted(results_dir.glob(f"{benchmark}-*.json"))
+    return json.loads(paths[-1].read_text()) if paths else None
+
+
+def save_results(
+    benchmark: str, config: dict, results, results_dir: Path = RESULTS_DIR
+) -> Path:
+    """Write a timestamped JSON report, so runs can be compared over time."""
+    results_dir.mkdir(parents=True, exist_ok=True)
+    now = datetime.now(UTC).replace(tzinfo=None)
+    path = results_dir / f"{benchmark}-{now:%Y%m%dT%H%M%S}.json"
+    report = {
+        "benchmark": benchmark,
+        "generated_at": now.isoformat(),
+        "git_commit": git_commit(),
+        "config": config,
+        "results": results,
+    }
+    path.write_text(json.dumps(report, indent=2))
+    return path
@@ -0,0 +1,108 @@
+"""Benchmark candle response encodings: bytes on the wire and server CPU.
+
+Encodes synthetic candles in every supported format the way the streaming
+read path does (5000-row chunks), and the JSON page path through Pydantic
+models, then reports size and CPU time per million rows.
+
+Run from backend/:
+    python -m benchmarks.formats
+"""
+
+import asyncio
+import time
+from datetime import datetime
+
+import numpy as np
+import pyarrow as pa
+
+from app.enums import ExchangeEnum, KlinesFormatEnum, MarketTypeEnum, TimeframeEnum
+from app.schemas.klines import KlinesResponse
+from app.services.formatters import encode_tables
+from app.storage.cold import CANDLE_SCHEMA
+
+
+# ── Configuration ──────────────────────────────────────────────
+ROWS = 1_000_000
+CHUNK_SIZE = 5000
+# ───────────────────────────────────────────────────────────────
+
+
+def make_table(rows: int) -> pa.Table:
+    rng = np.random.default_rng(0)
+    start = np.datetime64(datetime(2016, 1, 1), "ms")
+    timestamps = start + np.arange(rows) * np.timedelta64(1, "h")
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.005, rows)) * close
+    return pa.Table.from_arrays(
+        [
+            pa.array(timestamps, type=pa.timestamp("ms")),
+            pa.array(open_),
+            pa.array(np.maximum(open_, close) + spread),
+            pa.array(np.minimum(open_, close) - spread),
+            pa.array(close),
+            pa.array(rng.uniform(1, 1000, rows)),
+        ],
+        schema=CANDLE_SCHEMA,
+    )
+
+
+async def measure_stream(table: pa.Table, fmt: KlinesFormatEnum) -> tuple[int, float]:
+    async def chunks():
+        for batch in table.to_batches(max_chunksize=CHUNK_SIZE):
+            yield pa.Table.from_batches([batch])
+
+    size = 0
+    started = time.process_time()
+    async for chunk in encode_tables(chunks(), CANDLE_SCHEMA, fmt):
+        size += len(chunk)
+    return size, time.process_time() - started
+
+
+def measure_json_pages(table: pa.Table) -> tuple[int, float]:
+    size = 0
+    started = time.process_time()
+    for batch in table.to_batches(max_chunksize=CHUNK_SIZE):
+        candles = batch.to_pylist()
+        response = KlinesResponse(
+            exchange=ExchangeEnum.BINANCE,
+            market_type=MarketTypeEnum.FUTURES,
+            symbol="BTCUSDT",
+            timeframe=TimeframeEnum.h1,
+            candles=candles,
+            count=len(candles),
+            next_cursor=candles[-1]["timestamp"],
+        )
+        size += len(response.model_dump_json())
+    return size, time.process_time() - started
+
+
+async def main() -> None:
+    table = make_table(ROWS)
+    scale = 1_000_000 / ROWS
+
+    results = [("json (pydantic pages)", *measure_json_pages(table))]
+    for fmt in (
+        KlinesFormatEnum.NDJSON,
+        KlinesFormatEnum.CSV,
+        KlinesFormatEnum.MSGPACK,
+        KlinesFormatEnum.ARROW,
+        KlinesFormatEnum.PARQUET,
+    ):
+        results.append((fmt.value, *await measure_stream(table, fmt)))
+
+    baseline_size, baseline_cpu = results[0][1], results[0][2]
+    print(f"{ROWS} rows, {CHUNK_SIZE}-row chunks; figures per million rows")
+    print(f"{'format':<24}{'MB':>10}{'CPU s':>10}{'size x':>10}{'CPU x':>10}")
+    for name, size, cpu in results:
+        print(
+            f"{name:<24}"
+            f"{size * scale / 1e6:>10.1f}"
+            f"{cpu * scale:>10.2f}"
+            f"{size / baseline_size:>10.2f}"
+            f"{cpu / baseline_cpu:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
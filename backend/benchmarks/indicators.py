@@ -0,0 +1,60 @@
+"""Benchmark indicator computation: full history and one-candle extension.
+
+Computes every indicator over a universe of synthetic 1h series of ten years
+each, first over the whole history (a cache miss) and then extending each
+result by one new candle from its saved state (what a cached series does
+after a write), and reports wall time.
+
+Run from backend/:
+    python -m benchmarks.indicators
+"""
+
+import time
+
+import numpy as np
+
+from app.enums import IndicatorEnum
+from app.indicators import compute
+
+
+# ── Configuration ──────────────────────────────────────────────
+SERIES = 500
+ROWS = 10 * 365 * 24
+PERIOD = 14
+# ───────────────────────────────────────────────────────────────
+
+
+def make_arrays(rows: int, seed: int) -> dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    spread = np.abs(rng.normal(0, 0.005, rows)) * close
+    return {"high": close + spread, "low": close - spread, "close": close}
+
+
+def main() -> None:
+    universe = [make_arrays(ROWS + 1, seed) for seed in range(SERIES)]
+    history = [{k: v[:-1] for k, v in arrays.items()} for arrays in universe]
+    latest = [{k: v[-1:] for k, v in arrays.items()} for arrays in universe]
+
+    print(f"{SERIES} series x {ROWS:,} candles, period {PERIOD}")
+    print(
+        f"{'indicator':<10}{'full (s)':>10}{'per series (ms)':>17}{'extend (ms)':>13}"
+    )
+    for indicator in IndicatorEnum:
+        started = time.perf_counter()
+        states = [compute(indicator, arrays, PERIOD)[1] for arrays in history]
+        full = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for arrays, state in zip(latest, states):
+            compute(indicator, arrays, PERIOD, state=state)
+        extend = time.perf_counter() - started
+
+        print(
+            f"{indicator.value:<10}{full:>10.2f}{full / SERIES * 1000:>17.2f}"
+            f"{extend * 1000:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Benchmark ingestion end to end: exchange client -> parse -> save_klines.
+
+The Binance and Bybit clients backfill synthetic symbols from a local mock
+exchange (benchmarks.mock_exchange) with configurable latency, page size and
+429/5xx injection, and save every page into the local Postgres through
+KlinesRepository.save_klines. Exchanges run in parallel, as in plan_backfill.
+Reports candles/s, requests/s and p50/p99 page fetch and save latency per
+exchange, and writes them with the configuration to a JSON file in
+RESULTS_DIR; the previous result is shown alongside for comparison.
+
+Benchmark symbols (BENCH000USDT, ...) are created inactive and their candles
+are deleted before each run.
+
+Run from backend/ (with WRITE_DB, against a migrated database):
+    python -m benchmarks.ingestion
+"""
+
+import asyncio
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+from app.db.session import AsyncSessionLocal
+from app.enums import ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.repositories.klines import KlinesRepository
+from app.services.mappers import EXCHANGE_CLIENTS
+from benchmarks.common import (
+    clear_series,
+    create_bench_symbols,
+    percentiles,
+    previous_results,
+    save_results,
+)
+from benchmarks.mock_exchange import MockExchange
+
+
+# ── Configuration ──────────────────────────────────────────────
+EXCHANGES = list(ExchangeEnum)
+MARKET_TYPE = MarketTypeEnum.FUTURES
+TIMEFRAME = TimeframeEnum.h1
+SYMBOLS = 8  # synthetic symbols per exchange
+END_TIME = datetime(2026, 1, 1)
+HISTORY = timedelta(days=365)
+PAGE_LIMIT = 1000  # candles per request
+LATENCY_MS = 20.0
+JITTER_MS = 10.0
+ERROR_RATE = 0.02  # share of requests answered with 429/5xx
+RETRY_AFTER = 0.0  # Retry-After sent with errors, None = client backoff
+RATE_LIMIT = None  # requests/s per exchange, None = the client's own
+MAX_CONCURRENT = 4  # symbols in flight per exchange
+WRITE_DB = True  # False measures fetch + parse only
+RESULTS_DIR = Path("benchmarks/results")
+# ───────────────────────────────────────────────────────────────
+
+
+def bench_client_class(exchange: ExchangeEnum) -> type:
+    """The exchange's client with the benchmark's limits and a parse timer."""
+    base = EXCHANGE_CLIENTS[exchange]
+
+    class BenchClient(base):
+        parse_seconds = 0.0
+
+        def _parse_klines(self, data: list):
+            started = time.perf_counter()
+            klines = super()._parse_klines(data)
+            BenchClient.parse_seconds += time.perf_counter() - started
+            return klines
+
+    BenchClient.RATE_LIMIT = RATE_LIMIT or base.RATE_LIMIT
+    BenchClient.PAGE_LIMIT = PAGE_LIMIT
+    return BenchClient
+
+
+async def prepare_symbols(exchange: ExchangeEnum) -> list[tuple[int, str]]:
+    """Create the benchmark symbols and clear their candles."""
+    names = [f"BENCH{i:03d}USDT" for i in range(SYMBOLS)]
+    async with AsyncSessionLocal() as session:
+        series = await create_bench_symbols(session, exchange, MARKET_TYPE, names)
+        await clear_series(session, [es_id for es_id, _ in series], TIMEFRAME)
+    return series
+
+
+async def ingest_symbol(
+    client,
+    es_id: int | None,
+    symbol: str,
+    start_time: datetime,
+    semaphore: asyncio.Semaphore,
+    fetch_latency: list[float],
+    save_latency: list[float],
+) -> tuple[int, int]:
+    """Backfill one symbol like backfill_klines does. Returns (fetched, inserted)."""
+    async with semaphore, AsyncSessionLocal() as session:
+        fetched = 0
+        inserted = 0
+        pages = client.get_klines(
+            symbol=symbol,
+            timeframe=TIMEFRAME,
+            start_time=start_time,
+            end_time=END_TIME,
+            market_type=MARKET_TYPE,
+        )
+        while True:
+            started = time.perf_counter()
+            try:
+                batch = await anext(pages)
+            except StopAsyncIteration:
+                break
+            fetch_latency.append(time.perf_counter() - started)
+            fetched += len(batch)
+
+            if es_id is not None:
+                started = time.perf_counter()
+                inserted += await KlinesRepository.save_klines(
+                    session, es_id, TIMEFRAME, batch
+                )
+                save_latency.append(time.perf_counter() - started)
+    return fetched, inserted
+
+
+async def run_exchange(exchange: ExchangeEnum, mock: MockExchange) -> dict:
+    if WRITE_DB:
+        series = await prepare_symbols(exchange)
+    else:
+        series = [(None, f"BENCH{i:03d}USDT") for i in range(SYMBOLS)]
+
+    client_class = bench_client_class(exchange)
+    fetch_latency: list[float] = []
+    save_latency: list[float] = []
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=mock.transport()) as http_client:
+        client = client_class(http_client=http_client)
+        results = await asyncio.gather(
+            *(
+                ingest_symbol(
+                    client,
+                    es_id,
+                    symbol,
+                    END_TIME - HISTORY,
+                    semaphore,
+                    fetch_latency,
+                    save_latency,
+                )
+                for es_id, symbol in series
+            )
+        )
+    elapsed = time.perf_counter() - started
+
+    stats = mock.stats[exchange.value]
+    fetched = sum(f for f, _ in results)
+    return {
+        "seconds": round(elapsed, 3),
+        "candles": fetched,
+        "inserted": sum(i for _, i in results),
+        "requests": stats.requests,
+        "errors": {str(s): n for s, n in sorted(stats.errors.items())},
+        "candles_per_second": round(fetched / elapsed),
+        "requests_per_second": round(stats.requests / elapsed, 1),
+        "page_fetch": percentiles(fetch_latency),
+        "page_save": percentiles(save_latency),
+        "parse_seconds": round(client_class.parse_seconds, 3),
+        "mock_serve_seconds": round(stats.serve_seconds, 3),
+    }
+
+
+async def main() -> None:
+    mock = MockExchange(
+        first_ts=END_TIME - HISTORY,
+        last_ts=END_TIME,
+        latency_ms=LATENCY_MS,
+        jitter_ms=JITTER_MS,
+        error_rate=ERROR_RATE,
+        retry_after=RETRY_AFTER,
+    )
+    previous = previous_results("ingestion", RESULTS_DIR)
+
+    outcomes = await asyncio.gather(*(run_exchange(e, mock) for e in EXCHANGES))
+    results = {e.value: outcome for e, outcome in zip(EXCHANGES, outcomes)}
+
+    print(
+        f"{SYMBOLS} symbols x {HISTORY.days}d of {TIMEFRAME.value} per exchange, "
+        f"page {PAGE_LIMIT}, latency {LATENCY_MS}+{JITTER_MS}ms, "
+        f"errors {ERROR_RATE:.0%}, db {'on' if WRITE_DB else 'off'}"
+    )
+    print(
+        f"{'exchange':<10}{'candles/s':>11}{'req/s':>8}{'fetch p50':>11}"
+        f"{'p99':>8}{'save p50':>10}{'p99':>8}{'errors':>8}{'prev c/s':>10}"
+    )
+    for exchange, r in results.items():
+        prev = (previous or {}).get("results", {}).get(exchange, {})
+        print(
+            f"{exchange:<10}{r['candles_per_second']:>11}"
+            f"{r['requests_per_second']:>8}"
+            f"{r['page_fetch']['p50_ms'] or '-':>11}{r['page_fetch']['p99_ms'] or '-':>8}"
+            f"{r['page_save']['p50_ms'] or '-':>10}{r['page_save']['p99_ms'] or '-':>8}"
+            f"{sum(r['errors'].values()):>8}"
+            f"{prev.get('candles_per_second', '-'):>10}"
+        )
+
+    config = {
+        "exchanges": [e.value for e in EXCHANGES],
+        "market_type": MARKET_TYPE.value,
+        "timeframe": TIMEFRAME.value,
+        "symbols": SYMBOLS,
+        "history_days": HISTORY.days,
+        "page_limit": PAGE_LIMIT,
+        "latency_ms": LATENCY_MS,
+        "jitter_ms": JITTER_MS,
+        "error_rate": ERROR_RATE,
+        "retry_after": RETRY_AFTER,
+        "rate_limit": RATE_LIMIT,
+        "max_concurrent": MAX_CONCURRENT,
+        "write_db": WRITE_DB,
+    }
+    path = save_results("ingestion", config, results, RESULTS_DIR)
+    print(f"Results: {path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
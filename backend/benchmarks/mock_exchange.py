@@ -0,0 +1,173 @@
+"""A local mock of the Binance and Bybit kline endpoints for benchmarks.
+
+MockExchange is an httpx transport handler: pass mock.transport() to an
+httpx.AsyncClient and hand that client to an exchange client. Requests are
+routed by host, answered with synthetic candles in each exchange's wire
+format (honouring the same paging parameters as the real APIs) after a
+configurable latency, and a configurable share of them fail with 429/5xx.
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+
+import httpx
+import numpy as np
+
+
+BINANCE_HOSTS = {"api.binance.com", "fapi.binance.com"}
+BYBIT_HOSTS = {"api.bybit.com"}
+
+INTERVAL_MS = {
+    # Binance
+    "1h": 3_600_000,
+    "4h": 14_400_000,
+    "1d": 86_400_000,
+    # Bybit
+    "60": 3_600_000,
+    "240": 14_400_000,
+    "D": 86_400_000,
+}
+
+
+@dataclass
+class EndpointStats:
+    """What one exchange's endpoint served."""
+
+    requests: int = 0
+    errors: dict[int, int] = field(default_factory=dict)
+    candles: int = 0
+    # CPU time spent building responses, part of every end-to-end number
+    serve_seconds: float = 0.0
+
+
+class MockExchange:
+    """Serve synthetic klines for any symbol listed between first_ts and last_ts."""
+
+    def __init__(
+        self,
+        first_ts: datetime,
+        last_ts: datetime,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        error_statuses: tuple[int, ...] = (429, 500, 502, 503),
+        retry_after: float | None = 0.0,
+        seed: int = 0,
+    ):
+        """
+        Args:
+            first_ts, last_ts: Open times of the first and last candle (naive UTC)
+            latency_ms, jitter_ms: Delay per response, uniformly jittered
+            error_rate: Share of requests answered with one of error_statuses
+            retry_after: Retry-After header (seconds) sent with errors, None to
+                leave retry timing to the client's backoff
+            seed: Seed for jitter and error injection
+        """
+        self.first_ms = int(first_ts.replace(tzinfo=UTC).timestamp() * 1000)
+        self.last_ms = int(last_ts.replace(tzinfo=UTC).timestamp() * 1000)
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.retry_after = retry_after
+        self.rng = np.random.default_rng(seed)
+        self.stats = {"binance": EndpointStats(), "bybit": EndpointStats()}
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url.host in BINANCE_HOSTS:
+            exchange = "binance"
+        elif request.url.host in BYBIT_HOSTS:
+            exchange = "bybit"
+        else:
+            return httpx.Response(404)
+        stats = self.stats[exchange]
+        stats.requests += 1
+
+        delay = self.latency + self.rng.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if self.rng.random() < self.error_rate:
+            status = int(self.rng.choice(self.error_statuses))
+            stats.errors[status] = stats.errors.get(status, 0) + 1
+            headers = {}
+            if self.retry_after is not None:
+                headers["Retry-After"] = str(self.retry_after)
+            return httpx.Response(status, headers=headers)
+
+        started = time.process_time()
+        params = request.url.params
+        if exchange == "binance":
+            body, count = self._binance_page(params)
+        else:
+            body, count = self._bybit_page(params)
+        stats.candles += count
+        stats.serve_seconds += time.process_time() - started
+        return httpx.Response(
+            200, content=body, headers={"Content-Type": "application/json"}
+        )
+
+    def _open_times(self, step: int, start: int, end: int) -> np.ndarray:
+        """Candle open times within [start, end], on the step grid."""
+        start = max(start, self.first_ms)
+        end = min(end, self.last_ms)
+        first = -(-(start - self.first_ms) // step) * step + self.first_ms
+        if first > end:
+            return np.empty(0, dtype=np.int64)
+        return np.arange(first, end + 1, step, dtype=np.int64)
+
+    @staticmethod
+    def _prices(open_times: np.ndarray, step: int) -> list[list[str]]:
+        """Deterministic OHLCV strings, one row per candle."""
+        i = open_times // step
+        close = 100 + (i * 7919 % 1000) / 100
+        open_ = 100 + ((i - 1) * 7919 % 1000) / 100
+        high = np.maximum(open_, close) + 0.5
+        low = np.minimum(open_, close) - 0.5
+        volume = 1000 + i % 500
+        return [
+            [f"{o:.2f}", f"{h:.2f}", f"{lo:.2f}", f"{c:.2f}", f"{v:.3f}"]
+            for o, h, lo, c, v in zip(open_, high, low, close, volume)
+        ]
+
+    def _binance_page(self, params: httpx.QueryParams) -> tuple[bytes, int]:
+        # Oldest `limit` candles at or after startTime
+        step = INTERVAL_MS[params["interval"]]
+        limit = int(params.get("limit", 500))
+        start = int(params.get("startTime", self.first_ms))
+        end = int(params.get("endTime", self.last_ms))
+        open_times = self._open_times(step, start, end)[:limit]
+        rows = [
+            [int(ts), *prices, int(ts) + step - 1, "0", 100, "0", "0", "0"]
+            for ts, prices in zip(open_times, self._prices(open_times, step))
+        ]
+        return json.dumps(rows).encode(), len(rows)
+
+    def _bybit_page(self, params: httpx.QueryParams) -> tuple[bytes, int]:
+        # Newest `limit` candles at or before end, newest first
+        step = INTERVAL_MS[params["interval"]]
+        limit = int(params.get("limit", 200))
+        start = int(params.get("start", self.first_ms))
+        end = int(params.get("end", self.last_ms))
+        open_times = self._open_times(step, start, end)[-limit:][::-1]
+        rows = [
+            [str(ts), *prices, "0"]
+            for ts, prices in zip(open_times, self._prices(open_times, step))
+        ]
+        body = {
+            "retCode": 0,
+            "retMsg": "OK",
+            "result": {
+                "category": params.get("category"),
+                "symbol": params.get("symbol"),
+                "list": rows,
+            },
+            "time": int(time.time() * 1000),
+        }
+        return json.dumps(body).encode(), len(rows)
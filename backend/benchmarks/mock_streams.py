@@ -0,0 +1,182 @@
+"""A local stand-in for the Binance and Bybit kline WebSocket streams.
+
+MockStreams is a WebSocket server speaking both protocols on
+ws://HOST:PORT/binance and ws://HOST:PORT/bybit. Clients subscribe as on the
+real exchanges; every tick each subscribed stream gets a forming update of
+its current candle and then the candle's close, and moves on to the next
+candle. Candles continue across connections, starting at first_ts. With
+drop_after, connections are closed that many seconds after opening, to
+exercise reconnects and the REST catch-up.
+
+Point LiveIngestionService (ws_url) or app.scripts.ingest_live (WS_URLS) at
+it. Run from backend/:
+    python -m benchmarks.mock_streams
+"""
+
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from datetime import UTC, datetime
+
+from websockets.asyncio.server import ServerConnection, serve
+from websockets.exceptions import ConnectionClosed
+
+from benchmarks.mock_exchange import INTERVAL_MS
+
+
+# ── Configuration ──────────────────────────────────────────────
+HOST = "localhost"
+PORT = 8765
+FIRST_TS = datetime(2024, 1, 1)
+TICK = 1.0  # seconds per candle
+DROP_AFTER = None  # seconds until connections are dropped, None = never
+# ───────────────────────────────────────────────────────────────
+
+
+class MockStreams:
+    """Serve synthetic kline streams, one candle per tick for every subscription."""
+
+    def __init__(
+        self,
+        first_ts: datetime = FIRST_TS,
+        tick: float = TICK,
+        drop_after: float | None = DROP_AFTER,
+        seed: int = 0,
+    ):
+        self.first_ms = int(first_ts.replace(tzinfo=UTC).timestamp() * 1000)
+        self.tick = tick
+        self.drop_after = drop_after
+        self._random = random.Random(seed)
+        # Open time of the next candle and last close, by (exchange, stream)
+        self._next_open: dict[tuple[str, str], int] = {}
+        self._price: dict[tuple[str, str], float] = {}
+        self.connections = 0
+        # Closed candles sent, by exchange
+        self.closed_sent: Counter = Counter()
+
+    def serve(self, host: str = HOST, port: int = PORT):
+        """The server, to be used as an async context manager."""
+        return serve(self._handle, host, port)
+
+    async def _handle(self, ws: ServerConnection) -> None:
+        exchange = ws.request.path.strip("/")
+        if exchange not in ("binance", "bybit"):
+            await ws.close(code=1008, reason="unknown path")
+            return
+
+        self.connections += 1
+        streams: list[str] = []
+        sender = asyncio.create_task(self._send_candles(ws, exchange, streams))
+        opened = time.monotonic()
+        try:
+            while True:
+                timeout = None
+                if self.drop_after is not None:
+                    timeout = max(0.0, opened + self.drop_after - time.monotonic())
+                try:
+                    message = await asyncio.wait_for(ws.recv(), timeout)
+                except TimeoutError:
+                    await ws.close(code=1001, reason="dropped by stand-in")
+                    return
+                reply = self._handle_request(exchange, json.loads(message), streams)
+                if reply is not None:
+                    await ws.send(json.dumps(reply))
+        except ConnectionClosed:
+            pass
+        finally:
+            sender.cancel()
+
+    @staticmethod
+    def _handle_request(exchange: str, request: dict, streams: list[str]):
+        if exchange == "binance":
+            if request.get("method") == "SUBSCRIBE":
+                streams.extend(request["params"])
+            return {"result": None, "id": request.get("id")}
+        if request.get("op") == "subscribe":
+            streams.extend(request["args"])
+            return {"success": True, "ret_msg": "", "op": "subscribe"}
+        if request.get("op") == "ping":
+            return {"success": True, "ret_msg": "pong", "op": "ping"}
+        return None
+
+    async def _send_candles(
+        self, ws: ServerConnection, exchange: str, streams: list[str]
+    ) -> None:
+        while True:
+            await asyncio.sleep(self.tick)
+            for stream in list(streams):
+                for closed in (False, True):
+                    await ws.send(json.dumps(self._candle(exchange, stream, closed)))
+                self.closed_sent[exchange] += 1
+
+    def _candle(self, exchange: str, stream: str, closed: bool) -> dict:
+        key = (exchange, stream)
+        if exchange == "binance":
+            symbol, interval = stream.split("@kline_")
+            symbol = symbol.upper()
+        else:
+            _, interval, symbol = stream.split(".")
+        step = INTERVAL_MS[interval]
+
+        open_ms = self._next_open.get(key, self.first_ms - self.first_ms % step)
+        open_price = self._price.get(key, 100.0)
+        close = open_price * (1 + self._random.gauss(0, 0.01))
+        high = max(open_price, close) * 1.002
+        low = min(open_price, close) * 0.998
+        volume = self._random.uniform(10, 1000)
+        if closed:
+            self._next_open[key] = open_ms + step
+            self._price[key] = close
+
+        now_ms = int(time.time() * 1000)
+        if exchange == "binance":
+            return {
+                "e": "kline",
+                "E": now_ms,
+                "s": symbol,
+                "k": {
+                    "t": open_ms,
+                    "T": open_ms + step - 1,
+                    "s": symbol,
+                    "i": interval,
+                    "o": f"{open_price:.4f}",
+                    "c": f"{close:.4f}",
+                    "h": f"{high:.4f}",
+                    "l": f"{low:.4f}",
+                    "v": f"{volume:.3f}",
+                    "x": closed,
+                },
+            }
+        return {
+            "topic": stream,
+            "type": "snapshot",
+            "ts": now_ms,
+            "data": [
+                {
+                    "start": open_ms,
+                    "end": open_ms + step - 1,
+                    "interval": interval,
+                    "open": f"{open_price:.4f}",
+                    "close": f"{close:.4f}",
+                    "high": f"{high:.4f}",
+                    "low": f"{low:.4f}",
+                    "volume": f"{volume:.3f}",
+                    "turnover": "0",
+                    "confirm": closed,
+                    "timestamp": now_ms,
+                }
+            ],
+        }
+
+
+async def main() -> None:
+    mock = MockStreams()
+    async with mock.serve(HOST, PORT) as server:
+        print(f"Serving ws://{HOST}:{PORT}/binance and ws://{HOST}:{PORT}/bybit")
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
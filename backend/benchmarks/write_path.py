@@ -0,0 +1,332 @@
+"""Benchmark the candle write path: KlinesRepository.save_klines under load.
+
+For every table size (candles preloaded into filler series) and index
+configuration, runs each combination of batch size, writer concurrency and
+duplicate ratio, writing synthetic candles through save_klines as backfills
+do, one series and one connection per writer. Per case it reports rows/s,
+WAL bytes per row (pg_current_wal_lsn before and after), p50/p99 batch
+latency, and the share of sampled writer time spent waiting on locks and on
+WAL at commit (pg_stat_activity). Results are written as JSON to RESULTS_DIR.
+
+Preloading and index configurations change the candles table and WAL is
+measured cluster-wide, so it only runs against a database whose name ends
+with "_bench". Filler candles are kept between runs.
+
+Run from backend/ against a migrated benchmark database:
+    POSTGRES_DB=crypto_history_bench python -m benchmarks.write_path
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import exists, select, text
+from sqlalchemy.exc import DBAPIError
+
+from app.config import settings
+from app.db import Candle
+from app.db.session import AsyncSessionLocal
+from app.enums import TIMEFRAME_DELTA, ExchangeEnum, MarketTypeEnum, TimeframeEnum
+from app.exchanges.base import Kline
+from app.repositories.klines import KlinesRepository
+from benchmarks.common import (
+    clear_series,
+    create_bench_symbols,
+    percentiles,
+    save_results,
+)
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)s %(message)s",
+    datefmt="%H:%M:%S",
+)
+logger = logging.getLogger(__name__)
+
+
+# ── Configuration ──────────────────────────────────────────────
+BATCH_SIZES = [100, 1000, 5000]
+CONCURRENCY = [1, 4, 8]  # writers, each with its own series and connection
+DUPLICATE_RATIOS = [0.0, 0.5]  # share of every batch that is already stored
+TABLE_SIZES = [0, 10_000_000]  # candles in the table; 100M takes hours to load
+INDEX_CONFIGS: dict[str, dict[str, str]] = {
+    # name -> extra indexes on candles (index name -> definition)
+    "baseline": {},
+    "timestamp_brin": {"bench_candles_ts_brin": "USING brin (timestamp)"},
+    "series_ts_btree": {
+        "bench_candles_series_ts": "(exchange_symbol_id, timeframe, timestamp DESC)"
+    },
+}
+ROWS_PER_CASE = 200_000  # new candles per case, split among the writers
+PRELOAD_SERIES_ROWS = 1_000_000  # candles per filler series
+SAMPLE_INTERVAL = 0.05  # seconds between pg_stat_activity samples
+CHECKPOINT_BETWEEN_CASES = True  # even out full-page writes (needs privileges)
+RESULTS_DIR = Path("benchmarks/results")
+# ───────────────────────────────────────────────────────────────
+
+EXCHANGE = ExchangeEnum.BINANCE
+MARKET_TYPE = MarketTypeEnum.SPOT
+TIMEFRAME = TimeframeEnum.h1
+SERIES_START = datetime(2000, 1, 1)
+# Wait events of a backend flushing or inserting WAL for its commit
+COMMIT_WAIT_EVENTS = ("WALSync", "WALWrite", "WALInsert", "WALBufMapping", "SyncRep")
+
+
+def make_batches(rows: int, batch_size: int, duplicate_ratio: float) -> list[list]:
+    """
+    Batches with `rows` new candles in total, each batch repeating the last
+    duplicate_ratio share of timestamps of the batch before it.
+    """
+    step = TIMEFRAME_DELTA[TIMEFRAME]
+    duplicates = int(batch_size * duplicate_ratio)
+    batches, previous, next_index = [], [], 0
+    while next_index < rows:
+        repeated = previous[len(previous) - duplicates :] if duplicates else []
+        fresh = min(batch_size - len(repeated), rows - next_index)
+        indices = repeated + list(range(next_index, next_index + fresh))
+        next_index += fresh
+        batches.append(
+            [
+                Kline(
+                    timestamp=SERIES_START + i * step,
+                    open=100.0,
+                    high=101.0,
+                    low=99.0,
+                    close=100.0 + i % 10,
+                    volume=float(i),
+                )
+                for i in indices
+            ]
+        )
+        previous = indices
+    return batches
+
+
+async def preload(size: int) -> None:
+    """Fill the table up to `size` candles of filler series (never shrinks)."""
+    series_count = -(-size // PRELOAD_SERIES_ROWS)
+    if not series_count:
+        return
+    async with AsyncSessionLocal() as session:
+        fillers = await create_bench_symbols(
+            session,
+            EXCHANGE,
+            MARKET_TYPE,
+            [f"BENCHFILL{i:04d}USDT" for i in range(series_count)],
+        )
+        for i, (es_id, name) in enumerate(fillers):
+            filled = await session.scalar(
+                select(exists().where(Candle.exchange_symbol_id == es_id))
+            )
+            if filled:
+                continue
+            rows = min(PRELOAD_SERIES_ROWS, size - i * PRELOAD_SERIES_ROWS)
+            logger.info("Preloading %d candles into %s", rows, name)
+            await session.execute(
+                text(
+                    "INSERT INTO candles (exchange_symbol_id, timeframe, timestamp, "
+                    "open, high, low, close, volume, created_at, updated_at) "
+                    "SELECT :es_id, :timeframe, "
+                    "timestamp '1900-01-01' + g * interval '1 hour', "
+                    "100, 101, 99, 100, g, now(), now() "
+                    "FROM generate_series(0, :rows - 1) AS g "
+                    "ON CONFLICT DO NOTHING"
+                ),
+                {"es_id": es_id, "timeframe": TIMEFRAME.value, "rows": rows},
+            )
+            await session.commit()
+        await session.execute(text("ANALYZE candles"))
+        await session.commit()
+
+
+async def set_indexes(config: dict[str, str]) -> None:
+    """Drop the extra indexes of every configuration, then create this one's."""
+    async with AsyncSessionLocal() as session:
+        for indexes in INDEX_CONFIGS.values():
+            for name in indexes:
+                await session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        for name, definition in config.items():
+            logger.info("Creating index %s", name)
+            await session.execute(text(f"CREATE INDEX {name} ON candles {definition}"))
+        await session.commit()
+
+
+async def checkpoint() -> bool:
+    """Run a CHECKPOINT; False if the role is not allowed to."""
+    async with AsyncSessionLocal() as session:
+        try:
+            await session.execute(text("CHECKPOINT"))
+        except DBAPIError as e:
+            logger.warning("CHECKPOINT not allowed, WAL per row will vary: %s", e)
+            return False
+    return True
+
+
+async def sample_waits(stop: asyncio.Event) -> dict[str, int]:
+    """Count active writer backends, and those waiting on locks or on WAL."""
+    counts = {"active": 0, "lock": 0, "commit": 0}
+    stmt = text(
+        "SELECT wait_event_type, wait_event FROM pg_stat_activity "
+        "WHERE datname = current_database() AND state = 'active' "
+        "AND backend_type = 'client backend' AND pid <> pg_backend_pid()"
+    )
+    async with AsyncSessionLocal() as session:
+        while not stop.is_set():
+            for wait_type, wait_event in (await session.execute(stmt)).all():
+                counts["active"] += 1
+                if wait_type == "Lock":
+                    counts["lock"] += 1
+                elif wait_event in COMMIT_WAIT_EVENTS:
+                    counts["commit"] += 1
+            await session.rollback()
+            try:
+                await asyncio.wait_for(stop.wait(), SAMPLE_INTERVAL)
+            except TimeoutError:
+                pass
+    return counts
+
+
+async def write_series(
+    es_id: int, batches: list[list], latencies: list[float]
+) -> tuple[int, int]:
+    """Save the batches one after the other. Returns (attempted, inserted)."""
+    attempted = inserted = 0
+    async with AsyncSessionLocal() as session:
+        for batch in batches:
+            started = time.perf_counter()
+            inserted += await KlinesRepository.save_klines(
+                session, es_id, TIMEFRAME, batch
+            )
+            latencies.append(time.perf_counter() - started)
+            attempted += len(batch)
+    return attempted, inserted
+
+
+async def run_case(
+    writers: list[int], batch_size: int, duplicate_ratio: float, checkpoints: bool
+) -> dict:
+    per_writer = ROWS_PER_CASE // len(writers)
+    workloads = [make_batches(per_writer, batch_size, duplicate_ratio)] * len(writers)
+
+    async with AsyncSessionLocal() as session:
+        await clear_series(session, writers, TIMEFRAME)
+    if checkpoints:
+        await checkpoint()
+    async with AsyncSessionLocal() as session:
+        wal_before = await session.scalar(text("SELECT pg_current_wal_lsn()::text"))
+
+    latencies: list[float] = []
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_waits(stop))
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            write_series(es_id, batches, latencies)
+            for es_id, batches in zip(writers, workloads)
+        )
+    )
+    elapsed = time.perf_counter() - started
+    stop.set()
+    waits = await sampler
+
+    async with AsyncSessionLocal() as session:
+        wal_bytes = await session.scalar(
+            text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), CAST(:lsn AS pg_lsn))"),
+            {"lsn": wal_before},
+        )
+
+    attempted = sum(a for a, _ in results)
+    inserted = sum(i for _, i in results)
+    active = waits["active"] or 1
+    return {
+        "seconds": round(elapsed, 3),
+        "rows_attempted": attempted,
+        "rows_inserted": inserted,
+        "rows_per_second": round(inserted / elapsed),
+        "attempted_per_second": round(attempted / elapsed),
+        "wal_bytes_per_row": round(float(wal_bytes) / max(inserted, 1), 1),
+        "batch_latency": percentiles(latencies),
+        "lock_wait_share": round(waits["lock"] / active, 3),
+        "commit_wait_share": round(waits["commit"] / active, 3),
+    }
+
+
+async def main() -> None:
+    if not settings.POSTGRES_DB.endswith("_bench"):
+        raise SystemExit(
+            f"Refusing to run against {settings.POSTGRES_DB!r}: point POSTGRES_DB "
+            "at a database whose name ends with '_bench'"
+        )
+
+    async with AsyncSessionLocal() as session:
+        series = await create_bench_symbols(
+            session,
+            EXCHANGE,
+            MARKET_TYPE,
+            [f"BENCHW{i:03d}USDT" for i in range(max(CONCURRENCY))],
+        )
+    writer_ids = [es_id for es_id, _ in series]
+    checkpoints = CHECKPOINT_BETWEEN_CASES and await checkpoint()
+
+    print(
+        f"{'table':>12} {'indexes':<16}{'batch':>6}{'conc':>5}{'dups':>6}"
+        f"{'rows/s':>9}{'WAL B/row':>10}{'p50 ms':>8}{'p99 ms':>8}"
+        f"{'lock':>6}{'commit':>7}"
+    )
+    cases = []
+    for table_size in sorted(TABLE_SIZES):
+        await preload(table_size)
+        for index_config, indexes in INDEX_CONFIGS.items():
+            await set_indexes(indexes)
+            for batch_size in BATCH_SIZES:
+                for concurrency in CONCURRENCY:
+                    for duplicate_ratio in DUPLICATE_RATIOS:
+                        result = await run_case(
+                            writer_ids[:concurrency],
+                            batch_size,
+                            duplicate_ratio,
+                            checkpoints,
+                        )
+                        cases.append(
+                            {
+                                "table_size": table_size,
+                                "index_config": index_config,
+                                "batch_size": batch_size,
+                                "concurrency": concurrency,
+                                "duplicate_ratio": duplicate_ratio,
+                                **result,
+                            }
+                        )
+                        print(
+                            f"{table_size:>12,} {index_config:<16}{batch_size:>6}"
+                            f"{concurrency:>5}{duplicate_ratio:>6.0%}"
+                            f"{result['rows_per_second']:>9}"
+                            f"{result['wal_bytes_per_row']:>10}"
+                            f"{result['batch_latency']['p50_ms']:>8}"
+                            f"{result['batch_latency']['p99_ms']:>8}"
+                            f"{result['lock_wait_share']:>6.0%}"
+                            f"{result['commit_wait_share']:>7.0%}"
+                        )
+
+    await set_indexes({})
+    async with AsyncSessionLocal() as session:
+        await clear_series(session, writer_ids, TIMEFRAME)
+
+    config = {
+        "batch_sizes": BATCH_SIZES,
+        "concurrency": CONCURRENCY,
+        "duplicate_ratios": DUPLICATE_RATIOS,
+        "table_sizes": TABLE_SIZES,
+        "index_configs": INDEX_CONFIGS,
+        "rows_per_case": ROWS_PER_CASE,
+        "checkpoint_between_cases": checkpoints,
+    }
+    path = save_results("write_path", config, cases, RESULTS_DIR)
+    print(f"Results: {path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())